@@ -0,0 +1,10 @@
+import os
+
+import ansible.module_utils
+
+# Ansible makes the module_utils directory adjacent to the playbooks importable
+# as ansible.module_utils.<name> when it ships modules to remote systems. Do the
+# same here so that modules under test can import shared code.
+ansible.module_utils.__path__.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "module_utils")
+)
@@ -0,0 +1,23 @@
+import os
+import runpy
+
+runpy.run_path(
+    os.path.join(os.path.dirname(__file__), "..", "module_utils", "plugin_path.py")
+)
+
+from ansible.module_utils.cluster_identity import (  # noqa: E402
+    byte_xor,
+    cluster_identity,
+    fnv1a_32,
+    ha_cluster_identities,
+)
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "byte_xor": byte_xor,
+            "fnv1a_32": fnv1a_32,
+            "cluster_identity": cluster_identity,
+            "ha_cluster_identities": ha_cluster_identities,
+        }
@@ -0,0 +1,15 @@
+import os
+import runpy
+
+runpy.run_path(
+    os.path.join(os.path.dirname(__file__), "..", "module_utils", "plugin_path.py")
+)
+
+from ansible.module_utils.lnet_topology import o2ib_tunables  # noqa: E402
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "o2ib_tunables": o2ib_tunables,
+        }
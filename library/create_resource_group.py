@@ -3,72 +3,146 @@
 import json
 import subprocess
 import time
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from ansible.module_utils.basic import AnsibleModule
-
-DEFAULT_STATEFILE = "/etc/racktop/hiavd/serialized.dat"
+from ansible.module_utils.hiavd_statefile import (
+    DEFAULT_STATEFILE,
+    StatefileWatcher,
+    load_state,
+    read_revision,
+)
+from ansible.module_utils.peer_command import PeerCommandRunner
+
+# Longest we wait for a transition to end without re-attempting the operation,
+# in case the transition ends without the state file revision changing.
+TRANSITION_RECHECK_INTERVAL = 2.0
 HIAVADM_CMD = "/usr/racktop/sbin/hiavadm"
 HWADM_LIST_POOLS_CMD = ["/usr/racktop/sbin/hwadm", "-j", "ls", "p"]
 HWADM_RESCAN_CMD = ["/usr/racktop/sbin/hwadm", "rescan", "--ep"]
 
 
-def generate_ssh_cmd_prefix(addr: str, keydir: str) -> List[str]:
-    """Generate SSH command prefix for remote execution."""
-    return [
-        "/bin/ssh",
-        "-o",
-        "StrictHostKeyChecking=no",
-        "-i",
-        f"{keydir}/id_ed25519",
-        addr,
-    ]
-
-
-def ensure_pool_is_visible(
-    poolname: str, addr: str = "", keydir: str = "/root/.ssh", locally: bool = True
-) -> Tuple[bool, subprocess.CalledProcessError]:
-    """Determine whether or not poolname pool is visible on the system, either locally or remotely."""
-    cmd = (
-        HWADM_LIST_POOLS_CMD
-        if locally
-        else generate_ssh_cmd_prefix(addr, keydir) + HWADM_LIST_POOLS_CMD
-    )
+def list_visible_pools(
+    run_cmd=subprocess.run, timeout: Optional[float] = None
+) -> Tuple[Set[str], subprocess.SubprocessError]:
+    """
+    List names of all pools visible on the system. Pass the run method of a
+    PeerCommandRunner via `run_cmd` to list pools on the peer instead. A
+    listing which takes longer than timeout seconds yields no pools.
+    """
     try:
-        res = subprocess.run(
-            cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        res = run_cmd(
+            HWADM_LIST_POOLS_CMD,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
         )
-    except subprocess.CalledProcessError as err:
-        return False, err
-    return pool_exists_in_the_result(poolname, res), None
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as err:
+        return set(), err
+    return pool_names_in_the_result(res), None
 
 
-def issue_hwd_refresh(addr: str = "", keydir: str = "/root/.ssh", locally: bool = True):
+def issue_hwd_refresh(run_cmd=subprocess.run, timeout: Optional[float] = None):
     """Issue a hardware refresh command, locally or remotely."""
-    cmd = (
-        HWADM_RESCAN_CMD
-        if locally
-        else generate_ssh_cmd_prefix(addr, keydir) + HWADM_RESCAN_CMD
-    )
     try:
-        res = subprocess.run(
-            cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        res = run_cmd(
+            HWADM_RESCAN_CMD,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
         )
-    except subprocess.CalledProcessError as err:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as err:
         return False, err
     # Normally we should only see the rescan message.
     return res.stdout + res.stderr == b"Rescan started.\ncomplete.\n", None
 
 
-def pool_exists_in_the_result(poolname: str, result) -> bool:
-    """Returns True if poolname exists in the result, else False."""
+def pool_names_in_the_result(result) -> Set[str]:
+    """Returns names of all pools in the result."""
     pools = json.loads(result.stdout)
-    poolnames = [pool["Name"] for pool in pools or []]
-    return poolname in poolnames
+    return set(pool["Name"] for pool in pools or [])
+
+
+def remaining_time(deadline: float) -> float:
+    """Seconds left until the deadline, a time.monotonic() value, passes."""
+    return max(0, deadline - time.monotonic())
+
+
+def wait_for_pools_to_be_visible(
+    poolnames: List[str],
+    deadline: float,
+    run_cmd=subprocess.run,
+) -> Tuple[Dict[str, int], List[str], float]:
+    """
+    Lists pools once per attempt and issues a hardware refresh until all of the
+    given pools are visible or the deadline, a time.monotonic() value, passes.
+    Commands are killed at the deadline, a listing which did not finish by then
+    counting as pools not being visible yet. Returns counts of attempts on
+    which each pool was missing, refresh errors and the time spent in seconds.
+    """
+    start = time.monotonic()
+    missing_pools, refresh_errors = {}, []
+    backoff = 1
+    while True:
+        visible, _ = list_visible_pools(run_cmd, remaining_time(deadline))
+        missing = [p for p in poolnames if p not in visible]
+        if not missing:
+            break
+        for poolname in missing:
+            increment_missing_pool_count(poolname, missing_pools)
+        ok, err = issue_hwd_refresh(run_cmd, remaining_time(deadline))
+        if not ok:
+            refresh_errors.append(str(err) if err else "unexpected rescan output")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(backoff, remaining))
+        backoff += 1
+    return missing_pools, refresh_errors, time.monotonic() - start
+
+
+def wait_for_pools_to_be_visible_on_both_sides(
+    poolnames: List[str],
+    peer: PeerCommandRunner,
+    timeout: float,
+    run_cmd=subprocess.run,
+) -> Tuple[Dict[str, int], Dict[str, List[str]], Dict[str, float]]:
+    """
+    Probes and rescans the local system, via run_cmd, and the HA peer
+    concurrently, sharing a single deadline. Returns missing pool counts summed
+    over both sides, refresh errors and time spent, the latter two keyed by side.
+    """
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {
+            "local": executor.submit(
+                wait_for_pools_to_be_visible, poolnames, deadline, run_cmd=run_cmd
+            ),
+            "remote": executor.submit(
+                wait_for_pools_to_be_visible,
+                poolnames,
+                deadline,
+                run_cmd=peer.run,
+            ),
+        }
+        results = {side: future.result() for side, future in futures.items()}
+    missing_pools = {}
+    for counts, _, _ in results.values():
+        for poolname, count in counts.items():
+            missing_pools[poolname] = missing_pools.get(poolname, 0) + count
+    refresh_errors = {side: res[1] for side, res in results.items()}
+    durations = {side: res[2] for side, res in results.items()}
+    return missing_pools, refresh_errors, durations
 
 
 def create_resource_group(
-    rgname: str, hostname: str = "", hostname_filename: str = "/etc/hostname"
+    rgname: str,
+    hostname: str = "",
+    hostname_filename: str = "/etc/hostname",
+    run_cmd=subprocess.run,
 ) -> Tuple[bool, Exception]:
     """Creates a resource group without adding any pools."""
     # We read in the filename from the configuration file on the system if one
@@ -82,7 +156,7 @@ def create_resource_group(
     try:
         # Creating an already existing resource group is idempotent and will
         # result in a success process exit.
-        res = subprocess.run(
+        res = run_cmd(
             [HIAVADM_CMD, "u", "r", "-n", hostname, rgname],
             check=True,
             stdout=subprocess.PIPE,
@@ -94,10 +168,12 @@ def create_resource_group(
     return res.stdout + res.stdout == b"", None
 
 
-def add_pool_to_resource_group(rgname: str, poolname: str) -> Tuple[bool, Exception]:
+def add_pool_to_resource_group(
+    rgname: str, poolname: str, run_cmd=subprocess.run
+) -> Tuple[bool, Exception]:
     """Add a pool to a resource group."""
     try:
-        res = subprocess.run(
+        res = run_cmd(
             [HIAVADM_CMD, "u", "p", "--add", rgname, poolname],
             check=True,
             stdout=subprocess.PIPE,
@@ -108,10 +184,12 @@ def add_pool_to_resource_group(rgname: str, poolname: str) -> Tuple[bool, Except
     return res.stdout + res.stderr == b"", None
 
 
-def get_current_cluster_state() -> Tuple[Dict[Any, Any], Exception]:
+def get_current_cluster_state(
+    run_cmd=subprocess.run,
+) -> Tuple[Dict[Any, Any], Exception]:
     """Get the current cluster state as a dictionary."""
     try:
-        res = subprocess.run(
+        res = run_cmd(
             [HIAVADM_CMD, "i", "dump"],
             check=True,
             stdout=subprocess.PIPE,
@@ -134,76 +212,75 @@ class PoolNotRepairableException(Exception):
     pass
 
 
-def check_and_repair_if_possible(poolname: str) -> Tuple[bool, Exception]:
+def pool_info_from_cluster_state(state: Dict[Any, Any]) -> Dict[str, Dict[str, Any]]:
+    """Indexes pools found in the cluster state by pool name."""
+    return {
+        pool.get("Name"): pool
+        for rg in state.get("ResourceGroups", [])
+        for pool in rg.get("Pools", [])
+    }
+
+
+def check_pools_and_repair_if_possible(
+    poolnames: List[str], run_cmd=subprocess.run
+) -> Dict[str, Exception]:
     """
-    Checks the pool for problems and attempts repair if possible.
-    Returns (True, None) if healthy or repaired, (False, Exception) otherwise.
+    Checks all given pools for problems against a single snapshot of the
+    cluster state and attempts repair if possible. Returns a dict where keys
+    are pool names and values are None if the pool is healthy or repaired, or
+    the exception describing why it is not.
     """
-    pool_info = dict()
-    # FIXME: Add proper error handling
-    state, err = get_current_cluster_state()
+    state, err = get_current_cluster_state(run_cmd)
     if err:
-        return False, err
+        return {poolname: err for poolname in poolnames}
     # Due to the dynamic nature of the environment the structure of the data
     # may be changing at the same time as we query it. Thus, it is possible
     # that cluster state will not contain some or all of the pools.
-    pool_info = next(
-        (
-            pool
-            for rg in state.get("ResourceGroups", [])
-            for pool in rg.get("Pools", [])
-            if pool.get("Name") == poolname
-        ),
-        None,
-    )
-    if not pool_info:
-        return False, PoolNotFoundException(
-            f"pool '{poolname}' missing from cluster info"
-        )
-    # If there are no known problems then there is nothing to fix.
-    # At this point we are in a good state.
-    if not pool_info["Problems"]:
-        return True, None
-    # If there are known problems and this flag indicates that they are
-    # not repairable, we do not attempt to repair. Otherwise attempt to
-    # repair and if the command is successful, we assume things are now OK.
-    if not pool_info["CanRepair"]:
-        return False, PoolNotRepairableException(pool_info["Problems"])
+    pool_info = pool_info_from_cluster_state(state)
+    results, repairable = dict(), []
+    for poolname in poolnames:
+        info = pool_info.get(poolname)
+        if not info:
+            results[poolname] = PoolNotFoundException(
+                f"pool '{poolname}' missing from cluster info"
+            )
+        # If there are no known problems then there is nothing to fix.
+        # At this point we are in a good state.
+        elif not info["Problems"]:
+            results[poolname] = None
+        # If there are known problems and this flag indicates that they are
+        # not repairable, we do not attempt to repair.
+        elif not info["CanRepair"]:
+            results[poolname] = PoolNotRepairableException(info["Problems"])
+        else:
+            repairable.append(poolname)
+    if not repairable:
+        return results
+    # Repair is cluster-wide, thus a single invocation covers all pools. If the
+    # command is successful, we assume things are now OK.
     try:
-        subprocess.run(
+        run_cmd(
             [HIAVADM_CMD, "repair"],
             check=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
     except subprocess.CalledProcessError as err:
-        return False, err
-    return True, None
+        results.update({poolname: err for poolname in repairable})
+        return results
+    results.update({poolname: None for poolname in repairable})
+    return results
 
 
-def check_pool_already_in_resource_group(
-    poolname: str, statefile: str = DEFAULT_STATEFILE
-) -> bool:
-    """Checks whether the given pool is already tied to a resource group."""
+def pools_already_in_resource_groups(statefile: str = DEFAULT_STATEFILE) -> Set[str]:
+    """Returns names of all pools which are already tied to a resource group."""
     # Gracefully handle absence of the state file here. If the file is missing
     # assume that pool cannot be in _any_ resource group, since the cluster is
     # not even configured.
     try:
-        with open(statefile, "rb") as fp:
-            state = json.loads(fp.read())
-        cluster = state.get("Cluster", {})
-        pools = cluster.get("Pools", {})
-        rgs = cluster.get("ResourceGroups", {})
-        group_ids = rgs.keys()
-        for details in pools.values():
-            if (
-                details["CachedName"] == poolname
-                and details["ResourceGroupId"] in group_ids
-            ):
-                return True
+        return set(load_state(statefile).resource_group_by_pool)
     except IOError:
-        pass  # We fall through to return.
-    return False
+        return set()
 
 
 def increment_missing_pool_count(poolname: str, missing_pools: Dict[str, int]):
@@ -211,128 +288,238 @@ def increment_missing_pool_count(poolname: str, missing_pools: Dict[str, int]):
     missing_pools[poolname] = missing_pools.get(poolname, 0) + 1
 
 
+def resource_group_name(poolname: str) -> str:
+    """Derives name of the resource group from the name of the pool."""
+    return "RG" + poolname[1:]  # Drop leading 'p' from the pool name
+
+
+def cluster_in_transition(err: Exception) -> bool:
+    """Returns True if the error indicates that the cluster is in transition."""
+    return (
+        isinstance(err, subprocess.CalledProcessError)
+        and err.stderr == b"Cluster is currently in transition.\n"
+    )
+
+
+def retry_while_in_transition(
+    watcher: StatefileWatcher, timeout: float, func, *args, **kwargs
+) -> Tuple[bool, Exception]:
+    """
+    Calls func until it succeeds, retrying if cluster is in transition. Rather
+    than sleeping for a fixed period, each retry happens as soon as hiavd
+    commits a new revision of the state file, or after a short recheck interval
+    at the latest. Gives up once timeout seconds have passed.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        # Revision is read before the attempt so that a transition completing
+        # in the meantime is not missed.
+        revision = read_revision(watcher.statefile)
+        ok, err = func(*args, **kwargs)
+        if ok or not cluster_in_transition(err):
+            return ok, err
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return ok, err
+        watcher.wait_for_revision_change(
+            revision, min(remaining, TRANSITION_RECHECK_INTERVAL)
+        )
+
+
+def add_pools_to_resource_groups(
+    poolnames: List[str],
+    watcher: StatefileWatcher,
+    timeout: float,
+    node: str = "",
+    run_cmd=subprocess.run,
+) -> Dict[str, Exception]:
+    """
+    Creates a resource group for each pool and adds the pool to it, retrying
+    while cluster is in transition. A pool which fails does not stop the others.
+    Returns, keyed by pool name, None for each pool added or the error of each
+    which was not.
+    """
+    results = dict()
+    for poolname in poolnames:
+        rgname = resource_group_name(poolname)
+        ok, err = retry_while_in_transition(
+            watcher,
+            timeout,
+            create_resource_group,
+            rgname,
+            hostname=node,
+            run_cmd=run_cmd,
+        )
+        if ok:
+            ok, err = retry_while_in_transition(
+                watcher,
+                timeout,
+                add_pool_to_resource_group,
+                rgname,
+                poolname,
+                run_cmd=run_cmd,
+            )
+        results[poolname] = None if ok else err
+    return results
+
+
+def check_pools_until_settled(
+    poolnames: List[str], attempts: int = 5, run_cmd=subprocess.run, sleep=time.sleep
+) -> Dict[str, Exception]:
+    """
+    Checks and repairs pools, retrying with growing delays those which are not
+    yet part of the cluster state, since the cluster may be in a state of flux.
+    All pools are checked against a single snapshot of the cluster state on
+    each attempt. Returns, keyed by pool name, None or the error of each pool.
+    """
+    results, unchecked = dict(), list(poolnames)
+    for delay in range(1, attempts + 1):
+        if not unchecked:
+            break
+        checked = check_pools_and_repair_if_possible(unchecked, run_cmd)
+        unchecked = []
+        for poolname, err in checked.items():
+            if isinstance(err, PoolNotFoundException) and delay < attempts:
+                unchecked.append(poolname)
+            else:
+                results[poolname] = err
+        if unchecked:
+            sleep(delay)
+    return results
+
+
+def error_message(err: Exception) -> str:
+    """Formats an error returned by one of the hiavadm wrappers."""
+    if isinstance(err, subprocess.CalledProcessError):
+        return "non-zero exit status"
+    return str(err)
+
+
 def run_module():
     # Define available arguments/parameters a user can pass to the module
     module_args = dict(
-        poolname=dict(type="str", required=True),
+        poolname=dict(type="str", required=False),
+        poolnames=dict(type="list", elements="str", required=False),
         ha_peer_ipaddr=dict(type="str", required=True),
         node=dict(type="str", required=False, default=""),
         use_random_delay=dict(type="bool", required=False, default=False),
         delay_min=dict(type="float", required=False, default=0.5),
         delay_max=dict(type="float", required=False, default=2.0),
+        visibility_timeout=dict(type="float", required=False, default=10.0),
+        transition_timeout=dict(type="float", required=False, default=136.0),
+        statefile_path=dict(type="str", required=False, default=DEFAULT_STATEFILE),
     )
     # Seed result dict in the object
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_one_of=[("poolname", "poolnames")],
+        mutually_exclusive=[("poolname", "poolnames")],
+    )
     poolname = module.params["poolname"]
+    # A single pool is handled as a batch of one. Order is preserved, while
+    # duplicates are dropped.
+    poolnames = list(dict.fromkeys(module.params["poolnames"] or [poolname]))
     ha_peer_ipaddr = module.params["ha_peer_ipaddr"]
     node = module.params["node"]
-
-    # Don't do anything else if the pool is already part of the resource group.
-    if check_pool_already_in_resource_group(poolname):
+    visibility_timeout = module.params["visibility_timeout"]
+    transition_timeout = module.params["transition_timeout"]
+    statefile = module.params["statefile_path"]
+
+    # Time spent in each phase of the module, in seconds.
+    timings = dict()
+    started = time.monotonic()
+
+    # Outcome for each pool, keyed by pool name.
+    outcomes = {
+        p: dict(resource_group_name=resource_group_name(p), changed=False)
+        for p in poolnames
+    }
+    # Fields included with every result, so that a batch of one looks the same
+    # as it did before batching was introduced.
+    single = dict(poolname=poolname) if poolname else dict()
+
+    # Don't do anything else for pools which are already part of a resource
+    # group.
+    already_grouped = pools_already_in_resource_groups(statefile)
+    pending = []
+    for p in poolnames:
+        if p in already_grouped:
+            outcomes[p]["msg"] = "pool already in a resource group"
+        else:
+            pending.append(p)
+
+    if not pending:
         module.exit_json(
-            msg="pool already in a resource group", poolname=poolname, changed=False
+            msg="pool already in a resource group",
+            pools=outcomes,
+            changed=False,
+            **single,
         )
 
-    missing_pools = {}
-    local_hw_refresh_errors, remote_hw_refresh_errors = [], []
-
-    # Try to ensure pool is visible locally
-    for backoff in range(1, 5):
-        ok_on_local, _ = ensure_pool_is_visible(poolname)
-        if ok_on_local:
-            break
-        increment_missing_pool_count(poolname, missing_pools)
-        ok, err = issue_hwd_refresh()
-        if not ok:
-            local_hw_refresh_errors.append(err)
-        time.sleep(backoff)
+    phase_started = time.monotonic()
 
-    # Try to ensure pool is visible on peer
-    for backoff in range(1, 5):
-        ok_on_peer, _ = ensure_pool_is_visible(poolname, ha_peer_ipaddr, locally=False)
-        if ok_on_peer:
-            break
-        increment_missing_pool_count(poolname, missing_pools)
-        ok, err = issue_hwd_refresh(addr=ha_peer_ipaddr, locally=False)
-        if not ok:
-            remote_hw_refresh_errors.append(err)
-        time.sleep(backoff)
-
-    # Create a resource group based on the name of the pool.
-    rgname = "RG" + poolname[1:]  # Drop leading 'p' from the pool name
-
-    # Try to create the resource group, retrying if cluster is in transition
-    for delay in range(1, 17):
-        ok, err = (
-            create_resource_group(rgname, hostname=node)
-            if node
-            else create_resource_group(rgname)
-        )
-        if ok:
-            break
-        if (
-            isinstance(err, subprocess.CalledProcessError)
-            and err.stderr == b"Cluster is currently in transition.\n"
-        ):
-            time.sleep(delay)
-            continue
-        module.fail_json(
-            msg="non-zero exit status"
-            if isinstance(err, subprocess.CalledProcessError)
-            else str(err),
-            missing_pools=missing_pools,
-            refresh_errors={
-                "local": local_hw_refresh_errors,
-                "remote": remote_hw_refresh_errors,
-            },
-            changed=False,
+    # Try to ensure pools are visible locally and on peer. Both sides are
+    # probed concurrently and pools are listed once per attempt on each side, no
+    # matter how many pools we are after. All commands on the peer share a
+    # single SSH connection.
+    with PeerCommandRunner(ha_peer_ipaddr) as peer:
+        missing_pools, refresh_errors, durations = (
+            wait_for_pools_to_be_visible_on_both_sides(
+                pending, peer, visibility_timeout
+            )
         )
+    timings.update({"visibility_" + side: round(d, 3) for side, d in durations.items()})
+    timings["visibility"] = round(time.monotonic() - phase_started, 3)
+    phase_started = time.monotonic()
 
-    # Try to add the pool to the resource group, retrying if cluster is in transition
-    for delay in range(1, 17):
-        ok, err = add_pool_to_resource_group(rgname, poolname)
-        # Pool was added to the resource group successfully.
-        if ok:
-            break
-        if (
-            isinstance(err, subprocess.CalledProcessError)
-            and err.stderr == b"Cluster is currently in transition.\n"
-        ):
-            time.sleep(delay)
-            continue
+    failed = dict()
+
+    # Create a resource group based on the name of each pool and add the pool
+    # to it, retrying if cluster is in transition.
+    with StatefileWatcher(statefile) as watcher:
+        results = add_pools_to_resource_groups(
+            pending, watcher, transition_timeout, node
+        )
+    for p, err in results.items():
+        if err is None:
+            outcomes[p]["changed"] = True
+        else:
+            failed[p] = error_message(err)
+
+    timings["create_resource_groups"] = round(time.monotonic() - phase_started, 3)
+    phase_started = time.monotonic()
+
+    # We are going to potentially retry this check because the cluster is in
+    # the state of flux.
+    results = check_pools_until_settled([p for p in pending if p not in failed])
+    for p, err in results.items():
+        if err is None:
+            outcomes[p]["msg"] = "pool added to resource group"
+        else:
+            failed[p] = str(err)
+
+    timings["check_and_repair"] = round(time.monotonic() - phase_started, 3)
+    timings["total"] = round(time.monotonic() - started, 3)
+
+    for p, msg in failed.items():
+        outcomes[p].update(failed=True, msg=msg)
+
+    changed = any(outcome["changed"] for outcome in outcomes.values())
+    if failed:
+        # If we got here we still have an error for at least one pool.
         module.fail_json(
-            msg="non-zero exist status"
-            if isinstance(err, subprocess.CalledProcessError)
-            else str(err),
+            msg=failed[poolname] if poolname else "one or more pools failed",
+            pools=outcomes,
             missing_pools=missing_pools,
-            refresh_errors={
-                "local": local_hw_refresh_errors,
-                "remote": remote_hw_refresh_errors,
-            },
-            changed=False,
+            refresh_errors=refresh_errors,
+            timings=timings,
+            changed=changed,
         )
 
-    # We are going to potentially retry this check because the cluster is in the state of flux.
-    err = None
-    for delay in range(1, 6):
-        ok, err = check_and_repair_if_possible(poolname)
-        if ok:
-            module.exit_json(
-                poolname=poolname, resource_group_name=rgname, changed=True
-            )
-        # We should try again after a brief delay, because the state of the cluster may be changing.
-        if isinstance(err, PoolNotFoundException):
-            time.sleep(delay)
-    # If we got here we still have an error.
-    module.fail_json(
-        msg=str(err),
-        missing_pools=missing_pools,
-        refresh_errors={
-            "local": local_hw_refresh_errors,
-            "remote": remote_hw_refresh_errors,
-        },
-        changed=True,
-    )
+    if poolname:
+        single["resource_group_name"] = outcomes[poolname]["resource_group_name"]
+    module.exit_json(pools=outcomes, timings=timings, changed=changed, **single)
 
 
 def main():
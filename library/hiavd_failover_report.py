@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+import json
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ansible.module_utils.basic import AnsibleModule
+
+DEFAULT_LOG_FILE = "/var/log/hiavd-hooks.log"
+DEFAULT_PERCENTILES = [50.0, 90.0, 99.0]
+PRE_EXPORT = "pre-export"
+POST_IMPORT = "post-import"
+# Record written once per hook invocation, after all of its phases.
+HOOK_OP = "hook"
+
+
+def read_records(paths: Iterable[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Reads JSON-lines records written by the HA hooks from all given files.
+    Returns the records and the number of lines which could not be parsed, e.g.
+    one cut short by a crash. Missing files are treated as empty.
+    """
+    records = list()
+    skipped = 0
+    for path in paths:
+        try:
+            with open(path, "r") as fp:
+                for line in fp:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    if isinstance(record, dict) and record.get("run"):
+                        records.append(record)
+                    else:
+                        skipped += 1
+        except FileNotFoundError:
+            continue
+    return records, skipped
+
+
+def hook_runs(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Groups records by hook invocation. Invocations lacking the final hook
+    record, i.e. ones which have not finished or were killed, are left out.
+    Runs are returned ordered by wall clock start time.
+    """
+    runs = dict()
+    for record in records:
+        run = runs.setdefault(
+            record["run"], {"phases": dict(), "datasets": dict(), "complete": False}
+        )
+        op = record.get("op")
+        if op == HOOK_OP:
+            run.update(
+                hook=record.get("hook"),
+                host=record.get("host"),
+                pool=record.get("pool"),
+                ts=float(record.get("ts", 0)),
+                rc=record.get("rc"),
+                duration=float(record.get("duration", 0)),
+                complete=True,
+            )
+        elif record.get("dataset"):
+            run["datasets"][record["dataset"]] = {
+                "op": op,
+                "rc": record.get("rc"),
+                "duration": float(record.get("duration", 0)),
+            }
+        elif op:
+            run["phases"][op] = float(record.get("duration", 0))
+    complete = [
+        dict(run=run_id, **run) for run_id, run in runs.items() if run["complete"]
+    ]
+    for run in complete:
+        del run["complete"]
+    return sorted(complete, key=lambda r: r["ts"])
+
+
+def slowest_dataset(runs: Iterable[Optional[Dict[str, Any]]]) -> Optional[str]:
+    datasets = [
+        (details["duration"], name)
+        for run in runs
+        if run
+        for name, details in run["datasets"].items()
+    ]
+    return max(datasets)[1] if datasets else None
+
+
+def failed_datasets(runs: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, str]:
+    """
+    Maps datasets whose mount or unmount failed to the operation which failed,
+    e.g. umount-stuck for a target which could not be unmounted even by force.
+    """
+    return {
+        name: details["op"]
+        for run in runs
+        if run
+        for name, details in run["datasets"].items()
+        if details["rc"]
+    }
+
+
+def failover_from_runs(
+    export_run: Optional[Dict[str, Any]],
+    import_run: Dict[str, Any],
+    peer_logged: bool = True,
+) -> Dict[str, Any]:
+    """
+    Combines a pre-export run and the post-import run of the same pool which
+    followed it into a latency breakdown. Without a pre-export run, e.g. when
+    the peer went down and the pool was taken over by force, only the import
+    side is known. Whether such a failover was planned is only known if the
+    log of the peer was read, i.e. peer_logged, and is None otherwise.
+
+    The time between the hooks, which covers hiavd exporting and importing the
+    pool, is derived from wall clock timestamps of both nodes and is only as
+    accurate as their clocks are in sync.
+    """
+    import_end = import_run["ts"] + import_run["duration"]
+    failover = {
+        "pool": import_run["pool"],
+        "to_host": import_run["host"],
+        "from_host": None,
+        "planned": export_run is not None if export_run or peer_logged else None,
+        "started_at": import_run["ts"],
+        "pre_export": None,
+        "export_import": None,
+        "post_import": import_run["duration"],
+        "total": import_run["duration"],
+        "phases": dict(import_run["phases"]),
+        "slowest_dataset": slowest_dataset([export_run, import_run]),
+        "failed_datasets": failed_datasets([export_run, import_run]),
+        "rc": import_run["rc"],
+    }
+    if export_run:
+        export_end = export_run["ts"] + export_run["duration"]
+        failover.update(
+            from_host=export_run["host"],
+            started_at=export_run["ts"],
+            pre_export=export_run["duration"],
+            export_import=round(max(import_run["ts"] - export_end, 0.0), 2),
+            total=round(import_end - export_run["ts"], 2),
+            rc=export_run["rc"] or import_run["rc"],
+        )
+        failover["phases"].update(export_run["phases"])
+    return failover
+
+
+def logged_hosts(runs: Iterable[Dict[str, Any]]) -> List[str]:
+    """Returns names of all hosts whose runs were logged."""
+    return sorted(set(run["host"] for run in runs if run.get("host")))
+
+
+def failovers(runs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Pairs every post-import run with the last pre-export run of the same pool
+    which preceded it and has not been paired yet. Pre-export runs are logged
+    on the node giving up the pool, thus pairing requires logs of both nodes.
+    """
+    runs = list(runs)
+    hosts = logged_hosts(runs)
+    pending_exports = dict()
+    result = list()
+    for run in runs:
+        if run["hook"] == PRE_EXPORT:
+            pending_exports[run["pool"]] = run
+        elif run["hook"] == POST_IMPORT:
+            peer_logged = any(host != run["host"] for host in hosts)
+            result.append(
+                failover_from_runs(
+                    pending_exports.pop(run["pool"], None), run, peer_logged
+                )
+            )
+    return result
+
+
+def failed_exports(runs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Lists pre-export runs which failed, e.g. as a target was stuck, thus held up
+    or prevented the export of their pool.
+    """
+    return [
+        {
+            "pool": run["pool"],
+            "host": run["host"],
+            "started_at": run["ts"],
+            "duration": run["duration"],
+            "rc": run["rc"],
+            "failed_datasets": failed_datasets([run]),
+        }
+        for run in runs
+        if run["hook"] == PRE_EXPORT and run["rc"]
+    ]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Computes the percentile of values using the nearest-rank method."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def percentile_key(pct: float) -> str:
+    """Names a percentile, e.g. p50 or p99.9."""
+    return "p" + ("%g" % pct)
+
+
+def latency_summary(
+    failovers: List[Dict[str, Any]], percentiles: List[float]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Computes count, percentiles and maximum of every component of failover
+    latency, as well as of every hook phase, over all failovers.
+    """
+    series = dict()
+    for failover in failovers:
+        for key in ("total", "pre_export", "export_import", "post_import"):
+            if failover[key] is not None:
+                series.setdefault(key, []).append(failover[key])
+        for phase, duration in failover["phases"].items():
+            series.setdefault(phase, []).append(duration)
+    summary = dict()
+    for key, values in series.items():
+        summary[key] = {"count": len(values), "max": max(values)}
+        for pct in percentiles:
+            summary[key][percentile_key(pct)] = percentile(values, pct)
+    return summary
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            paths=dict(
+                type="list", elements="path", required=False, default=[DEFAULT_LOG_FILE]
+            ),
+            pool=dict(type="str", required=False),
+            percentiles=dict(
+                type="list",
+                elements="float",
+                required=False,
+                default=DEFAULT_PERCENTILES,
+            ),
+            last=dict(type="int", required=False),
+        ),
+        supports_check_mode=True,
+    )
+
+    percentiles = module.params["percentiles"]
+    for pct in percentiles:
+        if not 0 < pct <= 100:
+            module.fail_json(
+                changed=False, msg=f"percentile {pct} is outside of (0, 100]"
+            )
+
+    # Each node logs only its own hooks, thus logs of both nodes of the HA
+    # pair, fetched to one place, are needed to pair exports with imports.
+    records, skipped = read_records(module.params["paths"])
+    if module.params["pool"]:
+        records = [r for r in records if r.get("pool") == module.params["pool"]]
+    runs = hook_runs(records)
+    result = failovers(runs)
+    if module.params["last"]:
+        result = result[-module.params["last"] :]
+
+    module.exit_json(
+        changed=False,
+        ansible_facts={
+            "hiavd_failover_report": {
+                "failovers": result,
+                "failed_exports": failed_exports(runs),
+                "summary": latency_summary(result, percentiles),
+                "skipped_lines": skipped,
+                "hosts": logged_hosts(runs),
+            }
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
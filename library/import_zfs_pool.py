@@ -1,94 +1,335 @@
 #!/usr/bin/env python3
 
+import os
 import subprocess
-from pathlib import Path
-from typing import Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.zfs_kstat import KSTAT_DIR, pool_state
 
+ZPOOL_CMD = "/usr/sbin/zpool"
+# What `zpool import` says on stderr when the scan finds nothing.
+NO_POOLS_AVAILABLE = "no pools available to import"
+# Directories zpool looks for devices in when no search paths are given, most
+# specific first, against which device names listed by a scan are resolved.
+DEFAULT_DEVICE_DIRS = ("/dev/disk/by-vdev", "/dev/disk/by-id", "/dev/mapper", "/dev")
+# States of devices which a scan lists, yet did not find.
+ABSENT_DEVICE_STATES = ("UNAVAIL", "REMOVED", "FAULTED")
 
-def pool_imported_and_online(poolname: str) -> Tuple[bool, bool]:
-    pool_state_path = Path(f"/proc/spl/kstat/zfs/{poolname}/state")
-    imported = pool_state_path.exists()
-    if not imported:
-        return False, False
-    buf = b""
-    with pool_state_path.open("rb") as fp:
-        buf = fp.read(-1)
-    return imported, buf[:-1] == b"ONLINE"
 
+def search_path_args(search_paths: Optional[List[str]]) -> List[str]:
+    """Restricts device discovery to given directories or devices, if any."""
+    args = []
+    for path in search_paths or []:
+        args += ["-d", path]
+    return args
 
-def import_pool(poolname: str) -> Tuple[bool, Exception]:
-    """Imports the given pool by name."""
+
+def parse_importable_pools(output: str) -> List[Dict[str, Any]]:
+    """
+    Parses output of `zpool import` without a pool argument into a list of
+    pools with their name, numeric identifier, state and leaf devices, each a
+    name and state, in order of listing.
+    """
+    pools = []
+    # Entries of the config section of the current pool as (depth, name, state).
+    entries = None
+    for line in output.splitlines():
+        key, sep, value = line.strip().partition(": ")
+        if key == "pool" and sep:
+            pools.append(dict(name=value.strip(), id=None, state=None, devices=[]))
+            entries = None
+        elif key in ("id", "state") and sep and pools and entries is None:
+            pools[-1][key] = value.strip()
+        elif line.strip() == "config:" and pools:
+            entries = []
+        elif entries is not None and line.startswith("\t") and line.strip():
+            rest = line[1:]
+            depth = (len(rest) - len(rest.lstrip(" "))) // 2
+            fields = rest.split()
+            entries.append((depth, fields[0], fields[1] if len(fields) > 1 else ""))
+            pools[-1]["devices"] = leaf_devices(entries)
+        elif entries and not line.strip():
+            entries = None
+    return pools
+
+
+def leaf_devices(entries: List[Tuple[int, str, str]]) -> List[Dict[str, str]]:
+    """
+    Picks devices out of config entries, i.e. those below the pool or a section
+    such as logs which no other entry is nested in.
+    """
+    devices = []
+    for i, (depth, name, state) in enumerate(entries):
+        nested = i + 1 < len(entries) and entries[i + 1][0] > depth
+        if depth > 0 and not nested:
+            devices.append(dict(name=name, state=state))
+    return devices
+
+
+def resolve_device_paths(
+    devices: List[Dict[str, str]], search_paths: Optional[List[str]] = None
+) -> Optional[List[str]]:
+    """
+    Resolves device names a scan listed into paths, looking in the search
+    paths, if any, or where zpool looks by default otherwise. Devices the scan
+    did not find are left out, as an import would not find them either.
+    Returns None if any other device cannot be resolved, or there are none.
+    """
+    paths = []
+    for device in devices:
+        if device["state"] in ABSENT_DEVICE_STATES:
+            continue
+        name = device["name"]
+        candidates = (
+            [name]
+            if os.path.isabs(name)
+            else [os.path.join(d, name) for d in search_paths or DEFAULT_DEVICE_DIRS]
+        )
+        path = next((c for c in candidates if os.path.exists(c)), None)
+        if path is None:
+            return None
+        paths.append(path)
+    return paths or None
+
+
+def scan_importable_pools(
+    search_paths: Optional[List[str]], run_cmd=subprocess.run
+) -> Tuple[List[Dict[str, Any]], Exception]:
+    """Lists pools available for import with a single scan of devices."""
+    cmd = [ZPOOL_CMD, "import"] + search_path_args(search_paths)
     try:
-        res = subprocess.run(
-            ["/usr/sbin/zpool", "import", "-o", "cachefile=none", poolname],
+        res = run_cmd(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+    except OSError as err:
+        return [], err
+    if res.returncode != 0:
+        if NO_POOLS_AVAILABLE in res.stderr:
+            return [], None
+        return [], subprocess.CalledProcessError(
+            res.returncode, cmd, res.stdout, res.stderr
+        )
+    return parse_importable_pools(res.stdout), None
+
+
+def import_pool(
+    poolname: str,
+    search_paths: Optional[List[str]] = None,
+    pool_id: Optional[str] = None,
+    run_cmd=subprocess.run,
+) -> Tuple[bool, Exception]:
+    """
+    Imports the given pool by name, or by numeric identifier when one is given,
+    looking for its devices only in the search paths, if any. Search paths may
+    name devices rather than directories, in which case only those are read.
+    """
+    try:
+        run_cmd(
+            [ZPOOL_CMD, "import"]
+            + search_path_args(search_paths)
+            + ["-o", "cachefile=none", pool_id or poolname],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             check=True,
         )
-    except subprocess.CalledProcessError as err:
+    except (subprocess.CalledProcessError, OSError) as err:
         return False, err
     return True, None
 
 
+def import_error(err: Exception) -> Dict[str, Any]:
+    """Describes a failed import for inclusion in the results."""
+    # In practice there is no other possible type unless zpool is missing.
+    if isinstance(err, subprocess.CalledProcessError):
+        return {
+            "msg": "pool import unsuccessful",
+            "cmd": err.cmd,
+            "returncode": err.returncode,
+            "stdout": str(err.stdout).strip(),
+            "stderr": str(err.stderr).strip(),
+        }
+    return {"msg": "pool import could not run", "err": str(err)}
+
+
+def import_pools(
+    pools: Dict[str, Optional[str]],
+    search_paths: List[str],
+    max_workers: int,
+    run_cmd=subprocess.run,
+    kstat_dir: str = KSTAT_DIR,
+    device_paths: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Imports pools, given as a mapping of pool name to numeric identifier,
+    concurrently. Pools whose device paths are given are imported from exactly
+    those devices, thus without scanning the search paths again. Returns the
+    outcome for each pool, including time it took to import and state of the
+    pool afterwards.
+    """
+    device_paths = device_paths or dict()
+
+    def import_one(poolname: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        ok, err = import_pool(
+            poolname,
+            device_paths.get(poolname) or search_paths,
+            pools[poolname],
+            run_cmd,
+        )
+        outcome = {"duration": round(time.monotonic() - started, 3)}
+        if not ok:
+            outcome.update(failed=True, changed=False, **import_error(err))
+            return outcome
+        state = pool_state(poolname, kstat_dir)
+        outcome.update(
+            changed=True,
+            imported=state is not None,
+            state=state,
+            msg="pool imported successfully",
+        )
+        return outcome
+
+    if not pools:
+        return dict()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pools)))) as ex:
+        futures = {p: ex.submit(import_one, p) for p in pools}
+    return {p: future.result() for p, future in futures.items()}
+
+
 def run_module():
     module_args = dict(
-        poolname=dict(type="str", required=True),
+        poolname=dict(type="str", required=False),
+        poolnames=dict(type="list", elements="str", required=False),
+        search_paths=dict(type="list", elements="path", required=False, default=[]),
+        max_workers=dict(type="int", required=False, default=4),
     )
 
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_one_of=[("poolname", "poolnames")],
+        mutually_exclusive=[("poolname", "poolnames")],
+    )
 
     poolname = module.params["poolname"]
+    # A single pool is handled as a batch of one. Order is preserved, while
+    # duplicates are dropped.
+    poolnames = list(dict.fromkeys(module.params["poolnames"] or [poolname]))
+    search_paths = module.params["search_paths"]
 
-    imported, online = pool_imported_and_online(poolname)
+    # Time spent in each phase of the module, in seconds.
+    timings = dict()
+    started = time.monotonic()
 
-    if imported and not online:
-        module.fail_json(
-            **{
-                "msg": "pool already imported but not online",
-                "poolname": poolname,
-                "changed": False,
-            }
-        )
+    outcomes = dict()
+    missing = []
+    for p in poolnames:
+        state = pool_state(p)
+        if state is None:
+            missing.append(p)
+        elif state != "ONLINE":
+            outcomes[p] = dict(
+                imported=True,
+                state=state,
+                changed=False,
+                failed=True,
+                msg="pool already imported but not online",
+            )
+        else:
+            outcomes[p] = dict(
+                imported=True,
+                state=state,
+                changed=False,
+                msg="pool already imported and online",
+            )
 
-    if imported:
-        module.exit_json(
-            **{
-                "message": "pool already imported and online",
-                "poolname": poolname,
-                "changed": False,
-            }
-        )
+    if missing:
+        # Every disk is read once to find all importable pools, instead of once
+        # per pool being imported.
+        phase_started = time.monotonic()
+        importable, err = scan_importable_pools(search_paths)
+        timings["scan"] = round(time.monotonic() - phase_started, 3)
+        if err:
+            module.fail_json(
+                changed=False, pools=outcomes, timings=timings, **import_error(err)
+            )
 
-    ok, err = import_pool(poolname)
+        by_name = dict()
+        for details in importable:
+            by_name.setdefault(details["name"], []).append(details)
 
-    if ok:
-        module.exit_json(
-            **{
-                "message": "pool imported successfully",
-                "poolname": poolname,
-                "changed": True,
-            }
-        )
+        pending, device_paths = dict(), dict()
+        for p in missing:
+            found = by_name.get(p, [])
+            if len(found) != 1:
+                outcomes[p] = dict(
+                    imported=False,
+                    state=None,
+                    changed=False,
+                    failed=True,
+                    msg=(
+                        "multiple importable pools with this name"
+                        if found
+                        else "pool not found among importable pools"
+                    ),
+                )
+            elif module.check_mode:
+                outcomes[p] = dict(
+                    imported=False,
+                    state=found[0]["state"],
+                    changed=True,
+                    msg="pool would be imported",
+                )
+            else:
+                pending[p] = found[0]["id"]
+                # Devices of the pool are passed to the import, which would
+                # otherwise scan all devices in the search paths once again.
+                paths = resolve_device_paths(found[0]["devices"], search_paths)
+                if paths:
+                    device_paths[p] = paths
 
-    # In practice there is no other possible type. This is being done to ease
-    # code autocompletion.
-    if isinstance(err, subprocess.CalledProcessError):
-        module.fail_json(
-            **{
-                "msg": "pool import unsuccessful",
-                "cmd": err.cmd,
-                "returncode": err.returncode,
-                "stdout": str(err.stdout).strip(),
-                "stderr": str(err.stderr).strip(),
-                "changed": False,
-            }
-        )
-    else:
-        module.fail_json(
-            **{"msg": "pool import could not run", "err": str(err), "changed": False}
+        # Importing by numeric identifier makes sure we get the very pool the
+        # scan found.
+        phase_started = time.monotonic()
+        outcomes.update(
+            import_pools(
+                pending,
+                search_paths,
+                module.params["max_workers"],
+                device_paths=device_paths,
+            )
         )
+        timings["import"] = round(time.monotonic() - phase_started, 3)
+
+    timings["total"] = round(time.monotonic() - started, 3)
+
+    # Report pools in the order they were given.
+    outcomes = {p: outcomes[p] for p in poolnames}
+    changed = any(outcome["changed"] for outcome in outcomes.values())
+    failed = [p for p, outcome in outcomes.items() if outcome.get("failed")]
+    # Fields included with every result, so that a batch of one looks the same
+    # as it did before batching was introduced.
+    single = dict(poolname=poolname) if poolname else dict()
+
+    if failed:
+        if poolname:
+            single.update(
+                {k: v for k, v in outcomes[poolname].items() if k != "failed"}
+            )
+        else:
+            single["msg"] = "one or more pools failed to import"
+        single["changed"] = changed
+        module.fail_json(pools=outcomes, timings=timings, **single)
+
+    if poolname:
+        single["message"] = outcomes[poolname]["msg"]
+    module.exit_json(pools=outcomes, timings=timings, changed=changed, **single)
 
 
 def main():
@@ -1,40 +1,49 @@
 #!/usr/bin/env python3
 
-import os
 import subprocess
 
 from ansible.module_utils.basic import AnsibleModule
-
-
-def extract_ip_address(output):
-    for line in output.splitlines():
-        if line.startswith("IP Address ") and "Source" not in line:
-            return line.split(":")[1][1:]
-
-
-def is_vm(prod_name_filename="/sys/class/dmi/id/product_name") -> bool:
-    with open(prod_name_filename, "rb") as fp:
-        if fp.readline().decode("utf8").lower().startswith("vm"):
-            return True
-    return False
+from ansible.module_utils.fact_cache import DEFAULT_CACHE_DIR, FactCache, cached_probe
+from ansible.module_utils.ipmi_lan import DEFAULT_CHANNELS
+from ansible.module_utils.node_probes import (
+    DEFAULT_TIMEOUTS,
+    ipmi_probe,
+    probe_signatures,
+)
 
 
 def main():
-    module = AnsibleModule(argument_spec={}, supports_check_mode=True)
-    if is_vm() or not os.path.exists("/dev/ipmi0"):
-        facts = {"ipmi_ip_address": "", "ipmi_present": False}
-        module.exit_json(changed=False, ansible_facts=facts)
-
-    # Physical system with a /dev/ipmi0 handled below.
+    module = AnsibleModule(
+        argument_spec=dict(
+            # LAN channels to query, all at once.
+            channels=dict(
+                type="list",
+                elements="int",
+                required=False,
+                default=list(DEFAULT_CHANNELS),
+            ),
+            # Seconds after which ipmitool is killed, for each channel.
+            timeout=dict(
+                type="float", required=False, default=DEFAULT_TIMEOUTS["ipmi"]
+            ),
+            # Seconds facts are served from the on-node cache, 0 disables it.
+            cache_ttl=dict(type="int", required=False, default=0),
+            cache_dir=dict(type="path", required=False, default=DEFAULT_CACHE_DIR),
+        ),
+        supports_check_mode=True,
+    )
+    channels = module.params["channels"]
+    cache_ttl = module.params["cache_ttl"]
+    cache = FactCache(module.params["cache_dir"], cache_ttl) if cache_ttl else None
     try:
-        # Run the command
-        res = subprocess.check_output(
-            "/usr/bin/ipmitool lan print 3".split(), universal_newlines=True
+        # Virtual machines and systems without a /dev/ipmi0 have no BMC.
+        facts, cache_hit = cached_probe(
+            cache,
+            "ipmi",
+            probe_signatures(channels=channels)["ipmi"],
+            lambda: ipmi_probe(module.params["timeout"], channels=channels),
         )
-        # Parse and return structured data
-        ip_address = extract_ip_address(res)
-        facts = {"ipmi_ip_address": ip_address, "ipmi_present": True}
-        module.exit_json(changed=False, ansible_facts=facts)
+        module.exit_json(changed=False, ansible_facts=facts, cache_hit=cache_hit)
     except subprocess.CalledProcessError as e:
         module.fail_json(msg=f"Command failed: {e}")
     except Exception as e:
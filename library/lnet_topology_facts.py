@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.lnet_topology import DEFAULT_SYSFS, lnet_topology
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            sysfs_path=dict(type="path", required=False, default=DEFAULT_SYSFS),
+        ),
+        supports_check_mode=True,
+    )
+
+    module.exit_json(
+        changed=False,
+        ansible_facts={"lnet_topology": lnet_topology(module.params["sysfs_path"])},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+from functools import partial
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.fact_cache import DEFAULT_CACHE_DIR, FactCache, cached_probe
+from ansible.module_utils.hiavd_statefile import DEFAULT_STATEFILE
+from ansible.module_utils.node_probes import (
+    DEFAULT_CONFIGFILE,
+    DEFAULT_REVISION_ID,
+    DEFAULT_TIMEOUTS,
+    hiavd_probe,
+    ipmi_probe,
+    probe_signatures,
+    registration_probe,
+    run_probes,
+    zfs_probe,
+)
+from ansible.module_utils.zfs_kstat import KSTAT_DIR
+
+PROBES = ("hiavd", "registration", "ipmi", "zfs")
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            probes=dict(
+                type="list",
+                elements="str",
+                required=False,
+                default=list(PROBES),
+                choices=list(PROBES),
+            ),
+            # Probe names mapped to seconds they may take, overriding defaults.
+            timeouts=dict(type="dict", required=False, default={}),
+            config_path=dict(type="str", required=False),
+            statefile_path=dict(type="str", required=False),
+            # Revision of the state while hiavd is yet to be configured.
+            revision_id=dict(type="int", required=False),
+            procfs_path=dict(type="str", required=False),
+            # Seconds facts of hiavd, registration and IPMI probes are served
+            # from the on-node cache, 0 disables it. ZFS facts are never cached.
+            cache_ttl=dict(type="int", required=False, default=0),
+            cache_dir=dict(type="path", required=False, default=DEFAULT_CACHE_DIR),
+        ),
+        supports_check_mode=True,
+    )
+
+    configfile = module.params["config_path"] or DEFAULT_CONFIGFILE
+    statefile = module.params["statefile_path"] or DEFAULT_STATEFILE
+    revision_id = module.params["revision_id"] or DEFAULT_REVISION_ID
+    procfs_path = module.params["procfs_path"] or KSTAT_DIR
+
+    available = dict(
+        hiavd=lambda timeout: hiavd_probe(
+            configfile, statefile, timeout, revision_id=revision_id
+        ),
+        registration=registration_probe,
+        ipmi=ipmi_probe,
+        zfs=partial(zfs_probe, kstat_dir=procfs_path),
+    )
+    probes = {name: available[name] for name in module.params["probes"]}
+
+    cache_ttl = module.params["cache_ttl"]
+    cache_hit = dict()
+    if cache_ttl:
+        cache = FactCache(module.params["cache_dir"], cache_ttl)
+        signatures = probe_signatures(configfile, statefile, revision_id)
+
+        def cached(name, probe):
+            def run(timeout):
+                facts, cache_hit[name] = cached_probe(
+                    cache, name, signatures[name], partial(probe, timeout)
+                )
+                return facts
+
+            return run
+
+        probes = {
+            name: cached(name, probe) if name in signatures else probe
+            for name, probe in probes.items()
+        }
+
+    timeouts = {
+        name: float(module.params["timeouts"].get(name, DEFAULT_TIMEOUTS[name]))
+        for name in probes
+    }
+
+    # Every probe runs at once, thus facts take as long as the slowest probe
+    # rather than the sum of all of them.
+    facts, timings, errors = run_probes(probes, timeouts)
+
+    if errors:
+        module.fail_json(
+            changed=False,
+            msg="; ".join(f"{name}: {err}" for name, err in errors.items()),
+            errors=errors,
+            timings=timings,
+            cache_hit=cache_hit,
+        )
+
+    module.exit_json(
+        changed=False, ansible_facts=facts, timings=timings, cache_hit=cache_hit
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.lustre_targets import target_inventory
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            pools=dict(type="list", elements="str", required=False, default=[]),
+        ),
+        supports_check_mode=True,
+    )
+
+    # All datasets and their Lustre properties are fetched with a single
+    # `zfs get` no matter how many pools and targets there are. When no pools
+    # are given, all imported pools are included.
+    inventory, err = target_inventory(module.params["pools"])
+    if err:
+        module.fail_json(
+            changed=False,
+            msg=str(err.stderr).strip(),
+            command=" ".join(err.cmd),
+            retcode=err.returncode,
+        )
+
+    module.exit_json(
+        changed=False, ansible_facts={"lustre_targets": inventory.to_facts()}
+    )
+
+
+if __name__ == "__main__":
+    main()
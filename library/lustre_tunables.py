@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import fnmatch
+import re
+import subprocess
+from typing import Any, Dict, List, Tuple
+
+from ansible.module_utils.basic import AnsibleModule
+
+LCTL_CMD = "/usr/sbin/lctl"
+# Configuration log on the MGS which `lctl set_param -P` records parameters in.
+PARAMS_LLOG = "params"
+LLOG_PARAM = re.compile(
+    r"parameter:\s*(?P<name>[^,}\s]+),\s*value:\s*(?P<value>[^}]*?)\s*}"
+)
+
+
+def parse_get_param(output: str) -> Dict[str, str]:
+    """
+    Parses output of `lctl get_param` into parameter names mapped to values.
+    Lines which do not start a name=value pair, such as continuation lines of
+    multi-line values, are skipped.
+    """
+    values = dict()
+    for line in output.splitlines():
+        name, sep, value = line.partition("=")
+        if not sep or not name or " " in name:
+            continue
+        values[name] = value.strip()
+    return values
+
+
+def get_params(
+    names: List[str], lctl: str = LCTL_CMD, run_cmd=subprocess.run
+) -> Tuple[Dict[str, str], Exception]:
+    """
+    Reads current values of all given parameters, which may contain wildcards,
+    with a single command. Parameters which do not exist are left out.
+    """
+    cmd = [lctl, "get_param"] + list(names)
+    try:
+        res = run_cmd(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+    except OSError as err:
+        return dict(), err
+    values = parse_get_param(res.stdout)
+    # lctl fails if any parameter does not exist, yet still prints the others.
+    if res.returncode != 0 and not values:
+        return dict(), subprocess.CalledProcessError(
+            res.returncode, cmd, res.stdout, res.stderr
+        )
+    return values, None
+
+
+def parse_llog_params(output: str) -> Dict[str, str]:
+    """
+    Parses output of `lctl --device MGS llog_print params` into parameter
+    names, as given to `lctl set_param -P`, mapped to the value last recorded.
+    """
+    values = dict()
+    for match in LLOG_PARAM.finditer(output):
+        values[match.group("name")] = match.group("value")
+    return values
+
+
+def get_persistent_params(
+    lctl: str = LCTL_CMD, run_cmd=subprocess.run
+) -> Tuple[Dict[str, str], Exception]:
+    """
+    Reads parameters recorded on the MGS. Fails on any other node, since only
+    the MGS holds the configuration log.
+    """
+    cmd = [lctl, "--device", "MGS", "llog_print", PARAMS_LLOG]
+    try:
+        res = run_cmd(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as err:
+        return dict(), err
+    return parse_llog_params(res.stdout), None
+
+
+def diff_params(
+    desired: Dict[str, Any], current: Dict[str, str]
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Compares desired values against current ones. A parameter whose name
+    contains wildcards differs if any of the parameters it matches does.
+    Returns changes, keyed by desired name, along with names matching nothing.
+    """
+    changes, missing = dict(), []
+    for pattern, value in desired.items():
+        value = str(value)
+        matched = {
+            name: v for name, v in current.items() if fnmatch.fnmatchcase(name, pattern)
+        }
+        if not matched:
+            missing.append(pattern)
+            continue
+        before = {name: v for name, v in matched.items() if v != value}
+        if before:
+            changes[pattern] = dict(before=before, after=value)
+    return changes, missing
+
+
+def diff_persistent_params(
+    desired: Dict[str, Any], recorded: Dict[str, str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compares desired values against ones recorded on the MGS, by name as given,
+    since parameters of targets on other nodes cannot be read on the MGS.
+    """
+    changes = dict()
+    for name, value in desired.items():
+        value = str(value)
+        if recorded.get(name) != value:
+            before = {name: recorded[name]} if name in recorded else {}
+            changes[name] = dict(before=before, after=value)
+    return changes
+
+
+def set_params(
+    values: Dict[str, str],
+    persistent: bool = False,
+    lctl: str = LCTL_CMD,
+    run_cmd=subprocess.run,
+) -> Exception:
+    """
+    Sets all given parameters with a single command. Persistent parameters are
+    recorded on the MGS, where they must be set, and also apply to targets
+    mounted later on, on every node.
+    """
+    cmd = [lctl, "set_param"] + (["-P"] if persistent else [])
+    cmd += [f"{name}={value}" for name, value in values.items()]
+    try:
+        run_cmd(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as err:
+        return err
+    return None
+
+
+def apply_params(
+    desired: Dict[str, Any],
+    persistent: bool = False,
+    check_mode: bool = False,
+    lctl: str = LCTL_CMD,
+    run_cmd=subprocess.run,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str], str]:
+    """
+    Sets parameters which differ from desired values, comparing against
+    values recorded on the MGS if persistent and live values otherwise.
+    Returns changes, names matching no parameter and an error message.
+    """
+    if persistent:
+        recorded, err = get_persistent_params(lctl, run_cmd)
+        if err:
+            return (
+                dict(),
+                [],
+                "persistent parameters can only be set on the MGS: "
+                f"{getattr(err, 'stderr', err)}",
+            )
+        changes, missing = diff_persistent_params(desired, recorded), []
+    else:
+        current, err = get_params(list(desired), lctl, run_cmd)
+        if err:
+            return (
+                dict(),
+                [],
+                f"could not read parameters: {getattr(err, 'stderr', err)}",
+            )
+        changes, missing = diff_params(desired, current)
+    if changes and not check_mode:
+        values = {name: change["after"] for name, change in changes.items()}
+        err = set_params(values, persistent, lctl, run_cmd)
+        if err:
+            return (
+                changes,
+                missing,
+                f"could not set parameters: {getattr(err, 'stderr', err)}",
+            )
+    return changes, missing, None
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            # Parameter names, which may contain wildcards, mapped to values in
+            # the form `lctl get_param` reports them.
+            parameters=dict(type="dict", required=True),
+            # Record parameters on the MGS for all nodes, which is only possible
+            # on the node the MGS runs on, rather than set them on this node.
+            persistent=dict(type="bool", required=False, default=False),
+            lctl_path=dict(type="path", required=False, default=LCTL_CMD),
+        ),
+        supports_check_mode=True,
+    )
+
+    desired = module.params["parameters"]
+    if not desired:
+        module.exit_json(changed=False, changes={}, missing=[])
+
+    changes, missing, msg = apply_params(
+        desired,
+        module.params["persistent"],
+        module.check_mode,
+        module.params["lctl_path"],
+    )
+    if msg:
+        module.fail_json(changed=False, msg=msg, changes=changes)
+
+    module.exit_json(changed=len(changes) > 0, changes=changes, missing=missing)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,20 @@
 
 import os
 import subprocess
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.lustre_targets import (
+    split_nids,
+    target_inventory,
+    target_type_from_svname,
+)
+from ansible.module_utils.zpool_geometry import (
+    auto_mkfsopts,
+    fmt_mkfsoptions,
+    pool_geometry,
+)
 
 
 class InvalidNumberOfKeys(Exception):
@@ -15,8 +26,25 @@ class MissingPoolException(Exception):
     pass
 
 
+def wants_auto_mkfsopts(mkfsopts: Any) -> bool:
+    """
+    Tells whether ZFS properties should be derived from pool geometry, which is
+    asked for with `mkfsopts: auto` or with `auto: true` among other options,
+    which then take precedence over derived ones.
+    """
+    if isinstance(mkfsopts, dict):
+        return bool(mkfsopts.get("auto"))
+    return mkfsopts == "auto"
+
+
 class LustreFilesystem:
-    def __init__(self, poolname: str, mapping: Dict[str, Any], fsname="bsrfs"):
+    def __init__(
+        self,
+        poolname: str,
+        mapping: Dict[str, Any],
+        fsname="bsrfs",
+        geometry: Optional[Dict[str, Any]] = None,
+    ):
         if len(mapping) > 1:
             raise InvalidNumberOfKeys(f"dict must have one key/value pair: '{mapping}'")
 
@@ -32,12 +60,22 @@ class LustreFilesystem:
         self._index: int = settings.get("index", -1)  # set -1 as a sentinel
         self._mgsnode: List[str] = settings.get("mgsnode")
         self._mkfsopts: Dict[str, str] = settings["mkfsopts"]
+        if wants_auto_mkfsopts(self._mkfsopts):
+            overrides = self._mkfsopts if isinstance(self._mkfsopts, dict) else {}
+            self._mkfsopts = {
+                **auto_mkfsopts(self.target_type, geometry),
+                **{k: v for k, v in overrides.items() if k != "auto"},
+            }
         self._servicenode: List[str] = settings["servicenode"]
 
     @property
     def dataset_name(self) -> str:
         return self._dataset_name
 
+    @property
+    def poolname(self) -> str:
+        return self._poolname
+
     @property
     def index(self) -> int:
         return self._index
@@ -58,8 +96,7 @@ class LustreFilesystem:
 
     @property
     def fmt_mkfsoptions(self) -> str:
-        opts = " -o ".join([f"{k}={v}" for k, v in self._mkfsopts.items()])
-        return f"{opts}"
+        return fmt_mkfsoptions(self._mkfsopts)
 
     def fmt_servicenode(self):
         for n in self._servicenode:
@@ -74,6 +111,42 @@ class LustreFilesystem:
             else:
                 break
 
+    def drift(self, existing: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Compares properties of an already formatted target, as collected by
+        lustre_targets.target_inventory(...), against the requested
+        configuration and returns the differences.
+        """
+        if not existing.get("svname"):
+            return [
+                dict(
+                    dataset=self.dataset_name,
+                    field="svname",
+                    expected="a Lustre target",
+                    actual=None,
+                )
+            ]
+        expected = dict(
+            target_type=self.target_type,
+            fsname=self._fsname,
+        )
+        actual = dict(
+            target_type=target_type_from_svname(existing["svname"]),
+            fsname=existing.get("fsname"),
+        )
+        if self.target_type != "mgt":
+            if self._index != -1:
+                expected["index"] = self._index
+                actual["index"] = existing.get("index")
+            if self._mgsnode:
+                expected["mgsnode"] = sorted(self._mgsnode)
+                actual["mgsnode"] = sorted(split_nids(existing.get("mgsnode")))
+        return [
+            dict(dataset=self.dataset_name, field=k, expected=v, actual=actual[k])
+            for k, v in expected.items()
+            if actual[k] != v
+        ]
+
     def format_command(
         self, echo: bool = False, reformat: bool = False, dryrun: bool = False
     ) -> List[str]:
@@ -103,19 +176,6 @@ class LustreFilesystem:
         ]
 
 
-def filesystems(poolname: str) -> List[str]:
-    # libzfs_core delivered via python3-pyzfs 2.1.15-2.el8 does not, for
-    # whatever reason suppoprt seemingly basic operations like listing children.
-    # For this reason we are exec'ing `zfs` command instead of relying on
-    # libzfs_core.
-    datasets = (
-        subprocess.check_output(["zfs", "list", "-r", "-H", "-o", "name", poolname])
-        .decode()
-        .split()
-    )
-    return datasets
-
-
 def execute_cmd(cmd: List[str], run_cmd_func=subprocess.check_output):
     """
     Wrapper function for subprocess.check_output; allows for simplified testing
@@ -134,60 +194,233 @@ def execute_cmd(cmd: List[str], run_cmd_func=subprocess.check_output):
         return None, err
 
 
+def format_error(dataset: str, err: subprocess.CalledProcessError) -> Dict[str, Any]:
+    """Describes a failed command in a form suitable for module results."""
+    return dict(
+        dataset=dataset,
+        msg=err.stdout,
+        command=" ".join(err.cmd),
+        retcode=err.returncode,
+    )
+
+
+def format_filesystems(
+    filesystems: List[LustreFilesystem],
+    echo: bool = False,
+    reformat: bool = False,
+    dryrun: bool = False,
+    max_workers: int = 1,
+    run_cmd_func=subprocess.check_output,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Formats given filesystems running up to max_workers commands at a time and
+    returns outputs of all successful commands along with all errors. The MGT
+    is formatted before any MDT or OST and if it fails the rest are skipped.
+    """
+
+    def format_one(o: LustreFilesystem):
+        return execute_cmd(o.format_command(echo, reformat, dryrun), run_cmd_func)
+
+    results, errors = [], []
+    mgts = [o for o in filesystems if o.target_type == "mgt"]
+    others = [o for o in filesystems if o.target_type != "mgt"]
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        for batch in (mgts, others):
+            if errors:
+                for o in batch:
+                    errors.append(
+                        dict(dataset=o.dataset_name, msg="skipped, MGT format failed")
+                    )
+                break
+            # Results come back in the order of the batch, regardless of the
+            # order in which commands complete.
+            for o, (output, err) in zip(batch, executor.map(format_one, batch)):
+                if err:
+                    errors.append(format_error(o.dataset_name, err))
+                else:
+                    results.append(output)
+    return results, errors
+
+
+def index_collisions(
+    requested: List[LustreFilesystem], existing: Dict[str, Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Finds MDT and OST indexes claimed by more than one dataset, whether among
+    requested targets or between requested and already formatted targets.
+    """
+    claims: Dict[Tuple[str, int], List[str]] = dict()
+    for o in requested:
+        if o.target_type == "mgt" or o.index == -1:
+            continue
+        name = os.path.join(o.poolname, o.dataset_name)
+        claims.setdefault((o.target_type, o.index), []).append(name)
+    requested_names = set(n for names in claims.values() for n in names)
+    for name, details in existing.items():
+        target_type = target_type_from_svname(details.get("svname"))
+        index = details.get("index")
+        if target_type not in ("mdt", "ost") or index is None:
+            continue
+        if name in requested_names:
+            continue
+        claims.setdefault((target_type, index), []).append(name)
+    return [
+        dict(target_type=target_type, index=index, datasets=sorted(names))
+        for (target_type, index), names in sorted(claims.items())
+        if len(names) > 1
+    ]
+
+
+def plan_filesystems(
+    layout: Dict[str, List[Dict[str, Any]]],
+    existing: Dict[str, Dict[str, Any]],
+    echo: bool = False,
+    reformat: bool = False,
+    dryrun: bool = False,
+    geometry: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Tuple[Dict[str, Any], List[LustreFilesystem]]:
+    """
+    Computes, without running any commands, what it would take to bring the
+    given layout, i.e. pool names mapped to dataset details, into existence.
+    `existing` holds datasets on this system as collected by
+    lustre_targets.target_inventory(...), `geometry` pool names mapped to their
+    geometry as collected by zpool_geometry.pool_geometry(...). Returns the plan
+    along with the filesystems which must be formatted.
+    """
+    geometry = geometry or dict()
+    plan = dict(
+        create=[], present=[], unknown=[], drift=[], absent_pools=[], collisions=[]
+    )
+    requested, pending = [], []
+    for poolname, details in layout.items():
+        pool_present = poolname in existing
+        if not pool_present:
+            plan["absent_pools"].append(poolname)
+        for dataset in details:
+            o = LustreFilesystem(poolname, dataset, geometry=geometry.get(poolname))
+            requested.append(o)
+            name = os.path.join(poolname, o.dataset_name)
+            entry = dict(dataset=name, target_type=o.target_type, index=o.index)
+            # Datasets on pools imported elsewhere can be neither confirmed
+            # present nor created here.
+            if not pool_present:
+                plan["unknown"].append(entry)
+            elif name in existing:
+                plan["present"].append(entry)
+                plan["drift"].extend(o.drift(existing[name]))
+            else:
+                entry["command"] = o.format_command(echo, reformat, dryrun)
+                plan["create"].append(entry)
+                pending.append(o)
+    plan["collisions"] = index_collisions(requested, existing)
+    return plan, pending
+
+
 def main():
     module_args = dict(
-        poolname=dict(type="str", required=True),
-        details=dict(type="list", required=True),
+        poolname=dict(type="str", required=False),
+        details=dict(type="list", required=False),
+        # Pool names mapped to dataset details, for planning or formatting a
+        # layout which spans multiple pools at once.
+        layout=dict(type="dict", required=False),
+        # Datasets as reported by lustre_target_facts; when given no command is
+        # needed to determine what already exists.
+        existing_targets=dict(type="dict", required=False),
         dryrun=dict(type="bool", required=False),
         echo=dict(type="bool", required=False),
         reformat=dict(type="bool", required=False),
+        max_workers=dict(type="int", required=False, default=1),
     )
 
-    module = AnsibleModule(argument_spec=module_args)
-    details: Any = module.params["details"]
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_one_of=[("poolname", "layout")],
+        mutually_exclusive=[("poolname", "layout")],
+        required_together=[("poolname", "details")],
+    )
     dryrun = module.params["dryrun"] or False
     echo = module.params["echo"] or False
     poolname: str = module.params["poolname"]
     reformat = module.params["reformat"] or False
-
-    results = []
-    # List of all filesystems on the system, including the top-level, i.e.
-    # p<something>, e.g. `p01`.
-    existing_filesystems = filesystems(poolname)
+    max_workers: int = module.params["max_workers"]
+    layout = module.params["layout"] or {poolname: module.params["details"]}
+    existing = module.params["existing_targets"]
+
+    if existing is None:
+        # Inventory of all filesystems on the pool(s), including the top-level,
+        # i.e. p<something>, e.g. `p01`, along with their Lustre properties,
+        # collected with a single command. A layout may reference pools which
+        # are imported elsewhere, thus we ask for all pools imported here.
+        inventory, err = target_inventory([poolname] if poolname else [])
+        # Without an inventory every pool would look absent, and its targets
+        # unformatted.
+        if err:
+            module.fail_json(
+                changed=False,
+                msg=f"could not list existing targets: {str(err.stderr).strip()}",
+                stderr=err.stderr,
+                command=" ".join(err.cmd),
+                retcode=err.returncode,
+            )
+        existing = inventory.datasets
 
     # Check if the pool exists on this system.
-    if poolname not in existing_filesystems:
+    if poolname and poolname not in existing:
         raise MissingPoolException(f"poolname {poolname} missing")
 
-    for dataset in details:
-        o = LustreFilesystem(poolname, dataset)
-        # Check if the dataset already exists, meaning it was created
-        # previously.
-        if os.path.join(poolname, o.dataset_name) in existing_filesystems:
-            continue
-
-        # Generate the command line to be passed to `subprocess.check_output`.
-        cmd = o.format_command(echo, reformat, dryrun)
-
-        # Execute generated command and add its result to the list of results.
-        # We do this for each filesystem that must be created.
-        output, err = execute_cmd(cmd)
-
-        # On error we terminate the module and return the error.
+    # Geometry is only needed for pools imported here with datasets whose ZFS
+    # properties are derived from it, and is collected for all of them at once.
+    auto_pools = [
+        p
+        for p, details in layout.items()
+        if p in existing
+        and any(
+            wants_auto_mkfsopts(v.get("mkfsopts"))
+            for dataset in details
+            for v in dataset.values()
+        )
+    ]
+    geometry = dict()
+    if auto_pools:
+        geometry, err = pool_geometry(auto_pools)
         if err:
             module.fail_json(
                 changed=False,
-                msg=err.stdout,
+                msg=f"could not determine pool geometry: {err.stderr}",
                 command=" ".join(err.cmd),
                 retcode=err.returncode,
-                args=err.args[1],
             )
 
-        results.append(output)
+    # Already formatted targets are never touched, but we report where they
+    # differ from the requested configuration.
+    plan, pending = plan_filesystems(layout, existing, echo, reformat, dryrun, geometry)
+
+    if module.check_mode:
+        module.exit_json(changed=len(pending) > 0, plan=plan, drift=plan["drift"])
+
+    # Execute generated commands, at most max_workers at a time, collecting
+    # results and errors of every command rather than stopping at the first
+    # failure.
+    results, errors = format_filesystems(pending, echo, reformat, dryrun, max_workers)
+
+    # On error we terminate the module and return all errors, along with
+    # results of the commands which succeeded.
+    if errors:
+        first = errors[0]
+        module.fail_json(
+            changed=not any([dryrun, echo, len(results) == 0]),
+            msg=first["msg"],
+            command=first.get("command", ""),
+            retcode=first.get("retcode"),
+            errors=errors,
+            results=results,
+            drift=plan["drift"],
+        )
 
     # Once we are done processing all datasets we exit returning results.
     unchanged = any([dryrun, echo, len(results) == 0])
-    module.exit_json(changed=not unchanged, results=results)
+    module.exit_json(changed=not unchanged, results=results, drift=plan["drift"])
 
 
 if __name__ == "__main__":
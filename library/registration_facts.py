@@ -1,78 +1,31 @@
 #!/usr/bin/env python3
 
-import json
-import subprocess
-
 from ansible.module_utils.basic import AnsibleModule
-
-
-# @dataclass
-class Registration:
-    def __init__(self, version: int, customer: str, serial: str, created: str):
-        self.version = version
-        self.customer = customer
-        self.serial = serial
-        self.created = created
-
-
-def get_system_registration(output: str):
-    try:
-        decoded = json.loads(output)
-        return (
-            Registration(
-                decoded["Version"],
-                decoded["Customer"],
-                decoded["Serial"],
-                decoded["Created"],
-            ),
-            None,
-        )
-    except json.decoder.JSONDecodeError as e:
-        return Registration(-1, "", "", ""), e.msg
+from ansible.module_utils.fact_cache import DEFAULT_CACHE_DIR, FactCache, cached_probe
+from ansible.module_utils.node_probes import registration_probe, probe_signatures
 
 
 def main():
-    module = AnsibleModule(argument_spec={}, supports_check_mode=True)
+    module = AnsibleModule(
+        argument_spec=dict(
+            # Seconds facts are served from the on-node cache, 0 disables it.
+            cache_ttl=dict(type="int", required=False, default=0),
+            cache_dir=dict(type="path", required=False, default=DEFAULT_CACHE_DIR),
+        ),
+        supports_check_mode=True,
+    )
+    cache_ttl = module.params["cache_ttl"]
+    cache = FactCache(module.params["cache_dir"], cache_ttl) if cache_ttl else None
     try:
-        # Run the command
-        res = subprocess.check_output(
-            "bsradm -j per view".split(),
-            # Send STDERR to STDOUT to handle the system unregistered case.
-            # In this case the JSON object with an error and lack of
-            # registration indication is written to STDERR instead of STDOUT.
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-        # Parse and return structured data
-        registration, msg = get_system_registration(res)
-        # If there is a message, we encountered an error decoding JSON data.
-        if msg:
-            module.fail_json(msg=f"Error: {msg}")
-
-        facts = {
-            "persona": {
-                "version": registration.version,
-                "customer": registration.customer,
-                "serial": registration.serial,
-                "created": registration.created,
-            },
-            "system_is_registered": True,
-        }
-        module.exit_json(changed=False, ansible_facts=facts)
-    except subprocess.CalledProcessError:
-        module.exit_json(
-            changed=False,
-            ansible_facts={
-                "persona": {
-                    "version": -1,
-                    "customer": "na",
-                    "serial": "na",
-                    "created": "na",
-                },
-                "system_is_registered": False,
-            },
+        # A system which is not registered yields facts saying so rather than
+        # an error.
+        facts, cache_hit = cached_probe(
+            cache,
+            "registration",
+            probe_signatures()["registration"],
+            registration_probe,
         )
-        # module.fail_json(msg=f"Command failed: {e}")
+        module.exit_json(changed=False, ansible_facts=facts, cache_hit=cache_hit)
     except Exception as e:
         module.fail_json(msg=f"Error: {str(e)}")
 
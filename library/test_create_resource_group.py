@@ -0,0 +1,290 @@
+import json
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from .create_resource_group import (
+    HIAVADM_CMD,
+    HWADM_LIST_POOLS_CMD,
+    HWADM_RESCAN_CMD,
+    TRANSITION_RECHECK_INTERVAL,
+    PoolNotFoundException,
+    PoolNotRepairableException,
+    add_pools_to_resource_groups,
+    check_pools_until_settled,
+    retry_while_in_transition,
+    wait_for_pools_to_be_visible_on_both_sides,
+)
+
+
+class FakeWatcher:
+    """
+    Stands in for StatefileWatcher, recording waits. Unless told to sleep, it
+    returns at once as if a new revision was committed.
+    """
+
+    def __init__(self, statefile: str, sleep: bool = False):
+        self.statefile = statefile
+        self.sleep = sleep
+        self.waits = []
+
+    def wait_for_revision_change(self, revision, timeout):
+        self.waits.append((revision, timeout))
+        if self.sleep:
+            time.sleep(timeout)
+            return None
+        return (revision or 0) + 1
+
+
+class FlakyCommand:
+    """Fails with the given errors, one per call, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            return False, self.errors.pop(0)
+        return True, None
+
+
+def in_transition():
+    return subprocess.CalledProcessError(
+        1, [HIAVADM_CMD], b"", b"Cluster is currently in transition.\n"
+    )
+
+
+class FakeHiavadm:
+    """
+    Stands in for subprocess.run, answering hiavadm commands. Commands naming
+    one of the failing resource groups or pools exit with an error.
+    """
+
+    def __init__(self, failing=(), state=None):
+        self.failing = set(failing)
+        self.state = state or dict()
+        self.calls = []
+
+    def __call__(self, cmd, **kwargs):
+        self.calls.append(cmd)
+        if cmd[0] != HIAVADM_CMD:
+            raise OSError(f"unexpected command {cmd}")
+        if self.failing.intersection(cmd):
+            raise subprocess.CalledProcessError(1, cmd, b"", b"failed\n")
+        stdout = json.dumps(self.state).encode() if cmd[1:] == ["i", "dump"] else b""
+        return subprocess.CompletedProcess(cmd, 0, stdout, b"")
+
+
+class FakeHwadm:
+    """
+    Stands in for subprocess.run, answering hwadm commands of one side. A hung
+    hwadm answers nothing until killed once its timeout expires.
+    """
+
+    def __init__(self, visible=(), hung=False):
+        self.visible = list(visible)
+        self.hung = hung
+        self.calls = []
+        self.timeouts = []
+
+    def __call__(self, cmd, timeout=None, **kwargs):
+        self.calls.append(cmd)
+        self.timeouts.append(timeout)
+        if self.hung:
+            time.sleep(60 if timeout is None else timeout)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        if cmd == HWADM_LIST_POOLS_CMD:
+            stdout = json.dumps([{"Name": name} for name in self.visible]).encode()
+            return subprocess.CompletedProcess(cmd, 0, stdout, b"")
+        if cmd == HWADM_RESCAN_CMD:
+            return subprocess.CompletedProcess(
+                cmd, 0, b"Rescan started.\ncomplete.\n", b""
+            )
+        raise OSError(f"unexpected command {cmd}")
+
+
+class FakePeer:
+    """Stands in for PeerCommandRunner, running commands with a fake hwadm."""
+
+    def __init__(self, hwadm: FakeHwadm):
+        self.run = hwadm
+
+
+def cluster_state(pools):
+    return {
+        "ResourceGroups": [
+            {"Name": "RG01", "Pools": [dict(Name=name, **info)]}
+            for name, info in pools.items()
+        ]
+    }
+
+
+class TestCreateResourceGroup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.watcher = FakeWatcher(os.path.join(self.tmpdir.name, "serialized.dat"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_failing_pool_does_not_stop_others(self):
+        """Each pool of a batch must get its own result"""
+        hiavadm = FakeHiavadm(failing=["RG02"])
+        results = add_pools_to_resource_groups(
+            ["p01", "p02", "p03"], self.watcher, 1.0, "node1", run_cmd=hiavadm
+        )
+        self.assertEqual(list(results), ["p01", "p02", "p03"])
+        self.assertIsNone(results["p01"])
+        self.assertIsInstance(results["p02"], subprocess.CalledProcessError)
+        self.assertIsNone(results["p03"])
+        # Pool of the failed resource group is never added to it.
+        self.assertNotIn([HIAVADM_CMD, "u", "p", "--add", "RG02", "p02"], hiavadm.calls)
+        self.assertIn([HIAVADM_CMD, "u", "p", "--add", "RG03", "p03"], hiavadm.calls)
+
+    def test_failing_add_is_reported_for_its_pool(self):
+        """Failure to add a pool must be reported for that pool alone"""
+        hiavadm = FakeHiavadm(failing=["p01"])
+        results = add_pools_to_resource_groups(
+            ["p01", "p02"], self.watcher, 1.0, "node1", run_cmd=hiavadm
+        )
+        self.assertIsInstance(results["p01"], subprocess.CalledProcessError)
+        self.assertIsNone(results["p02"])
+
+    def test_check_results_keyed_by_pool(self):
+        """Problems of a pool must not be attributed to other pools"""
+        hiavadm = FakeHiavadm(
+            state=cluster_state(
+                {
+                    "p01": dict(Problems=[], CanRepair=False),
+                    "p02": dict(Problems=["broken"], CanRepair=False),
+                }
+            )
+        )
+        sleeps = []
+        results = check_pools_until_settled(
+            ["p01", "p02", "p03"], attempts=3, run_cmd=hiavadm, sleep=sleeps.append
+        )
+        self.assertIsNone(results["p01"])
+        self.assertIsInstance(results["p02"], PoolNotRepairableException)
+        self.assertIsInstance(results["p03"], PoolNotFoundException)
+        # Only the missing pool is checked again, once after each delay.
+        self.assertEqual(sleeps, [1, 2])
+        self.assertEqual(hiavadm.calls.count([HIAVADM_CMD, "i", "dump"]), 3)
+
+    def test_failing_repair_is_reported_for_repairable_pools(self):
+        """A failed repair must fail only the pools it was meant to fix"""
+        hiavadm = FakeHiavadm(
+            failing=["repair"],
+            state=cluster_state(
+                {
+                    "p01": dict(Problems=[], CanRepair=False),
+                    "p02": dict(Problems=["broken"], CanRepair=True),
+                }
+            ),
+        )
+        results = check_pools_until_settled(
+            ["p01", "p02"], run_cmd=hiavadm, sleep=lambda _: None
+        )
+        self.assertIsNone(results["p01"])
+        self.assertIsInstance(results["p02"], subprocess.CalledProcessError)
+
+    def wait_on_both_sides(self, local, remote, timeout):
+        started = time.monotonic()
+        res = wait_for_pools_to_be_visible_on_both_sides(
+            ["p01"], FakePeer(remote), timeout, run_cmd=local
+        )
+        return res, time.monotonic() - started
+
+    def test_visible_on_both_sides(self):
+        """Pools visible on both sides must not be waited for"""
+        local, remote = FakeHwadm(["p01"]), FakeHwadm(["p01"])
+        (missing, errors, durations), elapsed = self.wait_on_both_sides(
+            local, remote, 5.0
+        )
+        self.assertEqual(missing, {})
+        self.assertEqual(errors, {"local": [], "remote": []})
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(local.calls, [HWADM_LIST_POOLS_CMD])
+        self.assertEqual(remote.calls, [HWADM_LIST_POOLS_CMD])
+
+    def test_visible_locally_only(self):
+        """Only the peer must be rescanned if the pool is visible locally"""
+        local, remote = FakeHwadm(["p01"]), FakeHwadm()
+        (missing, _, durations), _ = self.wait_on_both_sides(local, remote, 0.3)
+        # Missing on the peer in both attempts, before and after the wait.
+        self.assertEqual(missing, {"p01": 2})
+        self.assertNotIn(HWADM_RESCAN_CMD, local.calls)
+        self.assertIn(HWADM_RESCAN_CMD, remote.calls)
+        self.assertLess(durations["local"], durations["remote"])
+
+    def test_visible_on_peer_only(self):
+        """Only the local system must be rescanned if the peer sees the pool"""
+        local, remote = FakeHwadm(), FakeHwadm(["p01"])
+        (missing, _, durations), _ = self.wait_on_both_sides(local, remote, 0.3)
+        # Missing locally in both attempts, before and after the wait.
+        self.assertEqual(missing, {"p01": 2})
+        self.assertIn(HWADM_RESCAN_CMD, local.calls)
+        self.assertNotIn(HWADM_RESCAN_CMD, remote.calls)
+        self.assertLess(durations["remote"], durations["local"])
+
+    def test_sides_share_deadline(self):
+        """Waiting on both sides must take the timeout once, not twice"""
+        local, remote = FakeHwadm(), FakeHwadm()
+        (missing, _, durations), elapsed = self.wait_on_both_sides(local, remote, 0.5)
+        # Missing on both sides in both attempts, before and after the wait.
+        self.assertEqual(missing, {"p01": 4})
+        self.assertGreaterEqual(elapsed, 0.5)
+        self.assertLess(elapsed, 0.9)
+        # Each side starts its clock a little after the deadline was set.
+        for duration in durations.values():
+            self.assertGreaterEqual(duration, 0.4)
+
+    def test_hung_peer_is_bounded_by_deadline(self):
+        """A peer whose hwadm hangs must not hold the wait past its deadline"""
+        local, remote = FakeHwadm(["p01"]), FakeHwadm(hung=True)
+        (missing, errors, _), elapsed = self.wait_on_both_sides(local, remote, 0.5)
+        self.assertLess(elapsed, 0.9)
+        self.assertGreaterEqual(missing["p01"], 1)
+        self.assertTrue(all(0 <= t <= 0.5 for t in remote.timeouts))
+        self.assertIn("timed out", errors["remote"][0])
+
+    def test_retries_while_in_transition(self):
+        """Attempts must be repeated once a new revision is committed"""
+        with open(self.watcher.statefile, "w") as fp:
+            json.dump({"Cluster": {"Revision": 7}}, fp)
+        func = FlakyCommand(in_transition(), in_transition())
+        ok, err = retry_while_in_transition(self.watcher, 10.0, func, "arg")
+        self.assertTrue(ok)
+        self.assertIsNone(err)
+        self.assertEqual(func.calls, 3)
+        # Revision is read before each attempt and waits never exceed the
+        # recheck interval.
+        self.assertEqual(self.watcher.waits, [(7, TRANSITION_RECHECK_INTERVAL)] * 2)
+
+    def test_other_errors_are_not_retried(self):
+        """Errors other than a transition must be returned at once"""
+        failure = subprocess.CalledProcessError(1, [HIAVADM_CMD], b"", b"no\n")
+        func = FlakyCommand(failure)
+        ok, err = retry_while_in_transition(self.watcher, 10.0, func)
+        self.assertFalse(ok)
+        self.assertIs(err, failure)
+        self.assertEqual(func.calls, 1)
+        self.assertEqual(self.watcher.waits, [])
+
+    def test_gives_up_on_timeout(self):
+        """Retrying must stop once the timeout passes"""
+        watcher = FakeWatcher(self.watcher.statefile, sleep=True)
+        func = FlakyCommand(*[in_transition() for _ in range(100)])
+        started = time.monotonic()
+        ok, err = retry_while_in_transition(watcher, 0.3, func)
+        elapsed = time.monotonic() - started
+        self.assertFalse(ok)
+        self.assertTrue(err.stderr.startswith(b"Cluster is currently"))
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 0.3 + TRANSITION_RECHECK_INTERVAL)
+        # The wait is capped by time remaining, not the recheck interval.
+        self.assertLessEqual(watcher.waits[0][1], 0.3)
+        self.assertEqual(func.calls, len(watcher.waits) + 1)
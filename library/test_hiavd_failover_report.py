@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import unittest
+from .hiavd_failover_report import (
+    failed_exports,
+    failovers,
+    hook_runs,
+    latency_summary,
+    logged_hosts,
+    percentile,
+    read_records,
+)
+
+
+def record(hook, host, run, op, duration, dataset="", rc=0, **extra):
+    return dict(
+        hook=hook,
+        host=host,
+        run=run,
+        pool="p01",
+        op=op,
+        dataset=dataset,
+        rc=rc,
+        mono=100.0,
+        duration=duration,
+        **extra,
+    )
+
+
+RECORDS = [
+    # Planned failover from node-a to node-b.
+    record("pre-export", "node-a", "a-1", "umount", 1.5, "p01/lustre-ost00"),
+    record("pre-export", "node-a", "a-1", "umount-targets", 1.5),
+    record("pre-export", "node-a", "a-1", "hook", 2.0, ts=1000.0),
+    record("post-import", "node-b", "b-1", "mount", 3.0, "p01/lustre-ost00"),
+    record("post-import", "node-b", "b-1", "mount-targets", 3.0),
+    record("post-import", "node-b", "b-1", "hook", 3.5, ts=1010.0),
+    # Forced takeover by node-a, without a pre-export on node-b.
+    record("post-import", "node-a", "a-2", "mount-targets", 4.0, rc=1),
+    record("post-import", "node-a", "a-2", "hook", 4.0, rc=1, ts=2000.0),
+    # Pre-export which never finished.
+    record("pre-export", "node-a", "a-3", "umount-targets", 60.0),
+]
+
+
+class TestFailoverReport(unittest.TestCase):
+    def test_read_records_skips_garbage(self):
+        """Unparseable lines must be counted, missing files ignored"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "hooks.log")
+            with open(path, "w") as fp:
+                for r in RECORDS[:3]:
+                    fp.write(json.dumps(r) + "\n")
+                fp.write('{"hook":"pre-exp\n\n')
+            records, skipped = read_records([path, path + ".missing"])
+        self.assertEqual(records, RECORDS[:3])
+        self.assertEqual(skipped, 1)
+
+    def test_failover_breakdown(self):
+        """Runs must pair up into failovers with per-component latencies"""
+        result = failovers(hook_runs(RECORDS))
+        self.assertEqual(len(result), 2)
+        planned, forced = result
+        self.assertTrue(planned["planned"])
+        self.assertEqual(
+            (planned["from_host"], planned["to_host"]), ("node-a", "node-b")
+        )
+        self.assertEqual(planned["pre_export"], 2.0)
+        self.assertEqual(planned["export_import"], 8.0)
+        self.assertEqual(planned["post_import"], 3.5)
+        self.assertEqual(planned["total"], 13.5)
+        self.assertEqual(
+            planned["phases"], {"umount-targets": 1.5, "mount-targets": 3.0}
+        )
+        self.assertEqual(planned["slowest_dataset"], "p01/lustre-ost00")
+        self.assertFalse(forced["planned"])
+        self.assertIsNone(forced["pre_export"])
+        self.assertEqual(forced["total"], 4.0)
+        self.assertEqual(forced["rc"], 1)
+
+    def test_one_sided_log(self):
+        """Without the log of the peer no failover can be called unplanned"""
+        result = failovers(hook_runs([r for r in RECORDS if r["host"] == "node-b"]))
+        self.assertEqual(len(result), 1)
+        self.assertIsNone(result[0]["planned"])
+        self.assertIsNone(result[0]["from_host"])
+        self.assertIsNone(result[0]["export_import"])
+        self.assertEqual(result[0]["total"], 3.5)
+
+    def test_logs_of_both_nodes_from_separate_files(self):
+        """Logs fetched from each node must pair up into failovers"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for host in ("node-a", "node-b"):
+                paths.append(os.path.join(tmpdir, f"{host}.log"))
+                with open(paths[-1], "w") as fp:
+                    for r in RECORDS:
+                        if r["host"] == host:
+                            fp.write(json.dumps(r) + "\n")
+            records, _ = read_records(paths)
+        runs = hook_runs(records)
+        self.assertEqual(logged_hosts(runs), ["node-a", "node-b"])
+        planned, forced = failovers(runs)
+        self.assertTrue(planned["planned"])
+        self.assertEqual(planned["export_import"], 8.0)
+        self.assertFalse(forced["planned"])
+
+    def test_stuck_target_is_reported(self):
+        """A target the pre-export hook could not unmount must be named"""
+        records = [
+            record("pre-export", "node-a", "a-4", "umount", 1.0, "p01/lustre-ost00"),
+            record(
+                "pre-export",
+                "node-a",
+                "a-4",
+                "umount-stuck",
+                62.0,
+                "p01/lustre-ost01",
+                rc=124,
+            ),
+            record("pre-export", "node-a", "a-4", "umount-targets", 62.0, rc=1),
+            record("pre-export", "node-a", "a-4", "hook", 62.5, rc=1, ts=3000.0),
+        ]
+        runs = hook_runs(RECORDS + records)
+        [failed] = failed_exports(runs)
+        self.assertEqual(failed["host"], "node-a")
+        self.assertEqual(failed["rc"], 1)
+        self.assertEqual(
+            failed["failed_datasets"], {"p01/lustre-ost01": "umount-stuck"}
+        )
+        # Once imported elsewhere, the failover names the stuck target as well.
+        records.append(record("post-import", "node-b", "b-4", "hook", 3.0, ts=3070.0))
+        failover = failovers(hook_runs(RECORDS + records))[-1]
+        self.assertEqual(failover["from_host"], "node-a")
+        self.assertEqual(
+            failover["failed_datasets"], {"p01/lustre-ost01": "umount-stuck"}
+        )
+
+    def test_summary(self):
+        """Percentiles must only cover failovers where the component is known"""
+        summary = latency_summary(failovers(hook_runs(RECORDS)), [50, 99.9])
+        self.assertEqual(
+            summary["total"], {"count": 2, "max": 13.5, "p50": 4.0, "p99.9": 13.5}
+        )
+        self.assertEqual(summary["pre_export"]["count"], 1)
+
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 11)]
+        self.assertEqual(percentile(values, 50), 5.0)
+        self.assertEqual(percentile(values, 90), 9.0)
+        self.assertEqual(percentile(values, 100), 10.0)
+        self.assertEqual(percentile(values, 1), 1.0)
@@ -0,0 +1,185 @@
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from .import_zfs_pool import (
+    import_pools,
+    parse_importable_pools,
+    pool_state,
+    resolve_device_paths,
+)
+
+ZPOOL_IMPORT_OUTPUT = """   pool: p01
+     id: 1234567890123456789
+  state: ONLINE
+ action: The pool can be imported using its name or numeric identifier.
+ config:
+
+	p01                         ONLINE
+	  raidz2-0                  ONLINE
+	    scsi-35000c500a1b2c3d4  ONLINE
+
+   pool: p02
+     id: 9876543210987654321
+  state: DEGRADED
+status: One or more devices are missing from the system.
+ action: The pool can be imported despite missing or damaged devices.
+ config:
+
+	p02                         DEGRADED
+	  mirror-0                  DEGRADED
+	    scsi-35000c500a1b2c3d5  ONLINE
+	    1122334455667788        UNAVAIL  was /dev/disk/by-id/scsi-35000c500a1b2c3d6
+	logs
+	  scsi-35000c500a1b2c3d7    ONLINE
+"""
+
+
+class TestImportZFSPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.kstat_dir = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def set_state(self, poolname: str, state: str):
+        os.makedirs(os.path.join(self.kstat_dir, poolname), exist_ok=True)
+        with open(os.path.join(self.kstat_dir, poolname, "state"), "w") as fp:
+            fp.write(state + "\n")
+
+    def test_parse_importable_pools(self):
+        """Every listed pool must be found along with its id and state"""
+        self.assertEqual(
+            parse_importable_pools(ZPOOL_IMPORT_OUTPUT),
+            [
+                dict(
+                    name="p01",
+                    id="1234567890123456789",
+                    state="ONLINE",
+                    devices=[dict(name="scsi-35000c500a1b2c3d4", state="ONLINE")],
+                ),
+                dict(
+                    name="p02",
+                    id="9876543210987654321",
+                    state="DEGRADED",
+                    devices=[
+                        dict(name="scsi-35000c500a1b2c3d5", state="ONLINE"),
+                        dict(name="1122334455667788", state="UNAVAIL"),
+                        dict(name="scsi-35000c500a1b2c3d7", state="ONLINE"),
+                    ],
+                ),
+            ],
+        )
+        self.assertEqual(parse_importable_pools(""), [])
+
+    def test_resolve_device_paths(self):
+        """Devices found by the scan must resolve against the search paths"""
+        by_id = os.path.join(self.tmpdir.name, "by-id")
+        os.makedirs(by_id)
+        for name in ("scsi-35000c500a1b2c3d5", "scsi-35000c500a1b2c3d7"):
+            open(os.path.join(by_id, name), "w").close()
+        devices = parse_importable_pools(ZPOOL_IMPORT_OUTPUT)[1]["devices"]
+        # Devices which the scan did not find are left out.
+        self.assertEqual(
+            resolve_device_paths(devices, [self.kstat_dir, by_id]),
+            [
+                os.path.join(by_id, "scsi-35000c500a1b2c3d5"),
+                os.path.join(by_id, "scsi-35000c500a1b2c3d7"),
+            ],
+        )
+        # Unless every device is resolved, the search paths must be scanned.
+        devices.append(dict(name="scsi-elsewhere", state="ONLINE"))
+        self.assertIsNone(resolve_device_paths(devices, [by_id]))
+        self.assertIsNone(resolve_device_paths([], [by_id]))
+
+    def test_pool_state(self):
+        """State is read from kstat, pools which are not imported have none"""
+        self.set_state("p01", "ONLINE")
+        self.assertEqual(pool_state("p01", self.kstat_dir), "ONLINE")
+        self.assertIsNone(pool_state("p02", self.kstat_dir))
+
+    def test_import_pools_concurrently(self):
+        """Pools must be imported by id at once and report state afterwards"""
+        calls = []
+        lock = threading.Lock()
+
+        def run_cmd(cmd, **kwargs):
+            with lock:
+                calls.append(cmd)
+            time.sleep(0.2)
+            if cmd[-1] == "2":
+                raise subprocess.CalledProcessError(1, cmd, b"", b"I/O error")
+            self.set_state("p01", "ONLINE")
+            return subprocess.CompletedProcess(cmd, 0)
+
+        start = time.monotonic()
+        outcomes = import_pools(
+            {"p01": "1", "p02": "2"},
+            ["/dev/disk/by-id"],
+            max_workers=4,
+            run_cmd=run_cmd,
+            kstat_dir=self.kstat_dir,
+        )
+        elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 0.35)
+        self.assertIn(
+            [
+                "/usr/sbin/zpool",
+                "import",
+                "-d",
+                "/dev/disk/by-id",
+                "-o",
+                "cachefile=none",
+                "1",
+            ],
+            calls,
+        )
+        self.assertTrue(outcomes["p01"]["changed"])
+        self.assertEqual(outcomes["p01"]["state"], "ONLINE")
+        self.assertTrue(outcomes["p02"]["failed"])
+        self.assertEqual(outcomes["p02"]["returncode"], 1)
+
+    def test_import_pools_from_scanned_devices(self):
+        """Pools with known devices must not scan the search paths again"""
+        calls = []
+
+        def run_cmd(cmd, **kwargs):
+            calls.append(cmd)
+            return subprocess.CompletedProcess(cmd, 0)
+
+        import_pools(
+            {"p01": "1", "p02": "2"},
+            ["/dev/disk/by-id"],
+            max_workers=1,
+            run_cmd=run_cmd,
+            kstat_dir=self.kstat_dir,
+            device_paths={"p01": ["/dev/disk/by-id/a", "/dev/disk/by-id/b"]},
+        )
+        self.assertEqual(
+            calls,
+            [
+                [
+                    "/usr/sbin/zpool",
+                    "import",
+                    "-d",
+                    "/dev/disk/by-id/a",
+                    "-d",
+                    "/dev/disk/by-id/b",
+                    "-o",
+                    "cachefile=none",
+                    "1",
+                ],
+                [
+                    "/usr/sbin/zpool",
+                    "import",
+                    "-d",
+                    "/dev/disk/by-id",
+                    "-o",
+                    "cachefile=none",
+                    "2",
+                ],
+            ],
+        )
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import ansible.module_utils.basic
+from . import hiavd_facts, ipmi_facts, lustre_node_facts
+
+HIAVD_FACTS = {"hiavd": {"version": "1.2.3", "new_configuration": False}}
+IPMI_FACTS = {"ipmi_ip_address": "10.1.0.1", "ipmi_present": True, "ipmi_lan": {}}
+
+
+def run_module(main, **args):
+    """Runs a module's entry point with the given arguments, returning its result."""
+    stdout = io.StringIO()
+    with mock.patch.object(
+        ansible.module_utils.basic,
+        "_ANSIBLE_ARGS",
+        json.dumps({"ANSIBLE_MODULE_ARGS": args}).encode(),
+    ), contextlib.redirect_stdout(stdout):
+        try:
+            main()
+        except SystemExit:
+            pass
+    return json.loads(stdout.getvalue())
+
+
+class TestSharedFactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = dict(
+            cache_ttl=60, cache_dir=os.path.join(self.tmpdir.name, "cache")
+        )
+        self.paths = dict(
+            config_path=os.path.join(self.tmpdir.name, "hiavd.conf"),
+            statefile_path=os.path.join(self.tmpdir.name, "serialized.dat"),
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hiavd_facts_served_across_modules(self):
+        """Modules probing hiavd with the same parameters must share facts"""
+        probe = mock.Mock(return_value=HIAVD_FACTS)
+        with mock.patch.object(
+            lustre_node_facts, "hiavd_probe", probe
+        ), mock.patch.object(hiavd_facts, "hiavd_probe", probe):
+            first = run_module(
+                lustre_node_facts.main,
+                probes=["hiavd"],
+                revision_id=2,
+                **self.paths,
+                **self.cache,
+            )
+            second = run_module(
+                hiavd_facts.main, revision_id=2, **self.paths, **self.cache
+            )
+            self.assertEqual(first["cache_hit"], {"hiavd": False})
+            self.assertTrue(second["cache_hit"])
+            self.assertEqual(second["ansible_facts"], HIAVD_FACTS)
+            self.assertEqual(probe.call_count, 1)
+            # Facts probed with another initial revision are not served.
+            third = run_module(
+                hiavd_facts.main, revision_id=3, **self.paths, **self.cache
+            )
+            self.assertFalse(third["cache_hit"])
+
+    def test_ipmi_facts_served_across_modules(self):
+        """Modules probing IPMI on the default channels must share facts"""
+        probe = mock.Mock(return_value=IPMI_FACTS)
+        with mock.patch.object(
+            lustre_node_facts, "ipmi_probe", probe
+        ), mock.patch.object(ipmi_facts, "ipmi_probe", probe):
+            first = run_module(lustre_node_facts.main, probes=["ipmi"], **self.cache)
+            second = run_module(ipmi_facts.main, **self.cache)
+            self.assertEqual(first["cache_hit"], {"ipmi": False})
+            self.assertTrue(second["cache_hit"])
+            self.assertEqual(probe.call_count, 1)
+            third = run_module(ipmi_facts.main, channels=[1], **self.cache)
+            self.assertFalse(third["cache_hit"])
@@ -0,0 +1,189 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from .lustre_tunables import (
+    apply_params,
+    diff_params,
+    get_params,
+    parse_get_param,
+    parse_llog_params,
+    set_params,
+)
+
+# Stands in for lctl, keeping parameters in a JSON file next to it and logging
+# every invocation. Only a node with an `mgs` file next to it acts as the MGS,
+# where persistent parameters are recorded in llog.json.
+STUB_LCTL = """#!{python}
+import fnmatch, json, os, sys
+here = os.path.dirname(os.path.abspath(__file__))
+state_file = os.path.join(here, "params.json")
+with open(state_file) as fp:
+    params = json.load(fp)
+with open(os.path.join(here, "calls.log"), "a") as fp:
+    fp.write(" ".join(sys.argv[1:]) + "\\n")
+rc = 0
+mgs = os.path.exists(os.path.join(here, "mgs"))
+llog_file = os.path.join(here, "llog.json")
+llog = json.load(open(llog_file)) if os.path.exists(llog_file) else []
+if sys.argv[1:3] == ["--device", "MGS"]:
+    if not mgs:
+        print("no device found for name MGS: No such device", file=sys.stderr)
+        sys.exit(19)
+    for index, (name, value) in enumerate(llog, 2):
+        print(f"- {{{{ index: {{index}}, event: set_param, device: general, "
+              f"parameter: {{name}}, value: {{value}} }}}}")
+elif sys.argv[1] == "get_param":
+    for pattern in sys.argv[2:]:
+        names = [n for n in params if fnmatch.fnmatchcase(n, pattern)]
+        if not names:
+            print(f"error: get_param: param_path '{{pattern}}': No such file",
+                  file=sys.stderr)
+            rc = 2
+        for name in names:
+            print(f"{{name}}={{params[name]}}")
+elif sys.argv[1:3] == ["set_param", "-P"]:
+    if not mgs:
+        sys.exit(1)
+    llog += [arg.split("=", 1) for arg in sys.argv[3:]]
+    with open(llog_file, "w") as fp:
+        json.dump(llog, fp)
+elif sys.argv[1] == "set_param":
+    for arg in sys.argv[2:]:
+        pattern, _, value = arg.partition("=")
+        for name in params:
+            if fnmatch.fnmatchcase(name, pattern):
+                params[name] = value
+    with open(state_file, "w") as fp:
+        json.dump(params, fp)
+sys.exit(rc)
+"""
+
+PARAMS = {
+    "ost.OSS.ost_io.threads_max": "256",
+    "obdfilter.bsrfs-OST0000.brw_size": "1",
+    "obdfilter.bsrfs-OST0001.brw_size": "4",
+    "osd-zfs.bsrfs-OST0000.readcache_max_filesize": "18446744073709551615",
+}
+
+
+class TestLustreTunables(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lctl = os.path.join(self.tmpdir.name, "lctl")
+        with open(self.lctl, "w") as fp:
+            fp.write(STUB_LCTL.format(python=sys.executable))
+        os.chmod(self.lctl, stat.S_IRWXU)
+        with open(os.path.join(self.tmpdir.name, "params.json"), "w") as fp:
+            json.dump(PARAMS, fp)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def calls(self):
+        try:
+            with open(os.path.join(self.tmpdir.name, "calls.log")) as fp:
+                return fp.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def test_parse_get_param_skips_continuation_lines(self):
+        self.assertEqual(
+            parse_get_param("a.b=1\na.stats=\nsnapshot_time 1.0 secs.nsecs\n"),
+            {"a.b": "1", "a.stats": ""},
+        )
+
+    def test_diff_params_with_wildcards(self):
+        changes, missing = diff_params(
+            {
+                "obdfilter.*.brw_size": 4,
+                "ost.OSS.ost_io.threads_max": 256,
+                "mds.MDS.mdt.threads_max": 512,
+            },
+            PARAMS,
+        )
+        self.assertEqual(
+            changes,
+            {
+                "obdfilter.*.brw_size": dict(
+                    before={"obdfilter.bsrfs-OST0000.brw_size": "1"}, after="4"
+                )
+            },
+        )
+        self.assertEqual(missing, ["mds.MDS.mdt.threads_max"])
+
+    def test_changed_parameters_are_set_in_one_call(self):
+        desired = {
+            "obdfilter.*.brw_size": 4,
+            "ost.OSS.ost_io.threads_max": 512,
+            "osd-zfs.*.readcache_max_filesize": "18446744073709551615",
+            "mds.MDS.mdt.threads_max": 512,
+        }
+        current, err = get_params(list(desired), self.lctl)
+        self.assertIsNone(err)
+        self.assertEqual(current, PARAMS)
+        changes, _ = diff_params(desired, current)
+        values = {name: change["after"] for name, change in changes.items()}
+        self.assertIsNone(set_params(values, lctl=self.lctl))
+        self.assertEqual(
+            self.calls()[1],
+            "set_param obdfilter.*.brw_size=4 ost.OSS.ost_io.threads_max=512",
+        )
+        # A second run finds nothing left to change.
+        current, err = get_params(list(desired), self.lctl)
+        self.assertEqual(diff_params(desired, current)[0], {})
+        self.assertEqual(len(self.calls()), 3)
+
+    def test_get_params_fails_without_any_value(self):
+        _, err = get_params(["mds.MDS.mdt.threads_max"], self.lctl)
+        self.assertEqual(err.returncode, 2)
+        _, err = get_params(["ost.*"], os.path.join(self.tmpdir.name, "missing"))
+        self.assertIsInstance(err, OSError)
+
+    def test_parse_llog_params(self):
+        """The last value recorded for a parameter must win"""
+        output = (
+            "- { index: 2, event: set_param, device: general, "
+            "parameter: obdfilter.*.brw_size, value: 1 }\n"
+            "- { index: 3, event: set_param, device: general, "
+            "parameter: obdfilter.*.brw_size, value: 4 }\n"
+        )
+        self.assertEqual(parse_llog_params(output), {"obdfilter.*.brw_size": "4"})
+
+    def test_persistent_parameters_only_on_mgs(self):
+        """set_param -P must never be issued on a node other than the MGS"""
+        desired = {"obdfilter.*.brw_size": 4}
+        changes, _, msg = apply_params(desired, persistent=True, lctl=self.lctl)
+        self.assertIn("only be set on the MGS", msg)
+        self.assertEqual(changes, {})
+        self.assertFalse([c for c in self.calls() if c.startswith("set_param")])
+
+    def test_persistent_parameters_compared_with_mgs_records(self):
+        """Parameters recorded on the MGS must only be recorded once"""
+        open(os.path.join(self.tmpdir.name, "mgs"), "w").close()
+        desired = {"obdfilter.*.brw_size": 4, "mds.MDS.mdt.threads_max": 512}
+        changes, missing, msg = apply_params(desired, persistent=True, lctl=self.lctl)
+        self.assertIsNone(msg)
+        self.assertEqual(missing, [])
+        # Targets on other nodes are not visible on the MGS, so nothing is
+        # compared with live values.
+        self.assertEqual(changes["obdfilter.*.brw_size"], dict(before={}, after="4"))
+        self.assertIn(
+            "set_param -P obdfilter.*.brw_size=4 mds.MDS.mdt.threads_max=512",
+            self.calls(),
+        )
+        changes, _, _ = apply_params(desired, persistent=True, lctl=self.lctl)
+        self.assertEqual(changes, {})
+        changes, _, _ = apply_params(
+            {"obdfilter.*.brw_size": 16},
+            persistent=True,
+            check_mode=True,
+            lctl=self.lctl,
+        )
+        self.assertEqual(
+            changes["obdfilter.*.brw_size"],
+            dict(before={"obdfilter.*.brw_size": "4"}, after="16"),
+        )
+        self.assertEqual(len([c for c in self.calls() if "-P" in c]), 1)
@@ -1,6 +1,13 @@
 from subprocess import CalledProcessError
+import threading
+import time
 import unittest
-from .make_lustre_zfs import execute_cmd, LustreFilesystem
+from .make_lustre_zfs import (
+    execute_cmd,
+    format_filesystems,
+    plan_filesystems,
+    LustreFilesystem,
+)
 
 
 class TestMakeLustreZFSDatasets(unittest.TestCase):
@@ -247,3 +254,217 @@ class TestMakeLustreZFSDatasets(unittest.TestCase):
                     arg.startswith("--mgsnode"),
                     f"argument[{idx}]: unexpected argument '{arg}'",
                 )
+
+    def test_format_filesystems_mgt_first_and_concurrent(self):
+        """MGT must be formatted first, remaining targets concurrently"""
+        names = ["ost01", "ost02", "mgt01", "mdt01", "ost03"]
+        filesystems = [
+            LustreFilesystem(
+                "ptest",
+                {name: {"index": 0, "mkfsopts": {}, "servicenode": []}},
+            )
+            for name in names
+        ]
+        lock = threading.Lock()
+        started, running, peak = [], [0], [0]
+
+        def run_cmd(cmd, **_):
+            with lock:
+                started.append(cmd[-1])
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return cmd[-1]
+
+        results, errors = format_filesystems(
+            filesystems, max_workers=4, run_cmd_func=run_cmd
+        )
+        self.assertEqual(errors, [])
+        self.assertEqual(started[0], "ptest/mgt01")
+        self.assertEqual(
+            results,
+            ["ptest/mgt01", "ptest/ost01", "ptest/ost02", "ptest/mdt01", "ptest/ost03"],
+        )
+        self.assertGreater(peak[0], 1)
+
+    def test_format_filesystems_collects_all_errors(self):
+        """Every failure must be reported, not only the first one"""
+        filesystems = [
+            LustreFilesystem(
+                "ptest", {name: {"index": 0, "mkfsopts": {}, "servicenode": []}}
+            )
+            for name in ("ost01", "ost02", "ost03")
+        ]
+
+        def run_cmd(cmd, **_):
+            if cmd[-1] == "ptest/ost02":
+                return cmd[-1]
+            raise CalledProcessError(returncode=1, cmd=cmd, output="poof!")
+
+        results, errors = format_filesystems(
+            filesystems, max_workers=3, run_cmd_func=run_cmd
+        )
+        self.assertEqual(results, ["ptest/ost02"])
+        self.assertEqual([e["dataset"] for e in errors], ["ost01", "ost03"])
+        self.assertTrue(all(e["retcode"] == 1 for e in errors))
+
+    def test_format_filesystems_skips_targets_after_mgt_failure(self):
+        """No other target may be formatted if the MGT could not be"""
+        filesystems = [
+            LustreFilesystem(
+                "ptest", {name: {"index": 0, "mkfsopts": {}, "servicenode": []}}
+            )
+            for name in ("mgt01", "mdt01")
+        ]
+        calls = []
+
+        def run_cmd(cmd, **_):
+            calls.append(cmd[-1])
+            raise CalledProcessError(returncode=1, cmd=cmd, output="poof!")
+
+        results, errors = format_filesystems(filesystems, run_cmd_func=run_cmd)
+        self.assertEqual(calls, ["ptest/mgt01"])
+        self.assertEqual(results, [])
+        self.assertEqual([e["dataset"] for e in errors], ["mgt01", "mdt01"])
+
+    def test_drift(self):
+        """Differences between existing and requested targets must be reported"""
+        o = LustreFilesystem(
+            "p01",
+            {
+                "ost01": {
+                    "index": 1,
+                    "mkfsopts": {},
+                    "mgsnode": ["192.168.2.21@o2ib", "192.168.2.23@o2ib"],
+                    "servicenode": [],
+                }
+            },
+        )
+        matching = {
+            "type": "filesystem",
+            "svname": "bsrfs-OST0001",
+            "fsname": "bsrfs",
+            "index": 1,
+            "mgsnode": "192.168.2.23@o2ib:192.168.2.21@o2ib",
+        }
+        self.assertEqual(o.drift(matching), [])
+
+        drifted = dict(matching, fsname="otherfs", index=2)
+        self.assertEqual(
+            [(d["field"], d["expected"], d["actual"]) for d in o.drift(drifted)],
+            [("fsname", "bsrfs", "otherfs"), ("index", 1, 2)],
+        )
+
+        not_a_target = dict(matching, svname=None)
+        self.assertEqual([d["field"] for d in o.drift(not_a_target)], ["svname"])
+
+    def test_plan_filesystems(self):
+        """Plan must split targets into create, present and unknown and find collisions"""
+
+        def target(name, index):
+            return {name: {"index": index, "mkfsopts": {}, "servicenode": []}}
+
+        layout = {
+            "p01": [target("mgt01", 0), target("ost01", 0), target("ost02", 1)],
+            "p02": [target("ost01", 1), target("mdt01", 0)],
+            "p03": [target("ost01", 2)],
+        }
+        existing = {
+            "p01": {"svname": None},
+            "p01/ost01": {"svname": "bsrfs-OST0000", "fsname": "bsrfs", "index": 0},
+            "p02": {"svname": None},
+            "p02/ost09": {"svname": "bsrfs-OST0002", "fsname": "bsrfs", "index": 2},
+        }
+        plan, pending = plan_filesystems(layout, existing)
+        self.assertEqual(
+            [e["dataset"] for e in plan["create"]],
+            ["p01/mgt01", "p01/ost02", "p02/ost01", "p02/mdt01"],
+        )
+        self.assertEqual([e["dataset"] for e in plan["present"]], ["p01/ost01"])
+        self.assertEqual([e["dataset"] for e in plan["unknown"]], ["p03/ost01"])
+        self.assertEqual(plan["absent_pools"], ["p03"])
+        self.assertEqual(plan["drift"], [])
+        self.assertEqual(
+            plan["collisions"],
+            [
+                {
+                    "target_type": "ost",
+                    "index": 1,
+                    "datasets": ["p01/ost02", "p02/ost01"],
+                },
+                {
+                    "target_type": "ost",
+                    "index": 2,
+                    "datasets": ["p02/ost09", "p03/ost01"],
+                },
+            ],
+        )
+        self.assertEqual(
+            [o.dataset_name for o in pending], ["mgt01", "ost02", "ost01", "mdt01"]
+        )
+        self.assertEqual(
+            plan["create"][0]["command"][:2], ["mkfs.lustre", "--fsname=bsrfs"]
+        )
+
+    def test_plan_filesystems_scales(self):
+        """Planning thousands of targets must stay cheap"""
+        layout = {
+            f"p{p:03}": [
+                {
+                    f"ost{i:03}": {
+                        "index": p * 100 + i,
+                        "mkfsopts": {},
+                        "servicenode": [],
+                    }
+                }
+                for i in range(100)
+            ]
+            for p in range(50)
+        }
+        existing = {pool: {"svname": None} for pool in layout}
+        start = time.monotonic()
+        plan, pending = plan_filesystems(layout, existing)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(len(pending), 5000)
+        self.assertEqual(plan["collisions"], [])
+
+    def test_auto_mkfsopts_from_geometry(self):
+        """Derived ZFS properties follow pool geometry, given ones take precedence"""
+        layout = {
+            "p01": [
+                {"ost01": {"index": 1, "mkfsopts": "auto", "servicenode": []}},
+                {
+                    "ost02": {
+                        "index": 2,
+                        "mkfsopts": {"auto": True, "compression": "zstd"},
+                        "servicenode": [],
+                    }
+                },
+                {"mdt01": {"index": 0, "mkfsopts": "auto", "servicenode": []}},
+            ],
+        }
+        geometry = {
+            "p01": {
+                "ashift": 13,
+                "max_recordsize": 16 * 1024 * 1024,
+                "vdevs": [{"type": "raidz", "parity": 2, "width": 10}],
+            }
+        }
+        existing = {"p01": {"svname": None}}
+        _, pending = plan_filesystems(layout, existing, geometry=geometry)
+        self.assertEqual(
+            [o.fmt_mkfsoptions for o in pending],
+            [
+                "recordsize=2M -o dnodesize=auto -o xattr=sa"
+                " -o compression=lz4 -o mountpoint=none",
+                "recordsize=2M -o dnodesize=auto -o xattr=sa"
+                " -o compression=zstd -o mountpoint=none",
+                "recordsize=128K -o dnodesize=auto -o xattr=sa"
+                " -o compression=lz4 -o mountpoint=none",
+            ],
+        )
+        # Without geometry, defaults of each target type apply.
+        _, pending = plan_filesystems(layout, existing)
+        self.assertTrue(pending[0].fmt_mkfsoptions.startswith("recordsize=1M "))
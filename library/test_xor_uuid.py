@@ -0,0 +1,64 @@
+import unittest
+import uuid
+
+from ansible.module_utils.cluster_identity import (
+    cluster_identity,
+    fnv1a_32,
+    ha_cluster_identities,
+)
+from ansible.module_utils.ha_pairs import ha_pair_records
+from .xor_uuid import byte_xor
+from .xor_uuid import fnv1a_32 as module_fnv1a_32
+
+UUIDS = [
+    ("4c4c4544-0051-3010-8052-b4c04f4a4d32", "4c4c4544-0051-3010-8053-b4c04f4a4d32"),
+    ("00000000-0000-0000-0000-000000000000", "ffffffff-ffff-ffff-ffff-ffffffffffff"),
+    ("9a1b6c2e-44d0-4f3a-b1e7-0c5d2f8e6a91", "9a1b6c2e-44d0-4f3a-b1e7-0c5d2f8e6a91"),
+]
+
+
+def module_identity(uuid1: str, uuid2: str):
+    """Computes the identity the way the xor_uuid module does."""
+    xored = byte_xor(uuid.UUID(uuid1).bytes, uuid.UUID(uuid2).bytes)
+    return {"guid_hash": module_fnv1a_32(xored), "guid": str(uuid.UUID(bytes=xored))}
+
+
+class TestXorUUID(unittest.TestCase):
+    def test_cluster_identity_matches_module(self):
+        """The controller must compute the identity the xor_uuid module does"""
+        for uuid1, uuid2 in UUIDS:
+            self.assertEqual(
+                cluster_identity(uuid1, uuid2), module_identity(uuid1, uuid2)
+            )
+
+    def test_ha_cluster_identities(self):
+        """Every host, witness included, must get the identity of its pair"""
+        hosts = ["oss1", "oss2", "mds1", "mds2"]
+        hostvars = {
+            host: {"ansible_product_uuid": node_uuid}
+            for host, node_uuid in zip(hosts, UUIDS[0] + UUIDS[1])
+        }
+        hostvars["wit"] = {"role": "oss", "ansible_product_uuid": UUIDS[2][0]}
+        # Without a product UUID, the pair has no identity.
+        hostvars["mds3"] = {}
+        hostvars["mds4"] = {"ansible_product_uuid": UUIDS[2][1]}
+        records = ha_pair_records(
+            hostvars,
+            {
+                "oss": hosts[:2],
+                "mds": hosts[2:] + ["mds3", "mds4"],
+                "cluster_witness": ["wit"],
+            },
+        )
+        identities = ha_cluster_identities(records)
+        self.assertEqual(identities["oss1"], module_identity(*UUIDS[0]))
+        self.assertEqual(identities["oss2"], module_identity(*UUIDS[0]))
+        self.assertEqual(identities["wit"], module_identity(*UUIDS[0]))
+        self.assertEqual(identities["mds2"], module_identity(*UUIDS[1]))
+        self.assertNotIn("mds3", identities)
+        self.assertNotIn("mds4", identities)
+
+    def test_fnv1a_32(self):
+        self.assertEqual(fnv1a_32(b""), 0x811C9DC5)
+        self.assertEqual(fnv1a_32(b"a"), 0xE40C292C)
+        self.assertEqual(fnv1a_32(b"foobar"), 0xBF9CF968)
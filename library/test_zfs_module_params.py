@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from .zfs_module_params import (
+    GiB,
+    MiB,
+    apply_live_parameters,
+    compute_parameters,
+    parse_leaf_vdevs,
+    parse_modprobe_conf,
+    render_modprobe_conf,
+)
+
+
+class TestZFSModuleParams(unittest.TestCase):
+    def test_oss_parameters(self):
+        """OSS nodes must get dirty data sized for their disks and prefetch"""
+        params = compute_parameters("oss", 256 * GiB, 32, 84)
+        self.assertEqual(params["zfs_arc_max"], 128 * GiB)
+        # 2 * 1M * 84 disks * 16 writes, within default limits.
+        self.assertEqual(params["zfs_dirty_data_max"], 2688 * MiB)
+        self.assertNotIn("zfs_dirty_data_max_max", params)
+        params = compute_parameters("oss", 256 * GiB, 32, 200)
+        self.assertEqual(params["zfs_dirty_data_max"], 6400 * MiB)
+        self.assertEqual(params["zfs_dirty_data_max_max"], 6400 * MiB)
+        self.assertEqual(params["zfs_prefetch_disable"], 0)
+        self.assertEqual(params["zfs_vdev_async_write_max_active"], 16)
+
+    def test_mds_parameters(self):
+        """MDS nodes must favour ARC and synchronous I/O, without prefetch"""
+        params = compute_parameters("mds", 128 * GiB, 16, 12)
+        self.assertEqual(params["zfs_arc_max"], 96 * GiB)
+        self.assertEqual(params["zfs_dirty_data_max"], 256 * MiB)
+        self.assertEqual(params["zfs_prefetch_disable"], 1)
+        self.assertEqual(params["zfs_vdev_sync_write_max_active"], 32)
+
+    def test_small_memory_keeps_reserve(self):
+        """Memory for the OS and Lustre threads is kept aside on small nodes"""
+        params = compute_parameters("mds", 16 * GiB, 16, 4)
+        self.assertEqual(params["zfs_arc_max"], 8 * GiB)
+        self.assertLessEqual(params["zfs_dirty_data_max"], 4 * GiB)
+
+    def test_modprobe_conf_round_trip(self):
+        """Unrelated lines and unmanaged zfs options must be preserved"""
+        other, options = parse_modprobe_conf(
+            "# local settings\noptions zfs zfs_arc_max=1 l2arc_noprefetch=0\n"
+            "options spl spl_taskq_thread_dynamic=0\n"
+        )
+        self.assertEqual(
+            other, ["# local settings", "options spl spl_taskq_thread_dynamic=0"]
+        )
+        self.assertEqual(options, {"zfs_arc_max": "1", "l2arc_noprefetch": "0"})
+        options.update(zfs_arc_max="2")
+        self.assertEqual(
+            render_modprobe_conf(other, options),
+            "# local settings\noptions spl spl_taskq_thread_dynamic=0\n"
+            "options zfs l2arc_noprefetch=0 zfs_arc_max=2\n",
+        )
+
+    def test_leaf_vdevs_exclude_aux_devices(self):
+        """Log, cache and spare devices must not count as data disks"""
+        output = (
+            "p01\t10T\t1T\t9T\t-\t-\t0%\t10%\t1.00x\tONLINE\t-\n"
+            "\traidz2\t10T\t1T\t9T\t-\t-\t0%\t10%\t-\tONLINE\n"
+            "\t/dev/disk/by-id/a\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+            "\t/dev/disk/by-id/b\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+            "special       -      -      -        -         -      -      -      -  -\n"
+            "\t/dev/disk/by-id/c\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+            "logs          -      -      -        -         -      -      -      -  -\n"
+            "\t/dev/disk/by-id/d\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+            "cache         -      -      -        -         -      -      -      -  -\n"
+            "\t/dev/disk/by-id/e\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+            "spare         -      -      -        -         -      -      -      -  -\n"
+            "\t/dev/disk/by-id/f\t-\t-\t-\t-\t-\t-\t-\t-\tAVAIL\n"
+            "p02\t1T\t0\t1T\t-\t-\t0%\t0%\t1.00x\tONLINE\t-\n"
+            "\t/dev/disk/by-id/g\t-\t-\t-\t-\t-\t-\t-\t-\tONLINE\n"
+        )
+        self.assertEqual(parse_leaf_vdevs(output), 4)
+
+    def test_live_drift_in_check_mode(self):
+        """Check mode must report writable drift as a change without writing"""
+        with tempfile.TemporaryDirectory() as path:
+            for name, value in (("zfs_arc_max", "1"), ("zfs_txg_timeout", "10")):
+                with open(os.path.join(path, name), "w") as fp:
+                    fp.write(value)
+            desired = {"zfs_arc_max": "2", "zfs_txg_timeout": "10"}
+            live = {"zfs_arc_max": "1", "zfs_txg_timeout": "10"}
+            changed, reload_required, errors = apply_live_parameters(
+                desired, live, check_mode=True, parameters_path=path
+            )
+            self.assertTrue(changed)
+            self.assertEqual((reload_required, errors), ([], {}))
+            with open(os.path.join(path, "zfs_arc_max")) as fp:
+                self.assertEqual(fp.read(), "1")
+            changed, _, _ = apply_live_parameters(
+                desired, live, apply_live=False, check_mode=True, parameters_path=path
+            )
+            self.assertFalse(changed)
+
+    def test_failed_write_is_an_error(self):
+        """A writable parameter which fails to write must not need a reload"""
+        with tempfile.TemporaryDirectory() as path:
+            # A directory in place of the parameter makes the write fail.
+            os.mkdir(os.path.join(path, "zfs_arc_max"))
+            changed, reload_required, errors = apply_live_parameters(
+                {"zfs_arc_max": "2", "zfs_dirty_data_max_max": "4"},
+                {"zfs_arc_max": "1", "zfs_dirty_data_max_max": "3"},
+                parameters_path=path,
+            )
+        self.assertFalse(changed)
+        self.assertEqual(reload_required, ["zfs_dirty_data_max_max"])
+        self.assertEqual(list(errors), ["zfs_arc_max"])
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from ansible.module_utils.basic import AnsibleModule
+
+ZPOOL_CMD = "/usr/sbin/zpool"
+DEFAULT_PARAMETERS_PATH = "/sys/module/zfs/parameters"
+DEFAULT_MODPROBE_CONF = "/etc/modprobe.d/zfs.conf"
+
+KiB = 1024
+MiB = 1024 * KiB
+GiB = 1024 * MiB
+
+# Share of memory the ARC may use. MDTs live off cached metadata, while OSS
+# nodes need more memory for bulk I/O buffers of Lustre itself.
+ARC_SHARE = {"mds": 0.75, "oss": 0.5}
+# Memory kept aside for the OS and for Lustre service threads, of which there
+# are more the more cores there are.
+RESERVED_MEMORY = 4 * GiB
+RESERVED_MEMORY_PER_CORE = 256 * MiB
+# Record size of the datasets each role serves.
+RECORDSIZE = {"mds": 128 * KiB, "oss": 1 * MiB}
+# Per leaf vdev I/O queue depths. OSTs see large sequential writes, MDTs many
+# small synchronous ones.
+VDEV_MAX_ACTIVE = {
+    "mds": {
+        "zfs_vdev_async_read_max_active": 8,
+        "zfs_vdev_async_write_max_active": 10,
+        "zfs_vdev_sync_read_max_active": 32,
+        "zfs_vdev_sync_write_max_active": 32,
+    },
+    "oss": {
+        "zfs_vdev_async_read_max_active": 8,
+        "zfs_vdev_async_write_max_active": 16,
+        "zfs_vdev_sync_read_max_active": 10,
+        "zfs_vdev_sync_write_max_active": 10,
+    },
+}
+# Longer transaction groups let OSTs batch more of a stream per sync.
+TXG_TIMEOUT = {"mds": 5, "oss": 10}
+# Prefetch only pays off for streaming reads, metadata access is random.
+PREFETCH_DISABLE = {"mds": 1, "oss": 0}
+MIN_DIRTY_DATA = 256 * MiB
+MAX_DIRTY_DATA = 16 * GiB
+DEFAULT_DIRTY_DATA_MAX_MAX = 4 * GiB
+# Parameters which can only be set when the module is loaded.
+LOAD_TIME_PARAMETERS = ("zfs_dirty_data_max_max",)
+# Classes of vdevs `zpool list -v` lists after data vdevs, whose disks take no
+# part in writing out dirty data of a txg.
+AUX_CLASSES = ("logs", "cache", "spare")
+
+
+def parse_leaf_vdevs(output: str) -> int:
+    """
+    Counts disks holding data in output of `zpool list -H -v -P`, leaving out
+    log, cache and spare devices. Special and dedup vdevs are counted.
+    """
+    count = 0
+    aux = False
+    for line in output.splitlines():
+        fields = line.split()
+        name = fields[0] if fields else ""
+        # Pools and classes of vdevs are listed without indentation, the latter
+        # padded with spaces rather than tabs.
+        if name and not line[0].isspace():
+            aux = name in AUX_CLASSES
+        # With -P leaf vdevs are listed by full path, i.e. /dev/...
+        elif name.startswith("/") and not aux:
+            count += 1
+    return count
+
+
+def count_leaf_vdevs(run_cmd=subprocess.run) -> Tuple[int, Exception]:
+    """Counts disks holding data across all imported pools."""
+    try:
+        res = run_cmd(
+            [ZPOOL_CMD, "list", "-H", "-v", "-P"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as err:
+        return 0, err
+    return parse_leaf_vdevs(res.stdout), None
+
+
+def compute_parameters(
+    role: str, memory_bytes: int, cores: int, vdevs: int
+) -> Dict[str, int]:
+    """Computes ZFS module parameters suitable for the given server role."""
+    reserved = RESERVED_MEMORY + cores * RESERVED_MEMORY_PER_CORE
+    arc_max = min(int(memory_bytes * ARC_SHARE[role]), memory_bytes - reserved)
+    arc_max = max(arc_max, memory_bytes // 8)
+    # Enough dirty data for two records per active write on every disk, so
+    # that all of them are kept busy while the next txg fills up.
+    dirty = 2 * RECORDSIZE[role] * max(vdevs, 1)
+    dirty *= VDEV_MAX_ACTIVE[role]["zfs_vdev_async_write_max_active"]
+    dirty = min(max(dirty, MIN_DIRTY_DATA), MAX_DIRTY_DATA, memory_bytes // 4)
+    params = {
+        "zfs_arc_max": arc_max,
+        "zfs_dirty_data_max": dirty,
+        "zfs_txg_timeout": TXG_TIMEOUT[role],
+        "zfs_prefetch_disable": PREFETCH_DISABLE[role],
+        **VDEV_MAX_ACTIVE[role],
+    }
+    # zfs_dirty_data_max is capped by zfs_dirty_data_max_max, which is only
+    # raised when its default would not accommodate the value above.
+    if dirty > min(memory_bytes // 4, DEFAULT_DIRTY_DATA_MAX_MAX):
+        params["zfs_dirty_data_max_max"] = dirty
+    return params
+
+
+def read_live_parameters(
+    names: List[str], parameters_path: str = DEFAULT_PARAMETERS_PATH
+) -> Dict[str, Optional[str]]:
+    """Reads current values of parameters, None for ones which do not exist."""
+    values = dict()
+    for name in names:
+        try:
+            with open(os.path.join(parameters_path, name), "r") as fp:
+                values[name] = fp.read().strip()
+        except FileNotFoundError:
+            values[name] = None
+    return values
+
+
+def write_live_parameter(
+    name: str, value: str, parameters_path: str = DEFAULT_PARAMETERS_PATH
+) -> Exception:
+    try:
+        with open(os.path.join(parameters_path, name), "w") as fp:
+            fp.write(value)
+    except OSError as err:
+        return err
+    return None
+
+
+def apply_live_parameters(
+    desired: Dict[str, str],
+    live: Dict[str, Optional[str]],
+    apply_live: bool = True,
+    check_mode: bool = False,
+    parameters_path: str = DEFAULT_PARAMETERS_PATH,
+) -> Tuple[bool, List[str], Dict[str, str]]:
+    """
+    Writes parameters whose live value differs from the desired one, unless
+    in check mode, where they are only reported as changes. Returns whether
+    anything changed, or would change, parameters which only take effect once
+    the zfs module is reloaded and errors of parameters which failed to write.
+    """
+    changed = False
+    reload_required, errors = [], dict()
+    for name, value in desired.items():
+        if live[name] == value:
+            continue
+        if name in LOAD_TIME_PARAMETERS or live[name] is None:
+            reload_required.append(name)
+            continue
+        if not apply_live:
+            continue
+        if check_mode:
+            changed = True
+            continue
+        err = write_live_parameter(name, value, parameters_path)
+        if err:
+            errors[name] = str(err)
+        else:
+            changed = True
+    return changed, reload_required, errors
+
+
+def parse_modprobe_conf(text: str) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Splits a modprobe.d file into lines unrelated to zfs options and the
+    options of the zfs module, which may be spread over several lines.
+    """
+    other = []
+    options = dict()
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == "options" and fields[1] == "zfs":
+            for option in fields[2:]:
+                name, _, value = option.partition("=")
+                options[name] = value
+        else:
+            other.append(line)
+    return other, options
+
+
+def render_modprobe_conf(other: List[str], options: Dict[str, str]) -> str:
+    """Writes all zfs options on a single line following all other lines."""
+    lines = list(other)
+    if options:
+        lines.append(
+            "options zfs " + " ".join(f"{k}={v}" for k, v in sorted(options.items()))
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            role=dict(type="str", required=True, choices=["mds", "oss"]),
+            memory_mb=dict(type="int", required=True),
+            cores=dict(type="int", required=True),
+            vdevs=dict(type="int", required=False),
+            # Values taking precedence over computed ones.
+            overrides=dict(type="dict", required=False, default={}),
+            apply_live=dict(type="bool", required=False, default=True),
+            parameters_path=dict(
+                type="path", required=False, default=DEFAULT_PARAMETERS_PATH
+            ),
+            modprobe_conf=dict(
+                type="path", required=False, default=DEFAULT_MODPROBE_CONF
+            ),
+        ),
+        supports_check_mode=True,
+    )
+
+    parameters_path = module.params["parameters_path"]
+    modprobe_conf = module.params["modprobe_conf"]
+
+    vdevs = module.params["vdevs"]
+    if vdevs is None:
+        vdevs, err = count_leaf_vdevs()
+        if err:
+            module.fail_json(changed=False, msg=f"could not count vdevs: {err}")
+
+    desired = compute_parameters(
+        module.params["role"],
+        module.params["memory_mb"] * MiB,
+        module.params["cores"],
+        vdevs,
+    )
+    desired.update(module.params["overrides"])
+    desired = {name: str(value) for name, value in desired.items()}
+
+    live = read_live_parameters(list(desired), parameters_path)
+    try:
+        with open(modprobe_conf, "r") as fp:
+            current_conf = fp.read()
+    except FileNotFoundError:
+        current_conf = ""
+    other, persisted = parse_modprobe_conf(current_conf)
+
+    # Parameters whose live or persisted value differs from what it should be.
+    drift = {
+        name: {
+            "desired": value,
+            "live": live[name],
+            "persisted": persisted.get(name),
+        }
+        for name, value in desired.items()
+        if live[name] != value or persisted.get(name) != value
+    }
+
+    changed, reload_required, errors = apply_live_parameters(
+        desired, live, module.params["apply_live"], module.check_mode, parameters_path
+    )
+
+    new_conf = render_modprobe_conf(other, {**persisted, **desired})
+    if new_conf != current_conf:
+        changed = True
+        if not module.check_mode:
+            os.makedirs(os.path.dirname(modprobe_conf), exist_ok=True)
+            with open(modprobe_conf, "w") as fp:
+                fp.write(new_conf)
+
+    result = dict(
+        changed=changed,
+        parameters=desired,
+        vdevs=vdevs,
+        drift=drift,
+        reload_required=sorted(reload_required),
+    )
+    # Values are still persisted, so that they apply once the module reloads.
+    if errors:
+        module.fail_json(
+            msg=f"could not set parameters: {', '.join(sorted(errors))}",
+            errors=errors,
+            **result,
+        )
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
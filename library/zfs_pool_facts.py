@@ -1,16 +1,7 @@
 #!/usr/bin/env python3
-import os
 
 from ansible.module_utils.basic import AnsibleModule
-
-
-def find_pools_via_procfs(basedir: str = "/proc/spl/kstat/zfs"):
-    pools = []
-    for contents in os.walk(basedir):
-        if contents[1]:
-            pools = contents[1]
-            break
-    return tuple(pools)
+from ansible.module_utils.zfs_kstat import KSTAT_DIR, zfs_kstats
 
 
 def main():
@@ -18,15 +9,14 @@ def main():
         argument_spec=dict(
             procfs_path=dict(type="str", required=False),
         ),
+        supports_check_mode=True,
     )
 
-    procfs_path = module.params["procfs_path"]
-    if procfs_path:
-        pools = find_pools_via_procfs(procfs_path)
-    else:
-        pools = find_pools_via_procfs()
+    procfs_path = module.params["procfs_path"] or KSTAT_DIR
 
-    module.exit_json(changed=False, ansible_facts={"zfs": {"pools": pools}})
+    # Everything is read straight from kstat files, without running any zpool
+    # commands, thus facts are cheap enough to gather every few seconds.
+    module.exit_json(changed=False, ansible_facts={"zfs": zfs_kstats(procfs_path)})
 
 
 if __name__ == "__main__":
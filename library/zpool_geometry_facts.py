@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.zfs_kstat import find_pools
+from ansible.module_utils.zpool_geometry import (
+    DEFAULT_PARAMETERS_PATH,
+    auto_mkfsopts,
+    fmt_mkfsoptions,
+    pool_geometry,
+)
+
+TARGET_TYPES = ("mgt", "mdt", "ost")
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            # All imported pools unless given.
+            pools=dict(type="list", elements="str", required=False),
+            # Target types, i.e. mgt, mdt or ost, mapped to ZFS properties
+            # which take precedence over derived ones.
+            overrides=dict(type="dict", required=False, default={}),
+            parameters_path=dict(
+                type="path", required=False, default=DEFAULT_PARAMETERS_PATH
+            ),
+        ),
+        supports_check_mode=True,
+    )
+
+    pools = module.params["pools"]
+    if pools is None:
+        pools = find_pools()
+    overrides = module.params["overrides"]
+
+    geometry = dict()
+    if pools:
+        geometry, err = pool_geometry(
+            pools, parameters_path=module.params["parameters_path"]
+        )
+        if err:
+            module.fail_json(
+                changed=False,
+                msg=err.stderr,
+                command=" ".join(err.cmd),
+                retcode=err.returncode,
+            )
+
+    for details in geometry.values():
+        details["mkfsoptions"] = {
+            t: fmt_mkfsoptions(
+                {**auto_mkfsopts(t, details), **(overrides.get(t) or {})}
+            )
+            for t in TARGET_TYPES
+        }
+
+    module.exit_json(changed=False, ansible_facts={"zpool_geometry": geometry})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import subprocess
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.zfs_kstat import find_pools
+from ansible.module_utils.zpool_iostat import DEFAULT_PERCENTILES, sample_iostat
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            pools=dict(type="list", elements="str", required=False, default=[]),
+            interval=dict(type="int", required=False, default=1),
+            count=dict(type="int", required=False, default=10),
+            percentiles=dict(
+                type="list",
+                elements="float",
+                required=False,
+                default=list(DEFAULT_PERCENTILES),
+            ),
+            # Captured output of `zpool iostat -H -p -y -v -l` and `-w`
+            # respectively, parsed instead of sampling the pools.
+            latency_replay=dict(type="path", required=False),
+            histogram_replay=dict(type="path", required=False),
+        ),
+        required_together=[("latency_replay", "histogram_replay")],
+        supports_check_mode=True,
+    )
+
+    if module.params["interval"] < 1 or module.params["count"] < 1:
+        module.fail_json(changed=False, msg="interval and count must be positive")
+
+    # Pools found by zfs_pool_facts, unless given explicitly.
+    pools = module.params["pools"] or list(find_pools())
+    if not pools:
+        module.exit_json(changed=False, ansible_facts={"zpool_iostat": dict()})
+
+    stats, err = sample_iostat(
+        pools,
+        module.params["interval"],
+        module.params["count"],
+        latency_replay=module.params["latency_replay"],
+        histogram_replay=module.params["histogram_replay"],
+        percentiles=module.params["percentiles"],
+    )
+    if isinstance(err, subprocess.CalledProcessError):
+        module.fail_json(
+            changed=False,
+            msg=str(err.stderr).strip(),
+            command=" ".join(err.cmd),
+            retcode=err.returncode,
+        )
+    elif err:
+        module.fail_json(changed=False, msg=str(err))
+
+    module.exit_json(changed=False, ansible_facts={"zpool_iostat": stats})
+
+
+if __name__ == "__main__":
+    main()
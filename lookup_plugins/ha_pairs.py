@@ -0,0 +1,57 @@
+import os
+import runpy
+
+from ansible.errors import AnsibleLookupError
+from ansible.plugins.lookup import LookupBase
+
+runpy.run_path(
+    os.path.join(os.path.dirname(__file__), "..", "module_utils", "plugin_path.py")
+)
+
+from ansible.module_utils.ha_pairs import ha_pair_records  # noqa: E402
+
+DOCUMENTATION = """
+name: ha_pairs
+short_description: Resolves HA pair details of every host in the inventory
+description:
+  - Pairs hosts of each HA group in order of listing, i.e. the first with the
+    second, the third with the fourth and so on, and returns a single mapping
+    of inventory host names to details of the pair they belong to, along with
+    its witness.
+  - A pair is put in order by C(first_ha_node) of its first host. When it is
+    false the second host is treated as the first node.
+  - Each witness gets the details of pair C(ha_pair_index), 0 unless set, of
+    the group named by its C(role) variable, or of the mds group when its role
+    names none of the groups.
+options:
+  groups:
+    description: Groups whose hosts form HA pairs.
+    type: list
+    default: [oss, mds]
+  witness_group:
+    description: Group of witness hosts. The first one is the pairs' witness.
+    type: str
+    default: cluster_witness
+"""
+
+EXAMPLES = """
+- name: Resolve HA pairs of the inventory
+  ansible.builtin.set_fact:
+    ha_pair_records: "{{ query('ha_pairs') | first }}"
+  run_once: true
+"""
+
+
+class LookupModule(LookupBase):
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        try:
+            records = ha_pair_records(
+                variables["hostvars"],
+                variables["groups"],
+                self.get_option("groups"),
+                self.get_option("witness_group"),
+            )
+        except ValueError as err:
+            raise AnsibleLookupError(str(err))
+        return [records]
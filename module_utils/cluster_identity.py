@@ -0,0 +1,57 @@
+import uuid
+from typing import Any, Dict, Union
+
+FNV_32_PRIME = 0x01000193
+FNV1A_32_INIT = 0x811C9DC5
+
+
+def as_bytes(data: Union[bytes, str]) -> bytes:
+    """UUIDs given as strings are turned into their 16 bytes."""
+    if isinstance(data, str):
+        return uuid.UUID(data).bytes
+    return bytes(data)
+
+
+def byte_xor(ba1: Union[bytes, str], ba2: Union[bytes, str]) -> bytes:
+    return bytes(a ^ b for a, b in zip(as_bytes(ba1), as_bytes(ba2)))
+
+
+def fnv1a_32(data: Union[bytes, str], hval_init: int = FNV1A_32_INIT) -> int:
+    """
+    Returns the 32 bit FNV-1a hash value for the given data.
+    """
+    hval = hval_init
+    for byte in as_bytes(data):
+        hval = hval ^ byte
+        hval = (hval * FNV_32_PRIME) % 2**32
+    return hval
+
+
+def cluster_identity(uuid1: str, uuid2: str) -> Dict[str, Any]:
+    """
+    Computes identity of the cluster formed by two nodes from their product
+    UUIDs, i.e. ClusterGuid as the UUIDs XORed together and ClusterId as its
+    FNV-1a hash, identical to what the xor_uuid module returns.
+    """
+    xored = byte_xor(uuid1, uuid2)
+    return {"guid_hash": fnv1a_32(xored), "guid": str(uuid.UUID(bytes=xored))}
+
+
+def ha_cluster_identities(
+    records: Dict[str, Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Computes identity of every HA pair in one pass from records of the ha_pairs
+    lookup, i.e. details of the pair each host belongs to keyed by inventory
+    name. Each pair is computed once however many hosts, witness included,
+    share it. Hosts whose pair lacks a product UUID are left out.
+    """
+    identities, by_pair = dict(), dict()
+    for host, record in records.items():
+        pair = (record.get("first_node_uuid"), record.get("second_node_uuid"))
+        if not all(pair):
+            continue
+        if pair not in by_pair:
+            by_pair[pair] = cluster_identity(*pair)
+        identities[host] = by_pair[pair]
+    return identities
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = "/var/cache/lustre-node-facts"
+# Version of the layout of cache entries, which are ignored once it changes.
+CACHE_FORMAT = 1
+
+
+def path_signature(path: str, presence_only: bool = False) -> List[Any]:
+    """
+    Describes state of a file cheaply enough to check on every run, i.e. by
+    a single stat(). Device nodes, e.g. /dev/ipmi0, have timestamps which
+    change with use, thus only their presence is considered.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return [path, False]
+    if presence_only:
+        return [path, True]
+    return [path, True, st.st_mtime_ns, st.st_size]
+
+
+class FactCache:
+    """
+    Facts of slow probes kept in a JSON file per probe. An entry is served
+    until it is older than the TTL or the signature it was stored with, e.g.
+    mtime of the binary which produced it, no longer matches.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = 3600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def entry_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def get(self, name: str, signature: List[Any]) -> Optional[Dict[str, Any]]:
+        """Returns cached facts or None if there are none which are valid."""
+        try:
+            with open(self.entry_path(name), "r") as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("format") != CACHE_FORMAT:
+            return None
+        age = time.time() - entry.get("created", 0)
+        # An entry from the future means the clock was set back.
+        if not 0 <= age < self.ttl:
+            return None
+        # Signatures are compared as serialized, where tuples become lists.
+        if entry.get("signature") != json.loads(json.dumps(signature)):
+            return None
+        return entry.get("facts")
+
+    def put(self, name: str, signature: List[Any], facts: Dict[str, Any]) -> bool:
+        """
+        Stores facts, replacing the entry atomically so that concurrent readers
+        never see a partial one. Returns False if the cache is not writable,
+        which only costs the next run a probe.
+        """
+        entry = dict(
+            format=CACHE_FORMAT, created=time.time(), signature=signature, facts=facts
+        )
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{name}.")
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entry, fp)
+            os.replace(tmp, self.entry_path(name))
+        except (OSError, TypeError, ValueError):
+            # Facts which cannot be serialized would otherwise leave a partial
+            # file behind on every run.
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return False
+        return True
+
+
+def cached_probe(
+    cache: Optional[FactCache],
+    name: str,
+    signature: List[Any],
+    probe: Callable[[], Dict[str, Any]],
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Serves facts of the named probe from the cache if possible, otherwise runs
+    the probe and caches what it returns. Returns facts and whether they came
+    from the cache. Without a cache the probe always runs.
+    """
+    if cache is None:
+        return probe(), False
+    facts = cache.get(name, signature)
+    if facts is not None:
+        return facts, True
+    facts = probe()
+    cache.put(name, signature, facts)
+    return facts, False
@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Groups whose hosts form HA pairs, in order of listing.
+HA_PAIR_GROUPS = ("oss", "mds")
+WITNESS_GROUP = "cluster_witness"
+# Group whose pairs a witness is given when its role names no group, e.g. mgs
+# or mdt, as every role other than oss meant the metadata servers.
+WITNESS_FALLBACK_GROUP = "mds"
+
+
+def host_details(hostvars: Dict[str, Any], host: str) -> Dict[str, Any]:
+    """Reads the details of a host which make up the HA configuration."""
+    vars = hostvars[host]
+    default_ipv4 = vars.get("ansible_default_ipv4") or {}
+    return {
+        "name": vars.get("ansible_hostname"),
+        "ipmi_ip_address": vars.get("ipmi_ip_address"),
+        "uuid": vars.get("ansible_product_uuid"),
+        "private_ip_address": vars.get("hb_iface_ipaddr"),
+        "public_ip_address": default_ipv4.get("address"),
+    }
+
+
+def pair_record(
+    first: Dict[str, Any], second: Dict[str, Any], witness: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Names facts the way the HA templates expect them."""
+    record = dict()
+    for prefix, details in (("first_node", first), ("second_node", second)):
+        for key, value in details.items():
+            record[f"{prefix}_{key}"] = value
+    witness = witness or {}
+    record["witness_name"] = witness.get("name")
+    record["witness_public_ip_address"] = witness.get("public_ip_address")
+    record["witness_uuid"] = witness.get("uuid")
+    return record
+
+
+def ha_pair_records(
+    hostvars: Dict[str, Any],
+    groups: Dict[str, List[str]],
+    pair_groups: Sequence[str] = HA_PAIR_GROUPS,
+    witness_group: str = WITNESS_GROUP,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Pairs hosts of each group in order of listing, i.e. the first with the
+    second, the third with the fourth and so on, and returns details of the
+    pair each host belongs to, keyed by inventory name. A pair is put in order
+    by first_ha_node of its first host. Each witness gets the details of pair
+    ha_pair_index, 0 unless set, of the group named by its role, or of the
+    mds group if its role names none of the groups. Raises
+    ValueError if a group cannot be paired or a witness has no pair.
+    """
+    witnesses = groups.get(witness_group, [])
+    # Details of each host are read once, however many records use them.
+    details = dict()
+
+    def lookup(host: str) -> Dict[str, Any]:
+        if host not in details:
+            details[host] = host_details(hostvars, host)
+        return details[host]
+
+    witness = lookup(witnesses[0]) if witnesses else None
+    records: Dict[str, Dict[str, Any]] = dict()
+    pairs: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = dict()
+    for group in pair_groups:
+        hosts = groups.get(group, [])
+        if len(hosts) % 2:
+            raise ValueError(
+                f"group {group} has {len(hosts)} hosts, which cannot be paired"
+            )
+        pairs[group] = []
+        for a, b in zip(hosts[::2], hosts[1::2]):
+            if not hostvars[a].get("first_ha_node", True):
+                a, b = b, a
+            pairs[group].append((lookup(a), lookup(b)))
+            record = pair_record(lookup(a), lookup(b), witness)
+            for host, peer in ((a, b), (b, a)):
+                records[host] = dict(
+                    record,
+                    peer_inventory_name=peer,
+                    debug_group=group,
+                    debug_my_role=hostvars[host].get("role") or group,
+                )
+
+    for host in witnesses:
+        role = hostvars[host].get("role")
+        group = role if role in pairs else WITNESS_FALLBACK_GROUP
+        index = int(hostvars[host].get("ha_pair_index", 0))
+        try:
+            first, second = pairs[group][index]
+        except (KeyError, IndexError):
+            raise ValueError(f"witness {host} has no pair {index} in group {group}")
+        records[host] = dict(
+            pair_record(first, second, lookup(host)),
+            debug_group="no group",
+            debug_my_role=f"witness for {role}",
+        )
+    return records
@@ -0,0 +1,217 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import time
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_STATEFILE = "/etc/racktop/hiavd/serialized.dat"
+# Field of a resource group holding the GUID of the node which owns it.
+RESOURCE_GROUP_OWNER_KEY = "Node"
+
+# Subset of inotify event masks from <sys/inotify.h>. hiavd may rewrite the
+# file in place or replace it via rename, thus we watch the directory.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# Upper bound on a single wait when inotify is available, as a safeguard
+# against events we did not subscribe to, e.g. the directory being replaced.
+INOTIFY_MAX_WAIT = 1.0
+# Interval between checks of the file when inotify is not available.
+DEFAULT_POLL_INTERVAL = 0.25
+
+
+def stat_signature(statefile: str) -> Optional[Tuple[int, int, int]]:
+    """Returns (inode, mtime, size) of the file or None if it is missing."""
+    try:
+        st = os.stat(statefile)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class HiavdState:
+    """
+    Parsed serialized state file along with indexes which make lookups by pool
+    and resource group names constant time operations.
+    """
+
+    def __init__(self, state: Dict[str, Any]):
+        self.raw: Dict[str, Any] = state
+        self.cluster: Dict[str, Any] = state.get("Cluster") or dict()
+        self.revision: Optional[int] = self.cluster.get("Revision")
+        # Both of these are keyed by GUID.
+        self.pools: Dict[str, Any] = self.cluster.get("Pools") or dict()
+        self.resource_groups: Dict[str, Any] = (
+            self.cluster.get("ResourceGroups") or dict()
+        )
+        # Pool name -> pool details.
+        self.pool_by_name: Dict[str, Any] = dict()
+        # Pool name -> GUID of the resource group the pool belongs to. Pools
+        # referencing a resource group which does not exist are left out.
+        self.resource_group_by_pool: Dict[str, str] = dict()
+        for details in self.pools.values():
+            poolname = details.get("CachedName")
+            if not poolname:
+                continue
+            self.pool_by_name[poolname] = details
+            rgid = details.get("ResourceGroupId")
+            if rgid in self.resource_groups:
+                self.resource_group_by_pool[poolname] = rgid
+        # Resource group GUID -> GUID of the node owning the resource group.
+        self.owner_by_resource_group: Dict[str, str] = {
+            rgid: rg.get(RESOURCE_GROUP_OWNER_KEY, "")
+            for rgid, rg in self.resource_groups.items()
+        }
+        # Resource group GUID -> name, falling back on the GUID if unnamed.
+        self.resource_group_name: Dict[str, str] = {
+            rgid: rg.get("Name") or rgid for rgid, rg in self.resource_groups.items()
+        }
+
+
+# Statefile path -> ((inode, mtime, size), parsed state)
+_state_cache: Dict[str, Tuple[Tuple[int, int, int], HiavdState]] = dict()
+
+
+def load_state(statefile: str = DEFAULT_STATEFILE) -> HiavdState:
+    """
+    Returns the parsed state file. The file is parsed only once for each
+    (inode, mtime, size) and subsequent calls return the same object for as long
+    as the file does not change. A missing file yields an empty state, while a
+    file which cannot be parsed raises ValueError.
+    """
+    signature = stat_signature(statefile)
+    if signature is None:
+        _state_cache.pop(statefile, None)
+        return HiavdState(dict())
+    cached = _state_cache.get(statefile)
+    if cached and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(statefile, "rb") as fp:
+            state = HiavdState(json.load(fp))
+    except FileNotFoundError:
+        return HiavdState(dict())
+    _state_cache[statefile] = (signature, state)
+    return state
+
+
+def read_revision(statefile: str = DEFAULT_STATEFILE) -> Optional[int]:
+    """
+    Returns the Cluster.Revision from the state file or None if the file is
+    missing, lacks a revision or is being written to at the moment.
+    """
+    try:
+        return load_state(statefile).revision
+    except (IOError, ValueError):
+        return None
+
+
+class _Inotify:
+    """Minimal inotify binding via ctypes, no third-party packages required."""
+
+    def __init__(self, path: str, mask: int):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed", path)
+
+    def wait(self, timeout: float) -> bool:
+        """Waits up to timeout seconds for events, returns True if any arrived."""
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not readable:
+            return False
+        # We only care that something happened, not what it was.
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class StatefileWatcher:
+    """
+    Waits for hiavd to commit a new revision of the serialized state file.
+
+    Changes are detected with inotify where available and by polling inode,
+    mtime and size of the file otherwise. The file is only parsed when one of
+    these changes.
+    """
+
+    def __init__(
+        self,
+        statefile: str = DEFAULT_STATEFILE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        self._statefile = statefile
+        self._poll_interval = poll_interval
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(
+                    os.path.dirname(os.path.abspath(statefile)), IN_WATCH_MASK
+                )
+            except (OSError, AttributeError, TypeError):
+                self._inotify = None  # Fall back to polling.
+
+    @property
+    def statefile(self) -> str:
+        return self._statefile
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def _wait(self, timeout: float):
+        if self._inotify:
+            self._inotify.wait(min(timeout, INOTIFY_MAX_WAIT))
+        else:
+            time.sleep(min(timeout, self._poll_interval))
+
+    def wait_for_revision_change(
+        self, revision: Optional[int], timeout: float
+    ) -> Optional[int]:
+        """
+        Waits up to timeout seconds for the revision in the state file to
+        differ from the given one. Returns the new revision or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        signature = None
+        while True:
+            current_signature = stat_signature(self._statefile)
+            if current_signature != signature:
+                current = read_revision(self._statefile)
+                # A file caught in the middle of a write is read again on the
+                # next pass, even if it does not change in the meantime.
+                if current is not None:
+                    signature = current_signature
+                    if current != revision:
+                        return current
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._wait(remaining)
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
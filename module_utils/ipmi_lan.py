@@ -0,0 +1,97 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+IPMITOOL_CMD = "/usr/bin/ipmitool"
+# LAN channels are implementation specific, e.g. 1 on most boards, 2 on some
+# and 3 on others, while 0 and 12-15 are reserved for other media.
+DEFAULT_CHANNELS = tuple(range(1, 12))
+DEFAULT_TIMEOUT = 10.0
+# Rows of `ipmitool lan print` mapped to keys of parsed channel settings.
+FIELDS = {
+    "IP Address Source": "ip_address_source",
+    "IP Address": "ip_address",
+    "Subnet Mask": "subnet_mask",
+    "MAC Address": "mac_address",
+    "Default Gateway IP": "default_gateway",
+    "Default Gateway MAC": "default_gateway_mac",
+    "802.1q VLAN ID": "vlan_id",
+    "802.1q VLAN Priority": "vlan_priority",
+}
+UNCONFIGURED_ADDRESSES = ("", "0.0.0.0")
+
+
+def parse_lan_print(output: str) -> Dict[str, Any]:
+    """
+    Parses output of `ipmitool lan print <channel>` into address, netmask,
+    gateway, MAC, VLAN and source of the address. The source is one of static,
+    dhcp, bios or other, and a disabled VLAN is None.
+    """
+    rows = dict()
+    for line in output.splitlines():
+        label, sep, value = line.partition(":")
+        label = label.strip()
+        # Continuation rows, e.g. of Auth Type Enable, have no label.
+        if not sep or not label or label in rows:
+            continue
+        rows[label] = value.strip()
+    lan = {key: rows.get(label) for label, key in FIELDS.items()}
+    if lan["ip_address_source"]:
+        lan["ip_address_source"] = lan["ip_address_source"].split()[0].lower()
+    vlan_id = lan["vlan_id"]
+    lan["vlan_id"] = int(vlan_id) if vlan_id and vlan_id.isdigit() else None
+    priority = lan["vlan_priority"]
+    lan["vlan_priority"] = int(priority) if priority and priority.isdigit() else None
+    return lan
+
+
+def is_configured(lan: Optional[Dict[str, Any]]) -> bool:
+    return bool(lan) and (lan.get("ip_address") or "") not in UNCONFIGURED_ADDRESSES
+
+
+def query_channel(
+    channel: int, timeout: float = DEFAULT_TIMEOUT, run_cmd=subprocess.run
+) -> Tuple[Optional[Dict[str, Any]], Exception]:
+    """Reads LAN settings of a channel, killing ipmitool once timeout expires."""
+    try:
+        res = run_cmd(
+            [IPMITOOL_CMD, "lan", "print", str(channel)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=timeout,
+            check=True,
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        return None, e
+    return parse_lan_print(res.stdout), None
+
+
+def lan_channels(
+    channels: List[int] = DEFAULT_CHANNELS,
+    timeout: float = DEFAULT_TIMEOUT,
+    run_cmd=subprocess.run,
+) -> Tuple[Dict[str, Any], Dict[int, Exception]]:
+    """
+    Queries all given channels concurrently, thus a BMC which does not answer
+    costs at most the timeout rather than the timeout for every channel.
+    Returns settings of each channel which answered, keyed by channel number as
+    a string since facts are serialized to JSON, along with the first channel
+    with a configured address as the primary one, and errors of the others.
+    Channels which are not LAN channels fail, thus errors are expected.
+    """
+    results, errors = dict(), dict()
+    if not channels:
+        return dict(primary_channel=None, channels=results), errors
+    with ThreadPoolExecutor(max_workers=len(channels)) as executor:
+        answers = executor.map(
+            lambda c: query_channel(c, timeout, run_cmd), list(channels)
+        )
+        # Answers come back in the order of channels, which decides the primary.
+        for channel, (lan, err) in zip(channels, answers):
+            if err:
+                errors[channel] = err
+            else:
+                results[str(channel)] = lan
+    primary = next((int(c) for c, lan in results.items() if is_configured(lan)), None)
+    return dict(primary_channel=primary, channels=results), errors
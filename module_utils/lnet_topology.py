@@ -0,0 +1,216 @@
+import os
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SYSFS = "/sys"
+# Per-peer credits by minimum IB link rate in Gb/s. Faster links need more
+# messages in flight to each peer to stay busy. The first entry matches the
+# ko2iblnd default.
+PEER_CREDITS_BY_RATE = ((0, 8), (56, 16), (100, 32), (200, 64))
+# Bounds of NI-wide credits. The lower bound matches the ko2iblnd default,
+# while the upper one limits memory pinned for transmit descriptors.
+MIN_CREDITS = 256
+MAX_CREDITS = 8192
+MIN_NTX = 512
+# Roles a node may have, i.e. metadata or object storage server.
+ROLES = ("mds", "oss")
+
+
+def read_sysfs(path: str) -> Optional[str]:
+    """Returns stripped contents of a sysfs attribute or None if it is missing."""
+    try:
+        with open(path, "r") as fp:
+            return fp.read().strip()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def parse_cpulist(cpulist: str) -> List[int]:
+    """Expands a kernel CPU list, e.g. 0-3,8-11, into a list of CPU numbers."""
+    cpus = []
+    for group in cpulist.split(","):
+        group = group.strip()
+        if not group:
+            continue
+        first, sep, last = group.partition("-")
+        cpus.extend(range(int(first), int(last) + 1) if sep else [int(first)])
+    return cpus
+
+
+def numa_nodes(sysfs: str = DEFAULT_SYSFS) -> Dict[int, List[int]]:
+    """Maps each NUMA node to its CPUs. Systems without NUMA have node 0 only."""
+    nodedir = os.path.join(sysfs, "devices", "system", "node")
+    nodes = dict()
+    try:
+        entries = os.listdir(nodedir)
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        if not entry.startswith("node") or not entry[4:].isdigit():
+            continue
+        cpulist = read_sysfs(os.path.join(nodedir, entry, "cpulist"))
+        nodes[int(entry[4:])] = parse_cpulist(cpulist or "")
+    return dict(sorted(nodes.items()))
+
+
+def numa_node_of(devicedir: str) -> Optional[int]:
+    """
+    Returns NUMA node the device is attached to, or None if the platform does
+    not tell, which the kernel reports as -1.
+    """
+    value = read_sysfs(os.path.join(devicedir, "numa_node"))
+    if value is None or int(value) < 0:
+        return None
+    return int(value)
+
+
+def parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Parses link rate of an IB port, e.g. 100 Gb/sec (4X EDR), into Gb/s."""
+    if not rate:
+        return None
+    try:
+        return float(rate.split()[0])
+    except ValueError:
+        return None
+
+
+def port_rates(hcadir: str) -> Dict[int, Optional[float]]:
+    """Maps each port number of an HCA to its link rate in Gb/s."""
+    portsdir = os.path.join(hcadir, "ports")
+    try:
+        ports = [p for p in os.listdir(portsdir) if p.isdigit()]
+    except FileNotFoundError:
+        ports = []
+    return {
+        int(p): parse_rate(read_sysfs(os.path.join(portsdir, p, "rate")))
+        for p in sorted(ports, key=int)
+    }
+
+
+def infiniband_devices(sysfs: str = DEFAULT_SYSFS) -> Dict[str, Dict[str, Any]]:
+    """
+    Maps each IB HCA, e.g. mlx5_0, to its PCI device, NUMA node and link rate
+    of each of its ports.
+    """
+    ibdir = os.path.join(sysfs, "class", "infiniband")
+    hcas = dict()
+    try:
+        entries = sorted(os.listdir(ibdir))
+    except FileNotFoundError:
+        entries = []
+    for hca in entries:
+        devicedir = os.path.join(ibdir, hca, "device")
+        hcas[hca] = {
+            "pci_device": os.path.basename(os.path.realpath(devicedir)),
+            "numa_node": numa_node_of(devicedir),
+            "ports": port_rates(os.path.join(ibdir, hca)),
+        }
+    return hcas
+
+
+def ib_interfaces(
+    sysfs: str = DEFAULT_SYSFS, hcas: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Maps each IPoIB interface, e.g. ib0, to the HCA and port it runs on, the
+    link rate of that port and the NUMA node of its PCI device.
+    """
+    if hcas is None:
+        hcas = infiniband_devices(sysfs)
+    hca_by_pci_device = {d["pci_device"]: hca for hca, d in hcas.items()}
+    netdir = os.path.join(sysfs, "class", "net")
+    interfaces = dict()
+    try:
+        entries = sorted(os.listdir(netdir))
+    except FileNotFoundError:
+        entries = []
+    for iface in entries:
+        if not iface.startswith("ib"):
+            continue
+        devicedir = os.path.join(netdir, iface, "device")
+        if not os.path.exists(devicedir):
+            continue  # Child interfaces, e.g. ib0.8001, have no device.
+        pci_device = os.path.basename(os.path.realpath(devicedir))
+        hca = hca_by_pci_device.get(pci_device)
+        ports = hcas[hca]["ports"] if hca else dict()
+        # dev_port counts from 0 while IB ports are numbered from 1.
+        dev_port = read_sysfs(os.path.join(netdir, iface, "dev_port"))
+        port = int(dev_port) + 1 if dev_port and dev_port.isdigit() else None
+        if port not in ports:
+            port = next(iter(ports), None)
+        interfaces[iface] = {
+            "hca": hca,
+            "port": port,
+            "rate_gbps": ports.get(port),
+            "pci_device": pci_device,
+            "numa_node": numa_node_of(devicedir),
+        }
+    return interfaces
+
+
+def lnet_topology(sysfs: str = DEFAULT_SYSFS) -> Dict[str, Any]:
+    """
+    Describes placement of IB interfaces relative to NUMA nodes. LNet creates
+    one CPU partition (CPT) per NUMA node by default, thus each interface is
+    given the CPT of its local node, or all of them when locality is unknown.
+    """
+    nodes = numa_nodes(sysfs)
+    all_cpts = sorted(nodes) or [0]
+    hcas = infiniband_devices(sysfs)
+    interfaces = ib_interfaces(sysfs, hcas)
+    for details in interfaces.values():
+        node = details["numa_node"]
+        details["cpts"] = [node] if node in nodes else all_cpts
+        details["cpus"] = nodes.get(node, [])
+    return {
+        # Keys are strings, since facts are serialized to JSON.
+        "numa_nodes": {str(n): {"cpus": cpus} for n, cpus in nodes.items()},
+        "cpts": all_cpts,
+        "infiniband": {
+            hca: dict(details, ports={str(p): r for p, r in details["ports"].items()})
+            for hca, details in hcas.items()
+        },
+        "interfaces": interfaces,
+    }
+
+
+def next_power_of_two(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+
+def o2ib_tunables(
+    peers: int,
+    role: str = "oss",
+    rate_gbps: Optional[float] = None,
+    cores: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Derives o2ib tunables of an NI from the number of peers talking to the
+    node, its role, the link rate of the IB port and the number of cores.
+
+    Each peer may have peer_credits messages in flight, and credits bound
+    the total across all peers, thus credits grow with the number of peers
+    so that a large fleet of clients does not starve. Object storage servers
+    move bulk data and get twice as many transmit descriptors.
+    """
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {', '.join(ROLES)}, not {role}")
+    peer_credits = PEER_CREDITS_BY_RATE[0][1]
+    for rate, credits in PEER_CREDITS_BY_RATE:
+        if rate_gbps is not None and rate_gbps >= rate:
+            peer_credits = credits
+    credits = next_power_of_two(max(int(peers), 1) * peer_credits)
+    credits = min(max(credits, MIN_CREDITS), MAX_CREDITS)
+    ntx = max(credits * (2 if role == "oss" else 1), MIN_NTX)
+    # A second connection to each peer spreads its traffic over another
+    # scheduler thread, which only pays off on fast links with spare cores.
+    conns_per_peer = (
+        2 if rate_gbps and rate_gbps >= 200 and cores and cores >= 16 else 1
+    )
+    return {
+        "peer_credits": peer_credits,
+        "credits": credits,
+        "peercredits_hiw": peer_credits // 2,
+        "concurrent_sends": peer_credits,
+        "ntx": ntx,
+        "conns_per_peer": conns_per_peer,
+    }
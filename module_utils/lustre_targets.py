@@ -0,0 +1,106 @@
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+# User properties which mkfs.lustre records on every ZFS-backed target.
+LUSTRE_PROPERTIES = ("svname", "fsname", "index", "mgsnode")
+ZFS_CMD = "zfs"
+
+
+def zfs_get_command(pools: List[str]) -> List[str]:
+    """Generates a single command fetching properties of all datasets in pools."""
+    props = ",".join(["type"] + ["lustre:" + p for p in LUSTRE_PROPERTIES])
+    # With no pools given zfs walks every imported pool.
+    return [ZFS_CMD, "get", "-H", "-p", "-r", "-o", "name,property,value", props] + (
+        list(pools)
+    )
+
+
+def parse_zfs_get(output: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parses output of zfs_get_command(...) into a dict keyed by dataset name.
+    Values hold the dataset type and Lustre properties, the latter being None
+    when not set, i.e. on datasets which are not Lustre targets.
+    """
+    datasets = dict()
+    for line in output.splitlines():
+        if not line:
+            continue
+        name, prop, value = line.split("\t", 2)
+        details = datasets.get(name)
+        if details is None:
+            details = dict(type=None, **{p: None for p in LUSTRE_PROPERTIES})
+            datasets[name] = details
+        key = prop.split(":", 1)[-1]
+        # Unset user properties are reported as a single dash.
+        if value == "-":
+            value = None
+        elif key == "index":
+            value = int(value)
+        details[key] = value
+    return datasets
+
+
+def target_type_from_svname(svname: Optional[str]) -> Optional[str]:
+    """
+    Derives target type, i.e. mgt, mdt or ost from the service name, e.g.
+    bsrfs-OST0001 or bsrfs:OST0001 prior to first mount, or MGS.
+    """
+    if not svname:
+        return None
+    if svname == "MGS":
+        return "mgt"
+    label = svname.replace(":", "-").rsplit("-", 1)[-1]
+    if label.startswith("MDT"):
+        return "mdt"
+    if label.startswith("OST"):
+        return "ost"
+    return None
+
+
+def split_nids(mgsnode: Optional[str]) -> List[str]:
+    """Splits the mgsnode property, which separates failover NIDs by colons."""
+    if not mgsnode:
+        return []
+    return [nid for group in mgsnode.split(":") for nid in group.split(",") if nid]
+
+
+class LustreTargetInventory:
+    """
+    Indexed view of all datasets on a set of pools, collected with a single
+    `zfs get` invocation.
+    """
+
+    def __init__(self, datasets: Dict[str, Dict[str, Any]]):
+        self.datasets = datasets
+        # Only datasets formatted by mkfs.lustre.
+        self.targets = {
+            name: details for name, details in datasets.items() if details["svname"]
+        }
+        self.by_svname = {
+            details["svname"]: name for name, details in self.targets.items()
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.datasets
+
+    def to_facts(self) -> Dict[str, Any]:
+        return dict(
+            datasets=self.datasets, targets=self.targets, by_svname=self.by_svname
+        )
+
+
+def target_inventory(
+    pools: List[str], run_cmd_func=subprocess.check_output
+) -> Tuple[LustreTargetInventory, subprocess.CalledProcessError]:
+    """Collects the inventory of datasets and Lustre targets on given pools."""
+    # libzfs_core delivered via python3-pyzfs 2.1.15-2.el8 does not, for
+    # whatever reason suppoprt seemingly basic operations like listing children.
+    # For this reason we are exec'ing `zfs` command instead of relying on
+    # libzfs_core.
+    try:
+        output = run_cmd_func(
+            zfs_get_command(pools), stderr=subprocess.PIPE, universal_newlines=True
+        )
+    except subprocess.CalledProcessError as err:
+        return LustreTargetInventory(dict()), err
+    return LustreTargetInventory(parse_zfs_get(output)), None
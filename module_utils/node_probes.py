@@ -0,0 +1,318 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from ansible.module_utils.fact_cache import path_signature
+from ansible.module_utils.hiavd_statefile import DEFAULT_STATEFILE, load_state
+from ansible.module_utils.ipmi_lan import DEFAULT_CHANNELS, lan_channels
+from ansible.module_utils.zfs_kstat import KSTAT_DIR, zfs_kstats
+
+HIAVD_CMD = "/usr/racktop/lib/hiavd"
+BSRADM_CMD = "bsradm"
+IPMI_DEVICE = "/dev/ipmi0"
+PRODUCT_NAME_FILE = "/sys/class/dmi/id/product_name"
+# Database registration and EULA acceptance are recorded in.
+REGISTRATION_DB = "/etc/brickstor/repo.db"
+DEFAULT_CONFIGFILE = "/etc/racktop/hiavd/hiavd.conf"
+DEFAULT_REVISION_ID = 1
+# Seconds each probe may take. A BMC which does not answer is the usual
+# reason for a probe to hang, thus IPMI gets the most generous limit.
+DEFAULT_TIMEOUTS = {"hiavd": 10.0, "registration": 20.0, "ipmi": 30.0, "zfs": 5.0}
+
+
+class MissingRevisionError(Exception):
+    pass
+
+
+class ProbeTimeout(Exception):
+    pass
+
+
+def run_probe_command(
+    cmd: List[str],
+    timeout: float,
+    stderr=subprocess.PIPE,
+    run_cmd=subprocess.run,
+) -> str:
+    """
+    Runs a command of a probe, killing it once the timeout expires. Raises
+    CalledProcessError on failure and TimeoutExpired on timeout.
+    """
+    return run_cmd(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        universal_newlines=True,
+        timeout=timeout,
+        check=True,
+    ).stdout
+
+
+def ha_topology(statefile: str) -> Dict[str, Any]:
+    """
+    Generates precomputed maps describing resource groups, their member pools
+    and owners, so that playbooks can look them up instead of scanning pools.
+    Resource groups are keyed by name.
+    """
+    state = load_state(statefile)
+    groups = {
+        name: {
+            "id": rgid,
+            "owner": state.owner_by_resource_group[rgid],
+            "pools": [],
+        }
+        for rgid, name in state.resource_group_name.items()
+    }
+    pool_resource_group = dict()
+    for poolname, rgid in state.resource_group_by_pool.items():
+        name = state.resource_group_name[rgid]
+        groups[name]["pools"].append(poolname)
+        pool_resource_group[poolname] = {"id": rgid, "name": name}
+    return {
+        "resource_groups": groups,
+        "pool_resource_group": pool_resource_group,
+        "resource_group_owner": {
+            name: details["owner"] for name, details in groups.items()
+        },
+        # Sorted list rather than a set, since facts must be serializable.
+        "unassigned_pools": sorted(
+            set(state.pool_by_name) - set(state.resource_group_by_pool)
+        ),
+    }
+
+
+def statefile_is_missing(statefile: str) -> bool:
+    """Returns True if there is no statefile on the system."""
+    return not os.path.exists(statefile)
+
+
+def revision_is_initial(statefile: str, revision_id: int = DEFAULT_REVISION_ID) -> bool:
+    """Returns True if the state is still at the given initial revision."""
+    state = load_state(statefile)
+    if state.cluster:
+        return state.revision == revision_id
+    raise MissingRevisionError("no revision field found in the state file")
+
+
+def statefile_missing_or_initial(
+    statefile: str, revision_id: int = DEFAULT_REVISION_ID
+) -> bool:
+    """Returns True if no configuration or initial configuration."""
+    return statefile_is_missing(statefile) or revision_is_initial(
+        statefile, revision_id
+    )
+
+
+def no_cluster_nodes_defined(configfile: str):
+    """Returns True if there are no nodes defined in the cluster."""
+    with open(configfile, "rb") as f:
+        for line in f.readlines():
+            if line.startswith(b"[[ClusterNodes]]"):
+                return False
+    return True
+
+
+def hiavd_probe(
+    configfile: str = DEFAULT_CONFIGFILE,
+    statefile: str = DEFAULT_STATEFILE,
+    timeout: float = DEFAULT_TIMEOUTS["hiavd"],
+    run_cmd=subprocess.run,
+    revision_id: int = DEFAULT_REVISION_ID,
+) -> Dict[str, Any]:
+    """
+    Collects hiavd version along with state of its configuration, which is new
+    while the state is missing or still at the given initial revision.
+    """
+    res = run_probe_command([HIAVD_CMD, "-version"], timeout, run_cmd=run_cmd)
+    _, version = res.split()
+    return {
+        "hiavd": {
+            "new_configuration": no_cluster_nodes_defined(configfile)
+            or statefile_missing_or_initial(statefile, revision_id),
+            "pools": load_state(statefile).pool_by_name,
+            "version": version,
+            **ha_topology(statefile),
+        }
+    }
+
+
+# @dataclass
+class Registration:
+    def __init__(self, version: int, customer: str, serial: str, created: str):
+        self.version = version
+        self.customer = customer
+        self.serial = serial
+        self.created = created
+
+
+def get_system_registration(output: str):
+    try:
+        decoded = json.loads(output)
+        return (
+            Registration(
+                decoded["Version"],
+                decoded["Customer"],
+                decoded["Serial"],
+                decoded["Created"],
+            ),
+            None,
+        )
+    except json.decoder.JSONDecodeError as e:
+        return Registration(-1, "", "", ""), e.msg
+
+
+def registration_probe(
+    timeout: float = DEFAULT_TIMEOUTS["registration"], run_cmd=subprocess.run
+) -> Dict[str, Any]:
+    """Collects registration details, i.e. persona, of the system."""
+    try:
+        res = run_probe_command(
+            [BSRADM_CMD, "-j", "per", "view"],
+            timeout,
+            # Send STDERR to STDOUT to handle the system unregistered case.
+            # In this case the JSON object with an error and lack of
+            # registration indication is written to STDERR instead of STDOUT.
+            stderr=subprocess.STDOUT,
+            run_cmd=run_cmd,
+        )
+    except subprocess.CalledProcessError:
+        return {
+            "persona": {
+                "version": -1,
+                "customer": "na",
+                "serial": "na",
+                "created": "na",
+            },
+            "system_is_registered": False,
+        }
+    registration, msg = get_system_registration(res)
+    # If there is a message, we encountered an error decoding JSON data.
+    if msg:
+        raise ValueError(msg)
+    return {
+        "persona": {
+            "version": registration.version,
+            "customer": registration.customer,
+            "serial": registration.serial,
+            "created": registration.created,
+        },
+        "system_is_registered": True,
+    }
+
+
+def is_vm(prod_name_filename=PRODUCT_NAME_FILE) -> bool:
+    with open(prod_name_filename, "rb") as fp:
+        if fp.readline().decode("utf8").lower().startswith("vm"):
+            return True
+    return False
+
+
+def ipmi_probe(
+    timeout: float = DEFAULT_TIMEOUTS["ipmi"],
+    run_cmd=subprocess.run,
+    channels: List[int] = DEFAULT_CHANNELS,
+) -> Dict[str, Any]:
+    """
+    Collects LAN settings of every channel of the BMC, if there is one, along
+    with the address of the primary channel, i.e. the first one configured.
+    """
+    if is_vm() or not os.path.exists(IPMI_DEVICE):
+        return {"ipmi_ip_address": "", "ipmi_present": False, "ipmi_lan": {}}
+    lan, errors = lan_channels(channels, timeout, run_cmd)
+    # Channels which are not LAN channels fail, only a BMC which does not answer
+    # on any channel is an error.
+    if not lan["channels"] and errors:
+        raise next(iter(errors.values()))
+    primary = lan["channels"].get(str(lan["primary_channel"]), {})
+    return {
+        "ipmi_ip_address": primary.get("ip_address", ""),
+        "ipmi_present": True,
+        "ipmi_lan": lan,
+    }
+
+
+def zfs_probe(
+    timeout: float = DEFAULT_TIMEOUTS["zfs"], kstat_dir: str = KSTAT_DIR
+) -> Dict[str, Any]:
+    """Collects pool and ARC statistics, which are read from kstats only."""
+    return {"zfs": zfs_kstats(kstat_dir)}
+
+
+def probe_signatures(
+    configfile: str = DEFAULT_CONFIGFILE,
+    statefile: str = DEFAULT_STATEFILE,
+    revision_id: int = DEFAULT_REVISION_ID,
+    channels: List[int] = DEFAULT_CHANNELS,
+) -> Dict[str, List[Any]]:
+    """
+    Describes, for each probe whose facts may be cached, the files whose change
+    invalidates them: the hiavd binary along with its configuration and state,
+    the registration database and presence of the IPMI device. Parameters the
+    facts depend on are included as well, so that every module caching a probe
+    agrees on its signature given the same parameters.
+    """
+    return {
+        "hiavd": [
+            path_signature(HIAVD_CMD),
+            path_signature(configfile),
+            path_signature(statefile),
+            revision_id,
+        ],
+        "registration": [path_signature(REGISTRATION_DB)],
+        "ipmi": [
+            path_signature(IPMI_DEVICE, presence_only=True),
+            path_signature(PRODUCT_NAME_FILE, presence_only=True),
+            sorted(channels),
+        ],
+    }
+
+
+def run_probes(
+    probes: Dict[str, Callable[[float], Dict[str, Any]]],
+    timeouts: Dict[str, float],
+) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, str]]:
+    """
+    Runs all probes concurrently, each called with its timeout, and returns
+    facts of all which succeeded, along with how long each took and errors of
+    the ones which failed. Probes are expected to honour their timeout, yet
+    one which does not is given up on, rather than waited for, once the
+    longest timeout has expired.
+    """
+    facts, timings, errors = dict(), dict(), dict()
+    results: Dict[str, Tuple[Dict[str, Any], Exception]] = dict()
+
+    def timed(name: str):
+        start = time.monotonic()
+        try:
+            result = probes[name](timeouts[name]), None
+        except Exception as err:
+            result = None, err
+        timings[name] = round(time.monotonic() - start, 3)
+        results[name] = result
+
+    # Daemon threads rather than an executor, whose threads are joined when
+    # the interpreter exits, thus a hung probe would keep the module running.
+    threads = {
+        name: threading.Thread(target=timed, args=(name,), daemon=True)
+        for name in probes
+    }
+    for thread in threads.values():
+        thread.start()
+    deadline = time.monotonic() + max(timeouts.values(), default=0) + 1
+    # Facts are merged in the order probes were given, not of completion.
+    for name, thread in threads.items():
+        thread.join(max(deadline - time.monotonic(), 0))
+        if name not in results:
+            errors[name] = str(ProbeTimeout(f"no result after {timeouts[name]}s"))
+            continue
+        result, err = results[name]
+        if err is not None:
+            errors[name] = str(err)
+        else:
+            facts.update(result)
+    # A copy, which probes given up on can no longer change.
+    timings = {name: timings.get(name, timeouts[name]) for name in probes}
+    return facts, timings, errors
@@ -0,0 +1,165 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional, Tuple
+
+DEFAULT_KEYDIR = "/root/.ssh"
+DEFAULT_SSH_CMD = "/bin/ssh"
+# How long, in seconds, the master connection lingers after the last command
+# if it is not explicitly closed, e.g. when the module is killed.
+DEFAULT_CONTROL_PERSIST = 60
+# Seconds ssh may take to connect to the peer, and the whole of establishing
+# the master connection, including authentication, may take.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_OPEN_TIMEOUT = 30
+
+
+def generate_ssh_cmd_prefix(
+    addr: str, keydir: str = DEFAULT_KEYDIR, ssh_cmd: str = DEFAULT_SSH_CMD
+) -> List[str]:
+    """Generate SSH command prefix for remote execution."""
+    return [
+        ssh_cmd,
+        "-o",
+        "StrictHostKeyChecking=no",
+        "-i",
+        f"{keydir}/id_ed25519",
+        addr,
+    ]
+
+
+class PeerCommandRunner:
+    """
+    Runs commands on the HA peer over a single multiplexed SSH connection.
+
+    The master connection is established once by open() and every command
+    passed to run() reuses it, thus only the first command pays for the key
+    exchange. If the master connection cannot be established commands are
+    still run, each over its own connection. Connections never prompt for a
+    password, thus a peer which does not accept the key fails rather than hangs.
+    """
+
+    def __init__(
+        self,
+        addr: str,
+        keydir: str = DEFAULT_KEYDIR,
+        ssh_cmd: str = DEFAULT_SSH_CMD,
+        control_persist: int = DEFAULT_CONTROL_PERSIST,
+        connect_timeout: int = DEFAULT_CONNECT_TIMEOUT,
+    ):
+        self._addr = addr
+        self._keydir = keydir
+        self._ssh_cmd = ssh_cmd
+        self._control_persist = control_persist
+        self._connect_timeout = connect_timeout
+        self._control_dir = ""
+        self._multiplexed = False
+
+    @property
+    def control_path(self) -> str:
+        if not self._control_dir:
+            return ""
+        return os.path.join(self._control_dir, "master.sock")
+
+    @property
+    def multiplexed(self) -> bool:
+        return self._multiplexed
+
+    def _prefix(self, *options: str) -> List[str]:
+        # Options must precede the destination address, which is the last
+        # element of the prefix.
+        prefix = generate_ssh_cmd_prefix(self._addr, self._keydir, self._ssh_cmd)
+        options = [
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            f"ConnectTimeout={self._connect_timeout}",
+        ] + list(options)
+        return prefix[:-1] + options + prefix[-1:]
+
+    def open(self, timeout: float = DEFAULT_OPEN_TIMEOUT) -> Tuple[bool, Exception]:
+        """
+        Establishes the master connection to the peer, giving up once timeout
+        seconds have passed.
+        """
+        if self._multiplexed:
+            return True, None
+        # Keep the socket path short, it is subject to the sun_path limit.
+        self._control_dir = tempfile.mkdtemp(prefix="peer-")
+        cmd = self._prefix(
+            "-o",
+            "ControlMaster=yes",
+            "-o",
+            f"ControlPath={self.control_path}",
+            "-o",
+            f"ControlPersist={self._control_persist}",
+            "-f",
+            "-N",
+        )
+        try:
+            # Once authenticated the master goes into the background while
+            # holding on to its stdio, thus we must not wait for EOF on pipes.
+            subprocess.run(
+                cmd,
+                check=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+            )
+        except (
+            subprocess.CalledProcessError,
+            subprocess.TimeoutExpired,
+            OSError,
+        ) as err:
+            shutil.rmtree(self._control_dir, ignore_errors=True)
+            self._control_dir = ""
+            return False, err
+        self._multiplexed = True
+        return True, None
+
+    def command(self, cmd: List[str]) -> List[str]:
+        """Returns the full command line used to run cmd on the peer."""
+        if not self._multiplexed:
+            return self._prefix() + cmd
+        return (
+            self._prefix(
+                "-o", "ControlMaster=no", "-o", f"ControlPath={self.control_path}"
+            )
+            + cmd
+        )
+
+    def run(
+        self, cmd: List[str], timeout: Optional[float] = None, **kwargs
+    ) -> subprocess.CompletedProcess:
+        """
+        Runs cmd on the peer. Accepts the same arguments as subprocess.run,
+        which kills ssh and raises TimeoutExpired once timeout seconds have
+        passed, e.g. when the remote command or the master connection hangs.
+        """
+        return subprocess.run(self.command(cmd), timeout=timeout, **kwargs)
+
+    def close(self):
+        """Tears down the master connection if there is one."""
+        if not self._multiplexed:
+            return
+        try:
+            subprocess.run(
+                self._prefix("-o", f"ControlPath={self.control_path}", "-O", "exit"),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            pass  # Master will exit on its own once ControlPersist expires.
+        shutil.rmtree(self._control_dir, ignore_errors=True)
+        self._control_dir = ""
+        self._multiplexed = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,14 @@
+"""
+Makes module_utils of this repository importable on the controller. Unlike
+modules, controller plugins do not get module_utils adjacent to the playbooks
+on the import path, thus plugins run this file, by path, before importing
+shared code as ansible.module_utils.<name>.
+"""
+
+import os
+
+import ansible.module_utils
+
+MODULE_UTILS = os.path.dirname(os.path.abspath(__file__))
+if MODULE_UTILS not in ansible.module_utils.__path__:
+    ansible.module_utils.__path__.append(MODULE_UTILS)
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+import unittest
+from .fact_cache import FactCache, cached_probe, path_signature
+
+
+class TestFactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = FactCache(os.path.join(self.tmpdir.name, "cache"), ttl=60)
+        self.binary = os.path.join(self.tmpdir.name, "hiavd")
+        with open(self.binary, "w") as fp:
+            fp.write("v1")
+        self.calls = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def probe(self):
+        self.calls += 1
+        return {"hiavd": {"version": f"v{self.calls}"}}
+
+    def test_hit_after_miss(self):
+        signature = [path_signature(self.binary)]
+        facts, hit = cached_probe(self.cache, "hiavd", signature, self.probe)
+        self.assertFalse(hit)
+        facts_again, hit = cached_probe(self.cache, "hiavd", signature, self.probe)
+        self.assertTrue(hit)
+        self.assertEqual(facts, facts_again)
+        self.assertEqual(self.calls, 1)
+
+    def test_signature_change_invalidates(self):
+        cached_probe(self.cache, "hiavd", [path_signature(self.binary)], self.probe)
+        st = os.stat(self.binary)
+        os.utime(self.binary, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        facts, hit = cached_probe(
+            self.cache, "hiavd", [path_signature(self.binary)], self.probe
+        )
+        self.assertFalse(hit)
+        self.assertEqual(facts["hiavd"]["version"], "v2")
+
+    def test_presence_only_signature(self):
+        device = os.path.join(self.tmpdir.name, "ipmi0")
+        self.assertEqual(path_signature(device, presence_only=True), [device, False])
+        open(device, "w").close()
+        self.assertEqual(path_signature(device, presence_only=True), [device, True])
+
+    def test_expired_entry_is_ignored(self):
+        self.cache.put("ipmi", [], {"ipmi_present": False})
+        self.assertEqual(self.cache.get("ipmi", []), {"ipmi_present": False})
+        self.cache.ttl = 0
+        self.assertIsNone(self.cache.get("ipmi", []))
+        # Entries written with a clock ahead of ours are ignored as well.
+        self.cache.ttl = 60
+        entry = self.cache.entry_path("ipmi")
+        with open(entry, "w") as fp:
+            fp.write('{"format": 1, "created": %f, "facts": {}}' % (time.time() + 99))
+        self.assertIsNone(self.cache.get("ipmi", None))
+
+    def test_unwritable_cache_still_runs_probe(self):
+        cache = FactCache(os.path.join(self.binary, "not-a-directory"), ttl=60)
+        facts, hit = cached_probe(cache, "hiavd", [], self.probe)
+        self.assertFalse(hit)
+        self.assertEqual(facts["hiavd"]["version"], "v1")
+        self.assertIsNone(cache.get("hiavd", []))
+
+    def test_failed_put_leaves_no_partial_entry(self):
+        self.assertFalse(self.cache.put("ipmi", [], {"ipmi_present": object()}))
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+        self.assertIsNone(self.cache.get("ipmi", []))
@@ -0,0 +1,99 @@
+import unittest
+from .ha_pairs import ha_pair_records
+
+
+def hostvars_of(*hosts, **extra):
+    """Facts of each host named after it, with extra variables per host."""
+    hostvars = dict()
+    for i, host in enumerate(hosts):
+        hostvars[host] = dict(
+            ansible_hostname=f"{host}-name",
+            ansible_product_uuid=f"{host}-uuid",
+            ansible_default_ipv4={"address": f"10.0.0.{i}"},
+            hb_iface_ipaddr=f"192.168.0.{i}",
+            ipmi_ip_address=f"10.1.0.{i}",
+            **extra.get(host, {}),
+        )
+    return hostvars
+
+
+class TestHAPairs(unittest.TestCase):
+    def test_hosts_paired_in_order_of_listing(self):
+        hostvars = hostvars_of(
+            "oss1", "oss2", "oss3", "oss4", "wit", wit=dict(role="oss")
+        )
+        groups = {"oss": ["oss1", "oss2", "oss3", "oss4"], "cluster_witness": ["wit"]}
+        records = ha_pair_records(hostvars, groups)
+        self.assertEqual(records["oss1"]["peer_inventory_name"], "oss2")
+        self.assertEqual(records["oss4"]["peer_inventory_name"], "oss3")
+        self.assertEqual(records["oss3"]["first_node_name"], "oss3-name")
+        self.assertEqual(records["oss3"]["second_node_uuid"], "oss4-uuid")
+        self.assertEqual(
+            records["oss3"]["second_node_private_ip_address"], "192.168.0.3"
+        )
+        self.assertEqual(records["oss2"]["witness_name"], "wit-name")
+        self.assertEqual(records["oss2"]["witness_public_ip_address"], "10.0.0.4")
+        self.assertEqual(records["oss2"]["debug_group"], "oss")
+        # Both hosts of a pair share the same details.
+        self.assertEqual(
+            {k: v for k, v in records["oss1"].items() if k != "peer_inventory_name"},
+            {k: v for k, v in records["oss2"].items() if k != "peer_inventory_name"},
+        )
+
+    def test_first_ha_node_swaps_pair(self):
+        hostvars = hostvars_of("mds1", "mds2", mds1=dict(first_ha_node=False))
+        records = ha_pair_records(hostvars, {"mds": ["mds1", "mds2"]})
+        self.assertEqual(records["mds1"]["first_node_name"], "mds2-name")
+        self.assertEqual(records["mds1"]["second_node_name"], "mds1-name")
+        self.assertEqual(records["mds1"]["peer_inventory_name"], "mds2")
+        self.assertIsNone(records["mds1"]["witness_name"])
+
+    def test_witness_gets_pair_by_index(self):
+        hostvars = hostvars_of(
+            "oss1",
+            "oss2",
+            "oss3",
+            "oss4",
+            "wit",
+            wit=dict(role="oss", ha_pair_index="1"),
+        )
+        groups = {"oss": ["oss1", "oss2", "oss3", "oss4"], "cluster_witness": ["wit"]}
+        record = ha_pair_records(hostvars, groups)["wit"]
+        self.assertEqual(record["first_node_name"], "oss3-name")
+        self.assertEqual(record["second_node_name"], "oss4-name")
+        self.assertEqual(record["witness_uuid"], "wit-uuid")
+        self.assertEqual(record["debug_my_role"], "witness for oss")
+        # Without an index the first pair is used.
+        del hostvars["wit"]["ha_pair_index"]
+        record = ha_pair_records(hostvars, groups)["wit"]
+        self.assertEqual(record["first_node_name"], "oss1-name")
+
+    def test_witness_without_pair(self):
+        hostvars = hostvars_of("oss1", "oss2", "wit", wit=dict(role="oss"))
+        hostvars["wit"]["ha_pair_index"] = 1
+        groups = {"oss": ["oss1", "oss2"], "cluster_witness": ["wit"]}
+        with self.assertRaisesRegex(ValueError, "witness wit has no pair 1"):
+            ha_pair_records(hostvars, groups)
+        hostvars["wit"]["role"] = "mds"
+        hostvars["wit"]["ha_pair_index"] = 0
+        with self.assertRaisesRegex(ValueError, "no pair 0 in group mds"):
+            ha_pair_records(hostvars, groups)
+
+    def test_witness_of_other_role_gets_mds_pair(self):
+        """Any witness role other than oss must mean the metadata servers"""
+        hostvars = hostvars_of(
+            "oss1", "oss2", "mds1", "mds2", "wit", wit=dict(role="mgs")
+        )
+        groups = {
+            "oss": ["oss1", "oss2"],
+            "mds": ["mds1", "mds2"],
+            "cluster_witness": ["wit"],
+        }
+        record = ha_pair_records(hostvars, groups)["wit"]
+        self.assertEqual(record["first_node_name"], "mds1-name")
+        self.assertEqual(record["debug_my_role"], "witness for mgs")
+
+    def test_odd_group_cannot_be_paired(self):
+        hostvars = hostvars_of("oss1", "oss2", "oss3")
+        with self.assertRaisesRegex(ValueError, "group oss has 3 hosts"):
+            ha_pair_records(hostvars, {"oss": ["oss1", "oss2", "oss3"]})
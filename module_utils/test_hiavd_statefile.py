@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from .hiavd_statefile import StatefileWatcher, load_state, read_revision
+
+
+def write_statefile(path: str, revision: int):
+    # Mimic hiavd replacing the file rather than rewriting it in place.
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fp:
+        json.dump({"Version": 2, "Cluster": {"Revision": revision}}, fp)
+    os.rename(tmp, path)
+
+
+class TestStatefileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.statefile = os.path.join(self.tmpdir.name, "serialized.dat")
+        write_statefile(self.statefile, 5)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_revision(self):
+        """Revision is read from the file, absent or partial files yield None"""
+        self.assertEqual(read_revision(self.statefile), 5)
+        self.assertIsNone(read_revision(self.statefile + ".missing"))
+        with open(self.statefile, "w") as fp:
+            fp.write('{"Cluster": {"Rev')
+        self.assertIsNone(read_revision(self.statefile))
+
+    def test_wait_returns_on_revision_change(self):
+        """Waiting must end as soon as the revision changes, not at the timeout"""
+        for use_inotify in (True, False):
+            write_statefile(self.statefile, 5)
+            with StatefileWatcher(
+                self.statefile, poll_interval=0.05, use_inotify=use_inotify
+            ) as watcher:
+                timer = threading.Timer(0.2, write_statefile, args=(self.statefile, 6))
+                timer.start()
+                start = time.monotonic()
+                revision = watcher.wait_for_revision_change(5, timeout=10)
+                elapsed = time.monotonic() - start
+                timer.join()
+            self.assertEqual(revision, 6, f"use_inotify={use_inotify}")
+            self.assertLess(elapsed, 2, f"use_inotify={use_inotify}")
+
+    def test_wait_times_out_without_change(self):
+        """Waiting must give up at the deadline if the revision stays put"""
+        for use_inotify in (True, False):
+            with StatefileWatcher(
+                self.statefile, poll_interval=0.05, use_inotify=use_inotify
+            ) as watcher:
+                start = time.monotonic()
+                revision = watcher.wait_for_revision_change(5, timeout=0.3)
+                elapsed = time.monotonic() - start
+            self.assertIsNone(revision)
+            self.assertGreaterEqual(elapsed, 0.3)
+            self.assertLess(elapsed, 2)
+
+
+class TestLoadState(unittest.TestCase):
+    STATE = {
+        "Version": 2,
+        "Cluster": {
+            "Revision": 7,
+            "ResourceGroups": {
+                "rg-guid-01": {"Name": "RG01", "Node": "node-guid-a"},
+                "rg-guid-02": {"Name": "RG02", "Node": "node-guid-b"},
+            },
+            "Pools": {
+                "pool-guid-01": {
+                    "CachedName": "p01",
+                    "ResourceGroupId": "rg-guid-01",
+                },
+                "pool-guid-02": {
+                    "CachedName": "p02",
+                    "ResourceGroupId": "rg-guid-02",
+                },
+                "pool-guid-03": {
+                    "CachedName": "p03",
+                    "ResourceGroupId": "rg-guid-gone",
+                },
+                "pool-guid-04": {"ResourceGroupId": "rg-guid-01"},
+            },
+        },
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.statefile = os.path.join(self.tmpdir.name, "serialized.dat")
+        with open(self.statefile, "w") as fp:
+            json.dump(self.STATE, fp)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_indexes(self):
+        """Pools, resource groups and owners must be indexed by name"""
+        state = load_state(self.statefile)
+        self.assertEqual(state.revision, 7)
+        self.assertEqual(sorted(state.pool_by_name), ["p01", "p02", "p03"])
+        self.assertEqual(
+            state.resource_group_by_pool, {"p01": "rg-guid-01", "p02": "rg-guid-02"}
+        )
+        self.assertEqual(
+            state.owner_by_resource_group,
+            {"rg-guid-01": "node-guid-a", "rg-guid-02": "node-guid-b"},
+        )
+        self.assertEqual(
+            state.resource_group_name, {"rg-guid-01": "RG01", "rg-guid-02": "RG02"}
+        )
+
+    def test_parsed_once_per_file_version(self):
+        """Unchanged file must not be parsed again, a replaced one must be"""
+        first = load_state(self.statefile)
+        self.assertIs(load_state(self.statefile), first)
+        write_statefile(self.statefile, 8)
+        second = load_state(self.statefile)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.revision, 8)
+        self.assertEqual(second.pool_by_name, {})
+
+    def test_missing_file(self):
+        """Missing file must yield an empty state"""
+        state = load_state(self.statefile + ".missing")
+        self.assertEqual(state.raw, {})
+        self.assertIsNone(state.revision)
+        self.assertEqual(state.resource_group_by_pool, {})
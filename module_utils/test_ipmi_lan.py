@@ -0,0 +1,89 @@
+import subprocess
+import threading
+import time
+import unittest
+from .ipmi_lan import lan_channels, parse_lan_print
+
+LAN_PRINT = """Set in Progress         : Set Complete
+Auth Type Support       : NONE MD2 MD5 PASSWORD
+Auth Type Enable        : Callback : MD2 MD5 PASSWORD
+                        : User     : MD2 MD5 PASSWORD
+                        : Admin    : MD2 MD5 PASSWORD
+IP Address Source       : Static Address
+IP Address              : 10.0.0.5
+Subnet Mask             : 255.255.255.0
+MAC Address             : 0c:c4:7a:aa:bb:cc
+SNMP Community String   : public
+Default Gateway IP      : 10.0.0.1
+Default Gateway MAC     : 00:00:00:00:00:00
+802.1q VLAN ID          : 42
+802.1q VLAN Priority    : 0
+Cipher Suite Priv Max   : aaaaXXaaaXXaaXX
+                        :     X=Cipher Suite Unused
+"""
+
+UNCONFIGURED = """IP Address Source       : DHCP Address
+IP Address              : 0.0.0.0
+Subnet Mask             : 0.0.0.0
+MAC Address             : 0c:c4:7a:aa:bb:cd
+802.1q VLAN ID          : Disabled
+"""
+
+
+def fake_ipmitool(outputs, hang=()):
+    """Answers `ipmitool lan print <channel>` from outputs keyed by channel."""
+    released = threading.Event()
+
+    def run_cmd(cmd, timeout=None, **kwargs):
+        channel = int(cmd[-1])
+        if channel in hang:
+            released.wait(timeout)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        if channel not in outputs:
+            raise subprocess.CalledProcessError(1, cmd, "", "Invalid channel")
+        return subprocess.CompletedProcess(cmd, 0, outputs[channel], "")
+
+    return run_cmd
+
+
+class TestIPMILan(unittest.TestCase):
+    def test_parse_lan_print(self):
+        self.assertEqual(
+            parse_lan_print(LAN_PRINT),
+            {
+                "ip_address_source": "static",
+                "ip_address": "10.0.0.5",
+                "subnet_mask": "255.255.255.0",
+                "mac_address": "0c:c4:7a:aa:bb:cc",
+                "default_gateway": "10.0.0.1",
+                "default_gateway_mac": "00:00:00:00:00:00",
+                "vlan_id": 42,
+                "vlan_priority": 0,
+            },
+        )
+        lan = parse_lan_print(UNCONFIGURED)
+        self.assertEqual(lan["ip_address_source"], "dhcp")
+        self.assertIsNone(lan["vlan_id"])
+        self.assertIsNone(lan["default_gateway"])
+
+    def test_primary_is_first_configured_channel(self):
+        """BMCs need not be on channel 3"""
+        run_cmd = fake_ipmitool({1: UNCONFIGURED, 3: LAN_PRINT, 8: LAN_PRINT})
+        lan, errors = lan_channels([1, 2, 3, 8], 1.0, run_cmd)
+        self.assertEqual(lan["primary_channel"], 3)
+        self.assertEqual(sorted(lan["channels"]), ["1", "3", "8"])
+        self.assertEqual(list(errors), [2])
+
+    def test_hung_channel_is_bounded_by_timeout(self):
+        run_cmd = fake_ipmitool({1: LAN_PRINT}, hang=(2, 3))
+        start = time.monotonic()
+        lan, errors = lan_channels([1, 2, 3], 0.5, run_cmd)
+        # Both hung channels are waited for at once.
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(lan["primary_channel"], 1)
+        self.assertIsInstance(errors[2], subprocess.TimeoutExpired)
+        self.assertIsInstance(errors[3], subprocess.TimeoutExpired)
+
+    def test_no_configured_channel(self):
+        lan, _ = lan_channels([1], 1.0, fake_ipmitool({1: UNCONFIGURED}))
+        self.assertIsNone(lan["primary_channel"])
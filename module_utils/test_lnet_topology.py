@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from .lnet_topology import (
+    MAX_CREDITS,
+    MIN_CREDITS,
+    lnet_topology,
+    o2ib_tunables,
+    parse_cpulist,
+)
+
+
+class TestLnetTopology(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.sysfs = self.tmpdir.name
+        # Dual-socket system with an HCA on each socket.
+        self.add_node(0, "0-3,8-11")
+        self.add_node(1, "4-7,12-15")
+        self.add_device("0000:3b:00.0", 0, hca="mlx5_0", ifaces=["ib0"])
+        self.add_device("0000:d8:00.0", 1, hca="mlx5_1", ifaces=["ib1"], rate="200")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, path: str, contents: str):
+        path = os.path.join(self.sysfs, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            fp.write(contents + "\n")
+
+    def add_node(self, node: int, cpulist: str):
+        self.write(f"devices/system/node/node{node}/cpulist", cpulist)
+
+    def add_device(self, pci: str, numa_node: int, hca: str, ifaces, rate="100"):
+        devicedir = os.path.join(self.sysfs, "devices/pci0000:00", pci)
+        self.write(os.path.join(devicedir, "numa_node"), str(numa_node))
+        self.write(f"class/infiniband/{hca}/ports/1/rate", f"{rate} Gb/sec (4X EDR)")
+        links = [f"class/infiniband/{hca}"] + [f"class/net/{i}" for i in ifaces]
+        for link in links:
+            os.makedirs(os.path.join(self.sysfs, link), exist_ok=True)
+            os.symlink(devicedir, os.path.join(self.sysfs, link, "device"))
+
+    def test_parse_cpulist(self):
+        self.assertEqual(parse_cpulist("0-2,8,10-11"), [0, 1, 2, 8, 10, 11])
+        self.assertEqual(parse_cpulist(""), [])
+
+    def test_interfaces_get_local_cpt(self):
+        """Each interface must be bound to the CPT of its NUMA node"""
+        topology = lnet_topology(self.sysfs)
+        self.assertEqual(topology["cpts"], [0, 1])
+        ib0, ib1 = topology["interfaces"]["ib0"], topology["interfaces"]["ib1"]
+        self.assertEqual(
+            (ib0["hca"], ib0["numa_node"], ib0["cpts"]), ("mlx5_0", 0, [0])
+        )
+        self.assertEqual(
+            (ib1["hca"], ib1["numa_node"], ib1["cpts"]), ("mlx5_1", 1, [1])
+        )
+        self.assertEqual(ib1["cpus"], [4, 5, 6, 7, 12, 13, 14, 15])
+        self.assertEqual((ib0["port"], ib0["rate_gbps"]), (1, 100.0))
+        self.assertEqual((ib1["port"], ib1["rate_gbps"]), (1, 200.0))
+        self.assertEqual(topology["infiniband"]["mlx5_1"]["pci_device"], "0000:d8:00.0")
+
+    def test_unknown_locality_uses_all_cpts(self):
+        """Devices whose NUMA node is unknown must not be pinned to one CPT"""
+        self.add_device("0000:af:00.0", -1, hca="mlx5_2", ifaces=["ib2"])
+        topology = lnet_topology(self.sysfs)
+        self.assertIsNone(topology["interfaces"]["ib2"]["numa_node"])
+        self.assertEqual(topology["interfaces"]["ib2"]["cpts"], [0, 1])
+
+    def test_missing_sysfs(self):
+        topology = lnet_topology(os.path.join(self.sysfs, "missing"))
+        self.assertEqual(topology["interfaces"], {})
+        self.assertEqual(topology["cpts"], [0])
+
+
+class TestO2ibTunables(unittest.TestCase):
+    def test_roles(self):
+        """Object storage servers must get twice the transmit descriptors"""
+        oss = o2ib_tunables(64, "oss", 100)
+        mds = o2ib_tunables(64, "mds", 100)
+        self.assertEqual(oss["credits"], mds["credits"])
+        self.assertEqual(oss["ntx"], 2 * mds["ntx"])
+        with self.assertRaises(ValueError):
+            o2ib_tunables(64, "client")
+
+    def test_peer_credits_follow_link_rate(self):
+        """Each rate threshold must be inclusive, unknown rates get the default"""
+        for rate, expected in (
+            (None, 8),
+            (40, 8),
+            (55.9, 8),
+            (56, 16),
+            (99, 16),
+            (100, 32),
+            (200, 64),
+            (400, 64),
+        ):
+            tunables = o2ib_tunables(1, "oss", rate)
+            self.assertEqual(tunables["peer_credits"], expected, rate)
+            self.assertEqual(tunables["concurrent_sends"], expected)
+            self.assertEqual(tunables["peercredits_hiw"], expected // 2)
+
+    def test_credits_scale_with_peers(self):
+        """Credits must cover all peers, rounded up, within bounds"""
+        # 32 peer credits at 100 Gb/s.
+        self.assertEqual(o2ib_tunables(0, "mds", 100)["credits"], MIN_CREDITS)
+        self.assertEqual(o2ib_tunables(8, "mds", 100)["credits"], MIN_CREDITS)
+        self.assertEqual(o2ib_tunables(9, "mds", 100)["credits"], 512)
+        self.assertEqual(o2ib_tunables(100, "mds", 100)["credits"], 4096)
+        self.assertEqual(o2ib_tunables(256, "mds", 100)["credits"], MAX_CREDITS)
+        self.assertEqual(o2ib_tunables(10000, "mds", 100)["credits"], MAX_CREDITS)
+
+    def test_ntx_lower_bound(self):
+        """Transmit descriptors must not drop below the minimum"""
+        self.assertEqual(o2ib_tunables(1, "mds")["ntx"], 512)
+        self.assertEqual(o2ib_tunables(1, "oss")["ntx"], 512)
+        self.assertEqual(o2ib_tunables(1000, "oss", 200)["ntx"], 2 * MAX_CREDITS)
+
+    def test_conns_per_peer(self):
+        """A second connection needs both a fast link and spare cores"""
+        self.assertEqual(o2ib_tunables(1, "oss", 200, 16)["conns_per_peer"], 2)
+        self.assertEqual(o2ib_tunables(1, "oss", 200, 15)["conns_per_peer"], 1)
+        self.assertEqual(o2ib_tunables(1, "oss", 100, 64)["conns_per_peer"], 1)
+        self.assertEqual(o2ib_tunables(1, "oss", 200)["conns_per_peer"], 1)
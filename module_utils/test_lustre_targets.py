@@ -0,0 +1,96 @@
+import subprocess
+import unittest
+from .lustre_targets import (
+    parse_zfs_get,
+    split_nids,
+    target_inventory,
+    target_type_from_svname,
+    zfs_get_command,
+)
+
+ZFS_GET_OUTPUT = """p01\ttype\tfilesystem
+p01\tlustre:svname\t-
+p01\tlustre:fsname\t-
+p01\tlustre:index\t-
+p01\tlustre:mgsnode\t-
+p01/mgt01\ttype\tfilesystem
+p01/mgt01\tlustre:svname\tMGS
+p01/mgt01\tlustre:fsname\tbsrfs
+p01/mgt01\tlustre:index\t65535
+p01/mgt01\tlustre:mgsnode\t-
+p01/ost01\ttype\tfilesystem
+p01/ost01\tlustre:svname\tbsrfs-OST0001
+p01/ost01\tlustre:fsname\tbsrfs
+p01/ost01\tlustre:index\t1
+p01/ost01\tlustre:mgsnode\t192.168.2.21@o2ib:192.168.2.23@o2ib
+"""
+
+
+class TestLustreTargets(unittest.TestCase):
+    def test_zfs_get_command(self):
+        """A single recursive zfs get must cover all pools and properties"""
+        self.assertEqual(
+            zfs_get_command(["p01", "p02"]),
+            [
+                "zfs",
+                "get",
+                "-H",
+                "-p",
+                "-r",
+                "-o",
+                "name,property,value",
+                "type,lustre:svname,lustre:fsname,lustre:index,lustre:mgsnode",
+                "p01",
+                "p02",
+            ],
+        )
+
+    def test_parse_zfs_get(self):
+        """Unset properties must be None and the index numeric"""
+        datasets = parse_zfs_get(ZFS_GET_OUTPUT)
+        self.assertEqual(sorted(datasets), ["p01", "p01/mgt01", "p01/ost01"])
+        self.assertEqual(
+            datasets["p01"],
+            dict(type="filesystem", svname=None, fsname=None, index=None, mgsnode=None),
+        )
+        self.assertEqual(datasets["p01/ost01"]["index"], 1)
+        self.assertEqual(datasets["p01/ost01"]["svname"], "bsrfs-OST0001")
+
+    def test_target_inventory_indexes(self):
+        """Only formatted datasets must be indexed as targets"""
+
+        def run_cmd(cmd, **_):
+            return ZFS_GET_OUTPUT
+
+        inventory, err = target_inventory(["p01"], run_cmd_func=run_cmd)
+        self.assertIsNone(err)
+        self.assertIn("p01", inventory)
+        self.assertEqual(sorted(inventory.targets), ["p01/mgt01", "p01/ost01"])
+        self.assertEqual(
+            inventory.by_svname, {"MGS": "p01/mgt01", "bsrfs-OST0001": "p01/ost01"}
+        )
+
+    def test_target_inventory_error(self):
+        """Failure to run zfs must be returned along with an empty inventory"""
+
+        def run_cmd(cmd, **_):
+            raise subprocess.CalledProcessError(1, cmd, stderr="no such pool")
+
+        inventory, err = target_inventory(["p09"], run_cmd_func=run_cmd)
+        self.assertIsNotNone(err)
+        self.assertNotIn("p09", inventory)
+
+    def test_target_type_from_svname(self):
+        """Target type must be derived from registered and unregistered names"""
+        inputs = ["MGS", "bsrfs-MDT0000", "bsrfs:OST000a", "bsrfs-XYZ", None]
+        expected = ["mgt", "mdt", "ost", None, None]
+        for svname, target_type in zip(inputs, expected):
+            self.assertEqual(target_type_from_svname(svname), target_type)
+
+    def test_split_nids(self):
+        """Failover NIDs are separated by colons, NIDs of a node by commas"""
+        self.assertEqual(
+            split_nids("10.0.0.1@o2ib,10.0.1.1@o2ib1:10.0.0.2@o2ib"),
+            ["10.0.0.1@o2ib", "10.0.1.1@o2ib1", "10.0.0.2@o2ib"],
+        )
+        self.assertEqual(split_nids(None), [])
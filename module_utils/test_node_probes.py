@@ -0,0 +1,157 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from .node_probes import ha_topology, hiavd_probe, registration_probe, run_probes
+
+STATE = {
+    "Cluster": {
+        "Revision": 3,
+        "ResourceGroups": {
+            "rg-guid-01": {"Name": "RG01", "Node": "node-guid-a"},
+            "rg-guid-02": {"Name": "RG02", "Node": "node-guid-b"},
+            "rg-guid-03": {"Node": "node-guid-b"},
+        },
+        "Pools": {
+            "pool-guid-01": {"CachedName": "p01", "ResourceGroupId": "rg-guid-01"},
+            "pool-guid-02": {"CachedName": "p02", "ResourceGroupId": "rg-guid-01"},
+            "pool-guid-03": {"CachedName": "p03", "ResourceGroupId": "rg-guid-02"},
+            # Known to hiavd, yet not part of any resource group.
+            "pool-guid-04": {"CachedName": "p04"},
+            "pool-guid-05": {"CachedName": "p05", "ResourceGroupId": "rg-guid-gone"},
+        },
+    }
+}
+
+
+def completed(stdout, returncode=0):
+    def run_cmd(cmd, **kwargs):
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stdout)
+        return subprocess.CompletedProcess(cmd, returncode, stdout)
+
+    return run_cmd
+
+
+class TestNodeProbes(unittest.TestCase):
+    def test_probes_run_concurrently(self):
+        """Probes must take as long as the slowest one, not their sum"""
+        barrier = threading.Barrier(3, timeout=2)
+
+        def probe(key):
+            def run(timeout):
+                barrier.wait()  # Only passes once all probes run at once.
+                return {key: timeout}
+
+            return run
+
+        probes = {name: probe(name) for name in ("a", "b", "c")}
+        facts, timings, errors = run_probes(probes, dict(a=1.0, b=2.0, c=3.0))
+        self.assertEqual(facts, dict(a=1.0, b=2.0, c=3.0))
+        self.assertEqual(sorted(timings), ["a", "b", "c"])
+        self.assertEqual(errors, {})
+
+    def test_failed_and_hung_probes_are_reported(self):
+        release = threading.Event()
+
+        def hung(timeout):
+            release.wait(10)
+            return {"hung": True}
+
+        def failed(timeout):
+            raise subprocess.TimeoutExpired(["ipmitool"], timeout)
+
+        start = time.monotonic()
+        facts, timings, errors = run_probes(
+            dict(ok=lambda timeout: {"ok": True}, hung=hung, failed=failed),
+            dict(ok=0.1, hung=0.1, failed=0.1),
+        )
+        release.set()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(facts, {"ok": True})
+        self.assertEqual(sorted(errors), ["failed", "hung"])
+        self.assertIn("timed out", errors["failed"])
+        self.assertEqual(timings["hung"], 0.1)
+
+    def test_ha_topology(self):
+        """Resource groups, pools and owners must be indexed by name"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            statefile = os.path.join(tmpdir, "serialized.dat")
+            with open(statefile, "w") as fp:
+                json.dump(STATE, fp)
+            topology = ha_topology(statefile)
+        self.assertEqual(
+            topology["resource_groups"],
+            {
+                "RG01": dict(
+                    id="rg-guid-01", owner="node-guid-a", pools=["p01", "p02"]
+                ),
+                "RG02": dict(id="rg-guid-02", owner="node-guid-b", pools=["p03"]),
+                # Unnamed resource groups are known by their GUID.
+                "rg-guid-03": dict(id="rg-guid-03", owner="node-guid-b", pools=[]),
+            },
+        )
+        self.assertEqual(
+            topology["pool_resource_group"],
+            {
+                "p01": dict(id="rg-guid-01", name="RG01"),
+                "p02": dict(id="rg-guid-01", name="RG01"),
+                "p03": dict(id="rg-guid-02", name="RG02"),
+            },
+        )
+        self.assertEqual(
+            topology["resource_group_owner"],
+            {"RG01": "node-guid-a", "RG02": "node-guid-b", "rg-guid-03": "node-guid-b"},
+        )
+        self.assertEqual(topology["unassigned_pools"], ["p04", "p05"])
+
+    def test_ha_topology_without_statefile(self):
+        """A node without a statefile has no topology"""
+        topology = ha_topology("/nonexistent/serialized.dat")
+        self.assertEqual(
+            topology,
+            dict(
+                resource_groups={},
+                pool_resource_group={},
+                resource_group_owner={},
+                unassigned_pools=[],
+            ),
+        )
+
+    def test_hiavd_probe(self):
+        """Pools known to hiavd must include those without a resource group"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            statefile = os.path.join(tmpdir, "serialized.dat")
+            with open(statefile, "w") as fp:
+                json.dump(STATE, fp)
+            configfile = os.path.join(tmpdir, "hiavd.conf")
+            with open(configfile, "w") as fp:
+                fp.write("[[ClusterNodes]]\n")
+            facts = hiavd_probe(
+                configfile, statefile, run_cmd=completed("hiavd 1.2.3\n")
+            )["hiavd"]
+            # The state counts as new while it is at the initial revision.
+            initial = hiavd_probe(
+                configfile,
+                statefile,
+                run_cmd=completed("hiavd 1.2.3\n"),
+                revision_id=STATE["Cluster"]["Revision"],
+            )["hiavd"]
+        self.assertEqual(facts["version"], "1.2.3")
+        self.assertFalse(facts["new_configuration"])
+        self.assertTrue(initial["new_configuration"])
+        self.assertEqual(sorted(facts["pools"]), ["p01", "p02", "p03", "p04", "p05"])
+        self.assertNotIn("p04", facts["pool_resource_group"])
+
+    def test_registration_probe(self):
+        persona = dict(Version=2, Customer="c", Serial="s", Created="2024-01-01")
+        facts = registration_probe(run_cmd=completed(json.dumps(persona)))
+        self.assertTrue(facts["system_is_registered"])
+        self.assertEqual(facts["persona"]["serial"], "s")
+        facts = registration_probe(run_cmd=completed("{}", returncode=1))
+        self.assertFalse(facts["system_is_registered"])
+        with self.assertRaises(ValueError):
+            registration_probe(run_cmd=completed("not json"))
@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from .peer_command import PeerCommandRunner
+
+# Stand-in for /bin/ssh. It records each invocation, pretends to establish and
+# tear down a master connection and runs remote commands locally.
+FAKE_SSH = """#!{python}
+import json, os, subprocess, sys, time
+
+args = sys.argv[1:]
+with open(os.environ["FAKE_SSH_LOG"], "a") as fp:
+    fp.write(json.dumps(args) + "\\n")
+options, control, cmd = [], None, []
+while args:
+    arg = args.pop(0)
+    if arg in ("-o", "-i"):
+        options.append(args.pop(0))
+    elif arg == "-O":
+        control = args.pop(0)
+    elif arg in ("-f", "-N"):
+        continue
+    else:
+        cmd = args[:]
+        break
+path = [o.split("=", 1)[1] for o in options if o.startswith("ControlPath=")]
+if control == "exit":
+    os.unlink(path[0])
+    sys.exit(0)
+if "ControlMaster=yes" in options:
+    if os.environ.get("FAKE_SSH_MASTER_FAIL"):
+        sys.exit(255)
+    if os.environ.get("FAKE_SSH_MASTER_HANG"):
+        time.sleep(30)
+    open(path[0], "w").close()
+    sys.exit(0)
+sys.exit(subprocess.run(cmd).returncode)
+"""
+
+
+class TestPeerCommandRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.ssh_cmd = os.path.join(self.tmpdir.name, "ssh")
+        with open(self.ssh_cmd, "w") as fp:
+            fp.write(FAKE_SSH.format(python=sys.executable))
+        os.chmod(self.ssh_cmd, 0o755)
+        self.log = os.path.join(self.tmpdir.name, "ssh.log")
+        os.environ["FAKE_SSH_LOG"] = self.log
+        os.environ.pop("FAKE_SSH_MASTER_FAIL", None)
+        os.environ.pop("FAKE_SSH_MASTER_HANG", None)
+
+    def tearDown(self):
+        os.environ.pop("FAKE_SSH_LOG", None)
+        os.environ.pop("FAKE_SSH_MASTER_FAIL", None)
+        os.environ.pop("FAKE_SSH_MASTER_HANG", None)
+        self.tmpdir.cleanup()
+
+    def invocations(self):
+        with open(self.log) as fp:
+            return [json.loads(line) for line in fp]
+
+    def test_commands_reuse_master_connection(self):
+        """All commands must go through the single master connection"""
+        with PeerCommandRunner("peer", ssh_cmd=self.ssh_cmd) as runner:
+            self.assertTrue(runner.multiplexed)
+            control_path = runner.control_path
+            self.assertTrue(os.path.exists(control_path))
+            for word in ("one", "two", "three"):
+                res = runner.run(["echo", word], check=True, stdout=subprocess.PIPE)
+                self.assertEqual(res.stdout, f"{word}\n".encode())
+        self.assertFalse(os.path.exists(os.path.dirname(control_path)))
+
+        calls = self.invocations()
+        self.assertEqual(len(calls), 5)
+        masters = [c for c in calls if "ControlMaster=yes" in c]
+        self.assertEqual(len(masters), 1)
+        self.assertIn("-N", masters[0])
+        self.assertIn("BatchMode=yes", masters[0])
+        self.assertIn("ConnectTimeout=10", masters[0])
+        for call in calls[1:4]:
+            self.assertIn("ControlMaster=no", call)
+            self.assertIn(f"ControlPath={control_path}", call)
+            self.assertEqual(call[-3], "peer")
+        self.assertEqual(calls[-1][-3:], ["-O", "exit", "peer"])
+
+    def test_falls_back_to_plain_ssh(self):
+        """Commands must still run when the master connection is unavailable"""
+        os.environ["FAKE_SSH_MASTER_FAIL"] = "1"
+        runner = PeerCommandRunner("peer", ssh_cmd=self.ssh_cmd)
+        ok, err = runner.open()
+        self.assertFalse(ok)
+        self.assertIsInstance(err, subprocess.CalledProcessError)
+        self.assertFalse(runner.multiplexed)
+        res = runner.run(["echo", "hi"], check=True, stdout=subprocess.PIPE)
+        self.assertEqual(res.stdout, b"hi\n")
+        runner.close()
+
+        calls = self.invocations()
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(any(o.startswith("ControlPath=") for o in calls[1]))
+
+    def test_hung_master_times_out(self):
+        """A master connection which does not come up must not hang open()"""
+        os.environ["FAKE_SSH_MASTER_HANG"] = "1"
+        runner = PeerCommandRunner("peer", ssh_cmd=self.ssh_cmd, connect_timeout=1)
+        started = time.monotonic()
+        ok, err = runner.open(timeout=0.5)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(ok)
+        self.assertIsInstance(err, subprocess.TimeoutExpired)
+        self.assertFalse(runner.multiplexed)
+        self.assertIn("ConnectTimeout=1", self.invocations()[0])
+
+    def test_failed_remote_command_raises(self):
+        """Non-zero exit of the remote command surfaces as CalledProcessError"""
+        with PeerCommandRunner("peer", ssh_cmd=self.ssh_cmd) as runner:
+            with self.assertRaises(subprocess.CalledProcessError):
+                runner.run(["false"], check=True)
+
+    def test_hung_remote_command_times_out(self):
+        """A remote command which hangs is killed once its timeout expires"""
+        with PeerCommandRunner("peer", ssh_cmd=self.ssh_cmd) as runner:
+            started = time.monotonic()
+            with self.assertRaises(subprocess.TimeoutExpired):
+                runner.run(["sleep", "30"], timeout=0.5)
+            self.assertLess(time.monotonic() - started, 5)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from .zfs_kstat import find_pools, parse_named_kstat, parse_kstat_table, zfs_kstats
+
+ARCSTATS = """13 1 0x01 147 39984 2530634522 1014823716540925
+name                            type data
+hits                            4    8419123
+misses                          4    10245
+size                            4    1073741824
+arc_meta_used                   4    52428800
+"""
+
+DMU_TX = """11 1 0x01 12 3264 2530621437 1014823716540925
+name                            type data
+dmu_tx_assigned                 4    993217
+dmu_tx_delay                    4    17
+"""
+
+TXGS = """txg      birth            state ndirty       nread        nwritten     reads    writes   otime        qtime        wtime        stime
+4096     10098717237514   C     1048576      0            2097152      0        16       5000912345   12784        31678        92836475
+4097     10103718149859   O     0            0            0            0        0        0            0            0            0
+"""
+
+IOSTATS = """72 1 0x01 24 6528 2539456321 1014823716540925
+name                            type data
+trim_extents_written            4    0
+autotrim_bytes_written          4    0
+"""
+
+
+class TestZFSKstat(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.kstat_dir = self.tmpdir.name
+        self.write("arcstats", ARCSTATS)
+        self.write("dmu_tx", DMU_TX)
+        self.write("p01/state", "ONLINE\n")
+        self.write("p01/txgs", TXGS)
+        self.write("p01/iostats", IOSTATS)
+        self.write("p02/state", "DEGRADED\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name: str, contents: str):
+        path = os.path.join(self.kstat_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            fp.write(contents)
+
+    def test_parse_named_kstat(self):
+        """Header lines must be skipped and values converted to numbers"""
+        stats = parse_named_kstat(ARCSTATS)
+        self.assertEqual(stats["hits"], 8419123)
+        self.assertEqual(stats["size"], 1073741824)
+        self.assertEqual(len(stats), 4)
+
+    def test_parse_kstat_table(self):
+        """Every row must be keyed by column names"""
+        rows = parse_kstat_table(TXGS, "txg")
+        self.assertEqual([r["txg"] for r in rows], [4096, 4097])
+        self.assertEqual(rows[0]["state"], "C")
+        self.assertEqual(rows[0]["nwritten"], 2097152)
+
+    def test_zfs_kstats(self):
+        """All pools and global statistics must be collected from the tree"""
+        facts = zfs_kstats(self.kstat_dir)
+        self.assertEqual(facts["pools"], ("p01", "p02"))
+        self.assertEqual(facts["arcstats"]["misses"], 10245)
+        self.assertEqual(facts["dmu_tx"]["dmu_tx_delay"], 17)
+        p01 = facts["pool_stats"]["p01"]
+        self.assertEqual(p01["state"], "ONLINE")
+        self.assertEqual(len(p01["txgs"]), 2)
+        self.assertEqual(p01["iostats"]["trim_extents_written"], 0)
+        # Statistics which are missing are reported as such.
+        p02 = facts["pool_stats"]["p02"]
+        self.assertEqual(p02["state"], "DEGRADED")
+        self.assertIsNone(p02["txgs"])
+        self.assertIsNone(p02["iostats"])
+
+    def test_missing_kstat_dir(self):
+        """No ZFS module loaded means no pools"""
+        self.assertEqual(find_pools(os.path.join(self.kstat_dir, "missing")), ())
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from .zpool_geometry import (
+    MiB,
+    auto_mkfsopts,
+    choose_ost_recordsize,
+    fmt_mkfsoptions,
+    parse_ashift,
+    parse_zpool_status,
+    pool_geometry,
+    raidz_allocated_size,
+)
+
+ZPOOL_STATUS = """  pool: p01
+ state: ONLINE
+config:
+
+\tNAME                          STATE     READ WRITE CKSUM
+\tp01                           ONLINE       0     0     0
+\t  raidz2-0                    ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0a   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0b   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0c   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0d   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0e   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0f   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0g   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0h   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0i   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-0j   ONLINE       0     0     0
+\tlogs
+\t  mirror-1                    ONLINE       0     0     0
+\t    /dev/disk/by-id/nvme-0a   ONLINE       0     0     0
+\t    /dev/disk/by-id/nvme-0b   ONLINE       0     0     0
+\tcache
+\t  /dev/disk/by-id/nvme-1a     ONLINE       0     0     0
+\tspares
+\t  /dev/disk/by-id/scsi-1a     AVAIL
+
+errors: No known data errors
+
+  pool: p02
+ state: ONLINE
+config:
+
+\tNAME                          STATE     READ WRITE CKSUM
+\tp02                           ONLINE       0     0     0
+\t  mirror-0                    ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-2a   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-2b   ONLINE       0     0     0
+\t  draid2:8d:24c:1s-1          ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-3a   ONLINE       0     0     0
+\t    /dev/disk/by-id/scsi-3b   ONLINE       0     0     0
+\t  /dev/disk/by-id/scsi-4a     ONLINE       0     0     0
+
+errors: No known data errors
+"""
+
+
+def geometry(ashift, *vdevs, max_recordsize=16 * MiB):
+    return dict(
+        ashift=ashift,
+        max_recordsize=max_recordsize,
+        vdevs=[dict(type=t, parity=p, width=w) for t, p, w in vdevs],
+    )
+
+
+class TestZpoolGeometry(unittest.TestCase):
+    def test_parse_zpool_status_ignores_auxiliary_vdevs(self):
+        pools = parse_zpool_status(ZPOOL_STATUS)
+        self.assertEqual(pools["p01"], [dict(type="raidz", parity=2, width=10)])
+        self.assertEqual(
+            pools["p02"],
+            [
+                dict(type="mirror", parity=0, width=2),
+                dict(type="draid", parity=2, width=10),
+                dict(type="disk", parity=0, width=1),
+            ],
+        )
+
+    def test_parse_ashift_defaults_auto_detected(self):
+        self.assertEqual(parse_ashift("p01\t13\np02\t0\n"), dict(p01=13, p02=12))
+
+    def test_raidz_allocated_size_pads_to_parity_multiple(self):
+        # 128K at ashift 12 is 32 data and 32 parity sectors on raidz2 of 4,
+        # padded to 66, a multiple of 3.
+        self.assertEqual(raidz_allocated_size(128 * 1024, 12, 4, 2), 66 << 12)
+        # 4K on raidz1 of 5 takes one data and one parity sector.
+        self.assertEqual(raidz_allocated_size(4096, 12, 5, 1), 2 << 12)
+
+    def test_ost_recordsize_for_common_layouts(self):
+        cases = [
+            # No padding whenever data disks are a power of two.
+            (geometry(12, ("raidz", 1, 5)), "1M"),
+            (geometry(12, ("raidz", 2, 6)), "1M"),
+            (geometry(13, ("raidz", 3, 11)), "1M"),
+            # Padding with 512 byte sectors is negligible.
+            (geometry(9, ("raidz", 2, 10)), "1M"),
+            (geometry(12, ("raidz", 2, 10)), "1M"),
+            # With 8K sectors 1M records waste over 1% on raidz2 of 10.
+            (geometry(13, ("raidz", 2, 10)), "2M"),
+            (geometry(13, ("raidz", 3, 12)), "2M"),
+            (geometry(13, ("raidz", 1, 4)), "1M"),
+            # The worst vdev decides.
+            (geometry(13, ("raidz", 1, 5), ("raidz", 2, 9)), "2M"),
+            # Large records are no option unless ZFS allows them.
+            (geometry(13, ("raidz", 2, 10), max_recordsize=1 * MiB), "1M"),
+            (geometry(13, ("mirror", 0, 2), ("mirror", 0, 2)), "1M"),
+            (None, "1M"),
+        ]
+        for geom, expected in cases:
+            with self.subTest(geometry=geom):
+                opts = auto_mkfsopts("ost", geom)
+                self.assertEqual(opts["recordsize"], expected)
+
+    def test_metadata_targets_use_small_records(self):
+        geom = geometry(13, ("raidz", 2, 10))
+        self.assertEqual(choose_ost_recordsize(geom), 2 * MiB)
+        for target_type in ("mgt", "mdt"):
+            self.assertEqual(
+                fmt_mkfsoptions(auto_mkfsopts(target_type, geom)),
+                "recordsize=128K -o dnodesize=auto -o xattr=sa"
+                " -o compression=lz4 -o mountpoint=none",
+            )
+
+    def test_pool_geometry_runs_one_command_each(self):
+        calls = []
+
+        def run_cmd(cmd, **kwargs):
+            calls.append(cmd)
+            if cmd[1] == "status":
+                return ZPOOL_STATUS
+            return "p01\t13\np02\t12\n"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "zfs_max_recordsize"), "w") as fp:
+                fp.write("16777216\n")
+            geom, err = pool_geometry(["p01", "p02"], run_cmd, tmpdir)
+        self.assertIsNone(err)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(geom["p01"]["ashift"], 13)
+        self.assertEqual(geom["p01"]["max_recordsize"], 16 * MiB)
+        self.assertEqual(len(geom["p02"]["vdevs"]), 3)
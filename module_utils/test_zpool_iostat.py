@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from .zpool_iostat import (
+    PoolIostat,
+    consume_histogram_stream,
+    consume_latency_stream,
+    histogram_percentile,
+    sample_iostat,
+)
+
+# Two intervals of `zpool iostat -H -p -y -v -l p01 1 2`.
+LATENCY_OUTPUT = (
+    "p01\t1000\t9000\t10\t20\t40960\t81920\t1000\t2000\t900\t1800\t-\t-\t-\t-\t-\t-\t-\n"
+    "raidz2-0\t1000\t9000\t10\t20\t40960\t81920\t1000\t2000\t900\t1800\t-\t-\t-\t-\t-\t-\t-\n"
+    "sda\t-\t-\t5\t10\t20480\t40960\t1000\t2000\t900\t1800\t-\t-\t-\t-\t-\t-\t-\n"
+    "logs\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\t-\n"
+    "p01\t2000\t8000\t30\t40\t122880\t163840\t3000\t4000\t2700\t3600\t-\t-\t-\t-\t-\t-\t-\n"
+    "raidz2-0\t2000\t8000\t30\t40\t122880\t163840\t3000\t4000\t2700\t3600\t-\t-\t-\t-\t-\t-\t-\n"
+    "sda\t-\t-\t15\t20\t61440\t81920\t3000\t4000\t2700\t3600\t-\t-\t-\t-\t-\t-\t-\n"
+)
+
+
+def histogram_output(intervals: int):
+    """Generates output of `zpool iostat -H -p -y -v -w p01 1 <intervals>`."""
+    for _ in range(intervals):
+        for name in ("p01", "sda"):
+            yield name + "\n"
+            for exp in range(9, 14):
+                # 8 reads at each of 512ns .. 8us, 2 writes at 8us only.
+                writes = 2 if exp == 13 else 0
+                yield "\t".join([str(1 << exp), "8", str(writes)] + ["0"] * 9) + "\n"
+
+
+class TestZpoolIostat(unittest.TestCase):
+    def test_latency_stream(self):
+        """Rows must be attributed to the pool or vdev and averaged"""
+        stats = {"p01": PoolIostat()}
+        consume_latency_stream(LATENCY_OUTPUT.splitlines(True), stats)
+        facts = stats["p01"].to_facts([50])
+        self.assertEqual(facts["samples"], 2)
+        self.assertEqual(facts["capacity"], {"alloc": 2000, "free": 8000})
+        self.assertEqual(facts["throughput"]["read_ops"], 20)
+        self.assertEqual(facts["throughput"]["write_bytes"], 122880)
+        self.assertEqual(facts["latency"]["total_wait_read"], 2000)
+        self.assertIsNone(facts["latency"]["syncq_wait_read"])
+        self.assertEqual(sorted(facts["vdevs"]), ["raidz2-0", "sda"])
+        self.assertEqual(facts["vdevs"]["sda"]["throughput"]["read_ops"], 10)
+
+    def test_histogram_memory_is_bounded(self):
+        """Buckets are accumulated, not samples, no matter how many there are"""
+        stats = {"p01": PoolIostat()}
+        consume_histogram_stream(histogram_output(5000), stats)
+        histograms = stats["p01"].pool.histograms
+        self.assertEqual(len(histograms["total_wait_read"]), 5)
+        self.assertEqual(histograms["total_wait_read"][512], 8 * 5000)
+        self.assertEqual(histograms["total_wait_write"], {8192: 2 * 5000})
+        self.assertEqual(
+            stats["p01"].vdevs["sda"].histograms["total_wait_read"][4096], 8 * 5000
+        )
+
+    def test_histogram_percentile(self):
+        buckets = {512: 40, 1024: 40, 2048: 15, 4096: 4, 8192: 1}
+        self.assertEqual(histogram_percentile(buckets, 50), 1024)
+        self.assertEqual(histogram_percentile(buckets, 90), 2048)
+        self.assertEqual(histogram_percentile(buckets, 99), 4096)
+        self.assertEqual(histogram_percentile(buckets, 100), 8192)
+        self.assertIsNone(histogram_percentile({}, 50))
+
+    def test_replay(self):
+        """Captured output must yield the same facts as a live run would"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            latency = os.path.join(tmpdir, "latency.txt")
+            histogram = os.path.join(tmpdir, "histogram.txt")
+            with open(latency, "w") as fp:
+                fp.write(LATENCY_OUTPUT)
+            with open(histogram, "w") as fp:
+                fp.writelines(histogram_output(2))
+            stats, err = sample_iostat(
+                ["p01"], 1, 2, latency_replay=latency, histogram_replay=histogram
+            )
+        self.assertIsNone(err)
+        self.assertEqual(stats["p01"]["samples"], 2)
+        self.assertEqual(
+            stats["p01"]["percentiles"]["total_wait_read"],
+            {"p50": 2048, "p90": 8192, "p99": 8192},
+        )
+        self.assertEqual(stats["p01"]["percentiles"]["total_wait_write"]["p50"], 8192)
+
+    def test_replay_missing_file(self):
+        stats, err = sample_iostat(
+            ["p01"],
+            1,
+            1,
+            latency_replay="/nonexistent",
+            histogram_replay="/nonexistent",
+        )
+        self.assertIsInstance(err, FileNotFoundError)
+        self.assertEqual(stats, {})
@@ -0,0 +1,126 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+KSTAT_DIR = "/proc/spl/kstat/zfs"
+# Per-pool kstats, i.e. /proc/spl/kstat/zfs/<pool>/<name>.
+POOL_STATE = "state"
+POOL_TXGS = "txgs"
+POOL_IOSTATS = "iostats"
+# Global kstats, i.e. /proc/spl/kstat/zfs/<name>.
+ARCSTATS = "arcstats"
+DMU_TX = "dmu_tx"
+# Reads are sized to fit arcstats, the largest of these, in a single call.
+READ_SIZE = 64 * 1024
+
+Number = Union[int, float]
+
+
+def read_kstat(path: str) -> Optional[str]:
+    """Returns contents of a kstat file or None if it does not exist."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    return b"".join(chunks).decode(errors="replace")
+
+
+def to_number(value: str) -> Union[Number, str]:
+    """Converts a kstat value to a number where possible."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_named_kstat(text: str) -> Dict[str, Union[Number, str]]:
+    """
+    Parses a named kstat, such as arcstats, which consists of a header line,
+    a `name type data` line and one line per statistic.
+    """
+    stats = dict()
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) != 3 or fields[0] == "name" or not fields[1].isdigit():
+            continue
+        stats[fields[0]] = to_number(fields[2])
+    return stats
+
+
+def parse_kstat_table(text: str, first_column: str) -> List[Dict[str, Any]]:
+    """
+    Parses a raw kstat laid out as a table, such as txgs. Rows preceding the
+    line of column names, which starts with first_column, are ignored.
+    """
+    rows = []
+    columns = None
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        if columns is None:
+            if fields[0] == first_column:
+                columns = fields
+            continue
+        rows.append({c: to_number(v) for c, v in zip(columns, fields)})
+    return rows
+
+
+def pool_state(poolname: str, kstat_dir: str = KSTAT_DIR) -> Optional[str]:
+    """Returns state of the pool, e.g. ONLINE, or None if it is not imported."""
+    text = read_kstat(os.path.join(kstat_dir, poolname, POOL_STATE))
+    return None if text is None else text.strip()
+
+
+def find_pools(kstat_dir: str = KSTAT_DIR) -> Tuple[str, ...]:
+    """Lists imported pools, each of which has a directory of kstats."""
+    try:
+        with os.scandir(kstat_dir) as it:
+            return tuple(sorted(e.name for e in it if e.is_dir()))
+    except FileNotFoundError:
+        return tuple()
+
+
+def pool_kstats(poolname: str, kstat_dir: str = KSTAT_DIR) -> Dict[str, Any]:
+    """
+    Collects state, transaction group history and I/O statistics of a pool.
+    Statistics which this version of ZFS does not provide are None.
+    """
+    pooldir = os.path.join(kstat_dir, poolname)
+    txgs = read_kstat(os.path.join(pooldir, POOL_TXGS))
+    iostats = read_kstat(os.path.join(pooldir, POOL_IOSTATS))
+    return {
+        "state": pool_state(poolname, kstat_dir),
+        "txgs": None if txgs is None else parse_kstat_table(txgs, "txg"),
+        "iostats": None if iostats is None else parse_named_kstat(iostats),
+    }
+
+
+def zfs_kstats(kstat_dir: str = KSTAT_DIR) -> Dict[str, Any]:
+    """
+    Collects statistics of all imported pools along with global ARC and DMU
+    transaction statistics, reading kstat files directly rather than running
+    zpool commands.
+    """
+    pools = find_pools(kstat_dir)
+    global_stats = dict()
+    for name in (ARCSTATS, DMU_TX):
+        text = read_kstat(os.path.join(kstat_dir, name))
+        global_stats[name] = None if text is None else parse_named_kstat(text)
+    return dict(
+        pools=pools,
+        pool_stats={p: pool_kstats(p, kstat_dir) for p in pools},
+        **global_stats,
+    )
@@ -0,0 +1,234 @@
+import os
+import re
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+ZPOOL_CMD = "/usr/sbin/zpool"
+DEFAULT_PARAMETERS_PATH = "/sys/module/zfs/parameters"
+
+KiB = 1024
+MiB = 1024 * KiB
+
+# Pools created with ashift left to auto-detection report 0. Virtually all
+# disks in use today have 4K sectors.
+DEFAULT_ASHIFT = 12
+# Largest record size ZFS accepts unless zfs_max_recordsize is raised.
+DEFAULT_MAX_RECORDSIZE = 1 * MiB
+# Record sizes considered for OSTs, which see large streaming I/O. Lustre
+# sends 1M RPCs by default, thus smaller records are never considered.
+OST_RECORDSIZES = (1 * MiB, 2 * MiB, 4 * MiB, 8 * MiB, 16 * MiB)
+# MDTs and the MGT hold small objects, for which the ZFS default fits.
+METADATA_RECORDSIZE = 128 * KiB
+# A larger record size is only chosen if it wastes noticeably less space on
+# raidz padding than a smaller one.
+WASTE_TOLERANCE = 0.01
+# Sections of `zpool status` listing vdevs which do not hold regular data.
+AUX_SECTIONS = ("logs", "cache", "spares", "special", "dedup")
+
+VDEV_NAME = re.compile(
+    r"^(?P<type>mirror|raidz|draid)(?P<parity>\d)?(?P<rest>[:-].*)?$"
+)
+DRAID_DATA = re.compile(r":(?P<data>\d+)d")
+
+
+def parse_vdev_name(name: str) -> Dict[str, Any]:
+    """
+    Derives type and parity of a top-level vdev from its name, e.g. raidz2-0,
+    mirror-1 or draid2:8d:24c:1s-0. Anything else is a plain disk.
+    """
+    match = VDEV_NAME.match(name)
+    if not match:
+        return dict(type="disk", parity=0, width=1)
+    vdev_type = match.group("type")
+    if vdev_type == "mirror":
+        return dict(type="mirror", parity=0, width=0)
+    parity = int(match.group("parity") or 1)
+    vdev = dict(type=vdev_type, parity=parity, width=0)
+    # Width of a dRAID redundancy group is given in its name rather than by
+    # the number of children, which also includes disks of other groups.
+    data = DRAID_DATA.search(match.group("rest") or "")
+    if vdev_type == "draid" and data:
+        vdev["width"] = int(data.group("data")) + parity
+    return vdev
+
+
+def parse_zpool_status(output: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Parses output of `zpool status` into top-level data vdevs of each pool,
+    along with their type, parity and width. Log, cache, spare and other
+    auxiliary vdevs are left out.
+    """
+    pools: Dict[str, List[Dict[str, Any]]] = dict()
+    poolname = None
+    in_config = False
+    section = None
+    # Whether width of the current top-level vdev is given by its children.
+    count_children = False
+    for line in output.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("pool:"):
+            poolname = stripped.split(":", 1)[1].strip()
+            pools[poolname] = []
+            in_config = False
+            continue
+        if stripped.startswith("NAME") and poolname:
+            in_config = True
+            continue
+        if stripped.startswith("errors:"):
+            in_config = False
+            continue
+        if not in_config or not stripped:
+            continue
+        # Config lines are indented by a tab, then two spaces per level.
+        rest = line[1:] if line.startswith("\t") else line
+        depth = (len(rest) - len(rest.lstrip(" "))) // 2
+        name = stripped.split()[0]
+        vdevs = pools[poolname]
+        if depth == 0:
+            section = None if name == poolname else name
+        elif section in AUX_SECTIONS:
+            continue
+        elif depth == 1:
+            vdevs.append(parse_vdev_name(name))
+            count_children = vdevs[-1]["width"] == 0
+        elif depth == 2 and count_children:
+            vdevs[-1]["width"] += 1
+    return pools
+
+
+def parse_ashift(output: str) -> Dict[str, int]:
+    """Parses output of `zpool get -H -p -o name,value ashift`."""
+    ashifts = dict()
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) != 2:
+            continue
+        try:
+            ashift = int(fields[1])
+        except ValueError:
+            ashift = 0
+        ashifts[fields[0]] = ashift or DEFAULT_ASHIFT
+    return ashifts
+
+
+def read_max_recordsize(parameters_path: str = DEFAULT_PARAMETERS_PATH) -> int:
+    try:
+        with open(os.path.join(parameters_path, "zfs_max_recordsize"), "r") as fp:
+            return int(fp.read().strip())
+    except (FileNotFoundError, ValueError):
+        return DEFAULT_MAX_RECORDSIZE
+
+
+def pool_geometry(
+    pools: List[str],
+    run_cmd_func=subprocess.check_output,
+    parameters_path: str = DEFAULT_PARAMETERS_PATH,
+) -> Tuple[Dict[str, Dict[str, Any]], subprocess.CalledProcessError]:
+    """
+    Collects vdev layout and ashift of the given pools, running one command for
+    each, no matter how many pools there are.
+    """
+    try:
+        status = run_cmd_func(
+            [ZPOOL_CMD, "status", "-P"] + list(pools),
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        ashift = run_cmd_func(
+            [ZPOOL_CMD, "get", "-H", "-p", "-o", "name,value", "ashift"] + list(pools),
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+    except subprocess.CalledProcessError as err:
+        return dict(), err
+    vdevs = parse_zpool_status(status)
+    ashifts = parse_ashift(ashift)
+    max_recordsize = read_max_recordsize(parameters_path)
+    return {
+        p: dict(
+            ashift=ashifts.get(p, DEFAULT_ASHIFT),
+            max_recordsize=max_recordsize,
+            vdevs=vdevs[p],
+        )
+        for p in vdevs
+    }, None
+
+
+def raidz_allocated_size(psize: int, ashift: int, width: int, parity: int) -> int:
+    """
+    Returns space a block of psize bytes takes up on a raidz vdev, including
+    parity and padding, following vdev_raidz_asize() of ZFS.
+    """
+    ndata = width - parity
+    sectors = ((psize - 1) >> ashift) + 1
+    sectors += parity * ((sectors + ndata - 1) // ndata)
+    sectors = -(-sectors // (parity + 1)) * (parity + 1)
+    return sectors << ashift
+
+
+def raidz_waste(recordsize: int, ashift: int, width: int, parity: int) -> float:
+    """Share of space lost to padding, on top of the parity a layout implies."""
+    ideal = recordsize * width / (width - parity)
+    return raidz_allocated_size(recordsize, ashift, width, parity) / ideal - 1
+
+
+def choose_ost_recordsize(geometry: Optional[Dict[str, Any]]) -> int:
+    """
+    Picks the smallest OST record size which wastes no more space on raidz
+    padding than the best of the record sizes this system supports.
+    """
+    if not geometry:
+        return OST_RECORDSIZES[0]
+    ashift = geometry.get("ashift") or DEFAULT_ASHIFT
+    max_recordsize = geometry.get("max_recordsize") or DEFAULT_MAX_RECORDSIZE
+    candidates = [r for r in OST_RECORDSIZES if r <= max_recordsize]
+    raidz = [
+        v
+        for v in geometry.get("vdevs", [])
+        if v["type"] in ("raidz", "draid") and v["width"] > v["parity"]
+    ]
+    if not raidz or len(candidates) < 2:
+        return candidates[0] if candidates else OST_RECORDSIZES[0]
+    waste = {
+        r: max(raidz_waste(r, ashift, v["width"], v["parity"]) for v in raidz)
+        for r in candidates
+    }
+    best = min(waste.values())
+    return next(r for r in candidates if waste[r] <= best + WASTE_TOLERANCE)
+
+
+def fmt_size(size: int) -> str:
+    """Formats a power of two size the way zfs accepts it, e.g. 128K or 1M."""
+    for unit, factor in (("M", MiB), ("K", KiB)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def auto_mkfsopts(
+    target_type: str, geometry: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Derives ZFS properties of a Lustre target of the given type, i.e. mgt, mdt
+    or ost, from geometry of the pool it is created on, as reported by
+    pool_geometry(...). Without geometry defaults for the target type apply.
+
+    Lustre keeps much of its state in extended attributes, thus they are stored
+    in the dnode, which is sized to fit them.
+    """
+    if target_type == "ost":
+        recordsize = choose_ost_recordsize(geometry)
+    else:
+        recordsize = METADATA_RECORDSIZE
+    return {
+        "recordsize": fmt_size(recordsize),
+        "dnodesize": "auto",
+        "xattr": "sa",
+        "compression": "lz4",
+        "mountpoint": "none",
+    }
+
+
+def fmt_mkfsoptions(opts: Dict[str, str]) -> str:
+    """Formats properties as expected by mkfs.lustre --mkfsoptions."""
+    return " -o ".join([f"{k}={v}" for k, v in opts.items()])
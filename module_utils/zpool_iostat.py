@@ -0,0 +1,280 @@
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ZPOOL_CMD = "/usr/sbin/zpool"
+
+# Columns of `zpool iostat -H -p -l` following the vdev name. Bandwidth is in
+# bytes per second and wait times are in nanoseconds. Older releases print
+# fewer columns, which are then left out.
+LATENCY_COLUMNS = (
+    "alloc",
+    "free",
+    "read_ops",
+    "write_ops",
+    "read_bytes",
+    "write_bytes",
+    "total_wait_read",
+    "total_wait_write",
+    "disk_wait_read",
+    "disk_wait_write",
+    "syncq_wait_read",
+    "syncq_wait_write",
+    "asyncq_wait_read",
+    "asyncq_wait_write",
+    "scrub_wait",
+    "trim_wait",
+    "rebuild_wait",
+)
+# Columns which are rates, thus averaged over all samples.
+THROUGHPUT_COLUMNS = ("read_ops", "write_ops", "read_bytes", "write_bytes")
+# Capacity columns, of which only the latest sample is kept.
+CAPACITY_COLUMNS = ("alloc", "free")
+
+# Columns of `zpool iostat -H -p -w` following the bucket, which is the upper
+# bound of latency in nanoseconds.
+HISTOGRAM_COLUMNS = (
+    "total_wait_read",
+    "total_wait_write",
+    "disk_wait_read",
+    "disk_wait_write",
+    "syncq_wait_read",
+    "syncq_wait_write",
+    "asyncq_wait_read",
+    "asyncq_wait_write",
+    "scrub_wait",
+    "trim_wait",
+    "rebuild_wait",
+)
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0)
+
+
+def iostat_command(pools: List[str], mode: str, interval: int, count: int) -> List[str]:
+    """
+    Generates a command sampling pools and their vdevs count times, every
+    interval seconds, in scripted and parseable form. The mode is either -l for
+    average latencies or -w for latency histograms. Statistics since boot are
+    omitted.
+    """
+    return [ZPOOL_CMD, "iostat", "-H", "-p", "-y", "-v", mode] + (
+        list(pools) + [str(interval), str(count)]
+    )
+
+
+def parse_value(value: str) -> Optional[int]:
+    """Values not applicable to a vdev, e.g. capacity of a mirror, are a dash."""
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class IostatAccumulator:
+    """
+    Running totals of samples of a single pool or vdev. Memory use does not
+    depend on the number of samples, since only sums and histogram buckets,
+    of which there is a fixed number, are kept.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        # Column -> (sum, number of samples with a value)
+        self.sums: Dict[str, Tuple[int, int]] = dict()
+        self.capacity: Dict[str, int] = dict()
+        # Column -> bucket -> count
+        self.histograms: Dict[str, Dict[int, int]] = dict()
+
+    def add_latency_row(self, values: List[Optional[int]]):
+        self.samples += 1
+        for column, value in zip(LATENCY_COLUMNS, values):
+            if value is None:
+                continue
+            if column in CAPACITY_COLUMNS:
+                self.capacity[column] = value
+                continue
+            total, n = self.sums.get(column, (0, 0))
+            self.sums[column] = (total + value, n + 1)
+
+    def add_histogram_row(self, bucket: int, values: List[Optional[int]]):
+        for column, value in zip(HISTOGRAM_COLUMNS, values):
+            if not value:
+                continue
+            buckets = self.histograms.setdefault(column, dict())
+            buckets[bucket] = buckets.get(bucket, 0) + value
+
+    def mean(self, column: str) -> Optional[float]:
+        total, n = self.sums.get(column, (0, 0))
+        return total / n if n else None
+
+    def to_facts(self, percentiles: Iterable[float]) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "capacity": dict(self.capacity),
+            "throughput": {c: self.mean(c) for c in THROUGHPUT_COLUMNS},
+            "latency": {
+                c: self.mean(c)
+                for c in LATENCY_COLUMNS
+                if c not in THROUGHPUT_COLUMNS and c not in CAPACITY_COLUMNS
+            },
+            "histograms": {
+                column: sorted([b, n] for b, n in buckets.items())
+                for column, buckets in self.histograms.items()
+            },
+            "percentiles": {
+                column: {
+                    "p" + ("%g" % pct): histogram_percentile(buckets, pct)
+                    for pct in percentiles
+                }
+                for column, buckets in self.histograms.items()
+            },
+        }
+
+
+def histogram_percentile(buckets: Dict[int, int], pct: float) -> Optional[int]:
+    """
+    Returns the upper bound of the bucket in which the given percentile falls.
+    Precision is thus limited to the power of two sized buckets.
+    """
+    total = sum(buckets.values())
+    if not total:
+        return None
+    rank = max(math.ceil(pct / 100.0 * total), 1)
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= rank:
+            return bucket
+    return None
+
+
+class PoolIostat:
+    """Accumulated statistics of a pool along with each of its vdevs."""
+
+    def __init__(self):
+        self.pool = IostatAccumulator()
+        self.vdevs: Dict[str, IostatAccumulator] = dict()
+
+    def target(self, poolname: str, name: str) -> IostatAccumulator:
+        if name == poolname:
+            return self.pool
+        return self.vdevs.setdefault(name, IostatAccumulator())
+
+    def to_facts(self, percentiles: Iterable[float]) -> Dict[str, Any]:
+        facts = self.pool.to_facts(percentiles)
+        facts["vdevs"] = {
+            name: acc.to_facts(percentiles) for name, acc in self.vdevs.items()
+        }
+        return facts
+
+
+def consume_latency_stream(lines: Iterable[str], stats: Dict[str, PoolIostat]):
+    """
+    Feeds output of `zpool iostat -H -p -v -l` into stats, keyed by pool name,
+    one line at a time. Rows of a pool are followed by rows of its vdevs.
+    """
+    poolname = None
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 2:
+            continue
+        name = fields[0].strip()
+        if name in stats:
+            poolname = name
+        if poolname is None:
+            continue
+        values = [parse_value(v) for v in fields[1:]]
+        # Headers such as logs or spares only have dashes.
+        if all(v is None for v in values):
+            continue
+        stats[poolname].target(poolname, name).add_latency_row(values)
+
+
+def consume_histogram_stream(lines: Iterable[str], stats: Dict[str, PoolIostat]):
+    """
+    Feeds output of `zpool iostat -H -p -v -w` into stats, one line at a time.
+    Each pool and vdev is introduced by a line with just its name, followed by
+    one row per latency bucket.
+    """
+    poolname = None
+    target = None
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        name = fields[0].strip()
+        if not name:
+            continue
+        bucket = parse_value(name)
+        if bucket is None:
+            # Name of the pool or vdev the following buckets belong to.
+            if len(fields) == 1 or all(not f.strip() for f in fields[1:]):
+                if name in stats:
+                    poolname = name
+                target = stats[poolname].target(poolname, name) if poolname else None
+            continue
+        if target is not None:
+            target.add_histogram_row(bucket, [parse_value(v) for v in fields[1:]])
+
+
+def stream_command(cmd: List[str], consume, stats: Dict[str, PoolIostat]):
+    """
+    Runs the command and hands its output over to consume as it is produced,
+    so that output is never held in memory as a whole.
+    """
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    ) as proc:
+        consume(proc.stdout, stats)
+        stderr = proc.stderr.read()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, None, stderr)
+
+
+def replay_file(path: str, consume, stats: Dict[str, PoolIostat]):
+    """Feeds previously captured output to consume, e.g. for testing."""
+    with open(path, "r") as fp:
+        consume(fp, stats)
+
+
+def sample_iostat(
+    pools: List[str],
+    interval: int,
+    count: int,
+    latency_replay: Optional[str] = None,
+    histogram_replay: Optional[str] = None,
+    percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+) -> Tuple[Dict[str, Any], Exception]:
+    """
+    Samples latency averages and histograms of pools and their vdevs. Both
+    samplers run side by side, so sampling takes interval * count seconds.
+    When replay files are given, their contents are parsed instead of running
+    zpool.
+    """
+    stats = {p: PoolIostat() for p in pools}
+    # Both consumers only ever touch accumulators of their own kind.
+    jobs = [
+        (consume_latency_stream, "-l", latency_replay),
+        (consume_histogram_stream, "-w", histogram_replay),
+    ]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [
+            (
+                executor.submit(replay_file, replay, consume, stats)
+                if replay
+                else executor.submit(
+                    stream_command,
+                    iostat_command(pools, mode, interval, count),
+                    consume,
+                    stats,
+                )
+            )
+            for consume, mode, replay in jobs
+        ]
+    for future in futures:
+        err = future.exception()
+        if err:
+            return dict(), err
+    return {p: s.to_facts(percentiles) for p, s in stats.items()}, None